@@ -93,7 +93,8 @@ class Clients(clients.OpenStackClients):
     def trove(self):
         """Rackspace trove client."""
         if not self._trove:
-            super(Clients, self).trove(service_type='rax:database')
+            self._trove = super(Clients, self).trove(
+                service_type='rax:database')
             management_url = self.url_for(service_type='rax:database',
                                           region_name=cfg.CONF.region_name)
             self._trove.client.management_url = management_url
@@ -102,7 +103,7 @@ class Clients(clients.OpenStackClients):
     def cinder(self):
         """Override the region for the cinder client."""
         if not self._cinder:
-            super(Clients, self).cinder()
+            self._cinder = super(Clients, self).cinder()
             management_url = self.url_for(service_type='volume',
                                           region_name=cfg.CONF.region_name)
             self._cinder.client.management_url = management_url
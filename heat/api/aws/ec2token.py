@@ -11,6 +11,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import datetime
 import hashlib
 
 from oslo.config import cfg
@@ -25,6 +27,7 @@ from heat.openstack.common.gettextutils import _
 from heat.openstack.common import importutils
 from heat.openstack.common import jsonutils as json
 from heat.openstack.common import log as logging
+from heat.openstack.common import timeutils
 
 gettextutils.install('heat')
 
@@ -42,7 +45,15 @@ opts = [
                 default=[],
                 help=_('Allowed keystone endpoints for auth_uri when '
                        'multi_cloud is enabled. At least one endpoint needs '
-                       'to be specified.'))
+                       'to be specified.')),
+    cfg.IntOpt('cache_ttl',
+               default=30,
+               help=_('Number of seconds for which the result of validating '
+                      'a signed request with keystone is reused for an '
+                      'identical request. Set to 0 to disable caching.')),
+    cfg.IntOpt('cache_size',
+               default=1000,
+               help=_('Maximum number of validated requests cached.'))
 ]
 cfg.CONF.register_opts(opts, group='ec2authtoken')
 
@@ -53,6 +64,7 @@ class EC2Token(wsgi.Middleware):
     def __init__(self, app, conf):
         self.conf = conf
         self.application = app
+        self._cache = collections.OrderedDict()
 
     def _conf_get(self, name):
         # try config from paste-deploy first
@@ -112,6 +124,32 @@ class EC2Token(wsgi.Middleware):
 
         return access
 
+    def _cache_get(self, key):
+        entry = self._cache.pop(key, None)
+        if entry is None or timeutils.utcnow() >= entry[0]:
+            return None
+        self._cache[key] = entry
+        return entry[1]
+
+    def _cache_set(self, key, result):
+        ttl = int(self._conf_get('cache_ttl'))
+        size = int(self._conf_get('cache_size'))
+        if ttl <= 0 or size <= 0:
+            return
+
+        expiry = timeutils.utcnow() + datetime.timedelta(seconds=ttl)
+        try:
+            token_expiry = timeutils.normalize_time(
+                timeutils.parse_isotime(result['access']['token']['expires']))
+        except (KeyError, ValueError):
+            pass
+        else:
+            expiry = min(expiry, token_expiry)
+
+        self._cache[key] = expiry, result
+        while len(self._cache) > size:
+            self._cache.popitem(last=False)
+
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
         if not self._conf_get('multi_cloud'):
@@ -183,11 +221,21 @@ class EC2Token(wsgi.Middleware):
         creds_json = json.dumps(creds)
         headers = {'Content-Type': 'application/json'}
 
-        keystone_ec2_uri = self._conf_get_keystone_ec2_uri(auth_uri)
-        logger.info(_('Authenticating with %s') % keystone_ec2_uri)
-        response = requests.post(keystone_ec2_uri, data=creds_json,
-                                 headers=headers)
-        result = response.json()
+        # An identical signed request (such as a pre-signed URL polled by an
+        # instance) validated recently need not be validated again. The key
+        # covers everything keystone checks, so any change is a cache miss.
+        cache_key = hashlib.sha256(
+            json.dumps([auth_uri, creds], sort_keys=True)).hexdigest()
+        result = self._cache_get(cache_key)
+        cached = result is not None
+        if cached:
+            logger.info(_('Using cached AWS authentication'))
+        else:
+            keystone_ec2_uri = self._conf_get_keystone_ec2_uri(auth_uri)
+            logger.info(_('Authenticating with %s') % keystone_ec2_uri)
+            response = requests.post(keystone_ec2_uri, data=creds_json,
+                                     headers=headers)
+            result = response.json()
         try:
             token_id = result['access']['token']['id']
             tenant = result['access']['token']['tenant']['name']
@@ -209,6 +257,9 @@ class EC2Token(wsgi.Middleware):
             else:
                 raise exception.HeatAccessDeniedError()
 
+        if not cached:
+            self._cache_set(cache_key, result)
+
         # Authenticated!
         ec2_creds = {'ec2Credentials': {'access': access,
                                         'signature': signature}}
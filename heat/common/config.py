@@ -70,6 +70,15 @@ service_opts = [
                     'manage users and projects in the stack_user_domain.'),
     cfg.StrOpt('stack_domain_admin_password',
                help='Keystone password for stack_domain_admin user.'),
+    cfg.IntOpt('keystone_token_cache_size',
+               default=100,
+               help='Maximum number of authenticated Keystone clients (with '
+                    'their tokens and service catalogs) cached by each '
+                    'engine process. Set to 0 to disable caching.'),
+    cfg.IntOpt('keystone_token_refresh_margin',
+               default=300,
+               help='Number of seconds before a cached Keystone token '
+                    'expires at which a new token is obtained.'),
     cfg.IntOpt('max_template_size',
                default=524288,
                help='Maximum raw byte size of any template.'),
@@ -131,6 +140,89 @@ engine_opts = [
                default=2,
                help=_('RPC timeout for the engine liveness check that is used'
                       ' for stack locking.')),
+    cfg.IntOpt('stack_lock_lease_duration',
+               default=60,
+               help=_('Duration in seconds of the lease an engine holds on'
+                      ' each of its stack locks. The leases are renewed'
+                      ' every third of this duration, and a lock whose'
+                      ' lease has expired may be taken over by another'
+                      ' engine.')),
+    cfg.BoolOpt('stack_affinity',
+                default=False,
+                help=_('Route RPC calls for a stack, and its nested stacks,'
+                       ' to the engine host that the stack is consistently'
+                       ' hashed to. Engines report their liveness every'
+                       ' periodic_interval seconds and the stacks are'
+                       ' rebalanced when engines join or leave.')),
+    cfg.IntOpt('stack_affinity_replicas',
+               default=100,
+               help=_('Number of points each engine host is given on the'
+                      ' stack affinity hash ring.')),
+    cfg.IntOpt('template_cache_size',
+               default=100,
+               help=_('Maximum number of parsed templates cached by each'
+                      ' engine process.')),
+    cfg.IntOpt('watch_data_batch_size',
+               default=100,
+               help=_('Number of metric samples pushed without a watch name'
+                      ' to buffer before they are written to the database'
+                      ' together. Set to 1 to write every sample'
+                      ' immediately.')),
+    cfg.IntOpt('watch_data_flush_interval',
+               default=5,
+               help=_('Maximum number of seconds buffered metric samples'
+                      ' are held before they are written to the'
+                      ' database.')),
+    cfg.IntOpt('validation_cache_size',
+               default=100,
+               help=_('Maximum number of template validation results cached'
+                      ' by each engine process.')),
+    cfg.IntOpt('constraint_cache_ttl',
+               default=60,
+               help=_('Number of seconds for which a value that passed a'
+                      ' custom constraint check, such as an image or flavor'
+                      ' lookup, is considered valid for the same tenant.'
+                      ' Set to 0 to disable caching.')),
+    cfg.IntOpt('client_pool_size',
+               default=100,
+               help=_('Maximum number of API clients shared between stacks'
+                      ' by each engine process.')),
+    cfg.IntOpt('client_pool_ttl',
+               default=300,
+               help=_('Number of seconds for which a pooled API client is'
+                      ' reused for the same service, endpoint and'
+                      ' credentials. Set to 0 to disable pooling.')),
+    cfg.IntOpt('lookup_cache_ttl',
+               default=60,
+               help=_('Number of seconds for which the results of Nova image,'
+                      ' flavor, keypair and availability zone lookups are'
+                      ' reused for the same tenant. Set to 0 to disable'
+                      ' caching.')),
+    cfg.IntOpt('lookup_cache_size',
+               default=1000,
+               help=_('Maximum number of Nova lookup results cached by each'
+                      ' engine process.')),
+    cfg.IntOpt('max_concurrent_volume_attachments',
+               default=5,
+               help=_('Maximum number of volumes that are attached to or'
+                      ' detached from a single server concurrently.')),
+    cfg.BoolOpt('neutron_bulk_create',
+                default=True,
+                help=_('Combine the creation of Neutron networks, subnets,'
+                       ' ports and security group rules that are ready at'
+                       ' the same time into bulk requests.')),
+    cfg.FloatOpt('backend_request_rate',
+                 default=50.0,
+                 help=_('Maximum number of requests per second sent on'
+                        ' behalf of each tenant to each backend API'
+                        ' endpoint. The rate is reduced when the'
+                        ' endpoint responds that it is over its rate limit'
+                        ' and recovers as requests succeed again. Set to 0'
+                        ' to disable rate limiting.')),
+    cfg.IntOpt('backend_rate_limit_retries',
+               default=3,
+               help=_('Number of times a backend API request that was'
+                      ' rejected by rate limiting is retried.')),
     cfg.StrOpt('onready',
                help=_('onready allows you to send a notification when the'
                       ' heat processes are ready to serve.  This is either a'
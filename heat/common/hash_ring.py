@@ -0,0 +1,62 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A consistent hash ring for distributing keys across a set of nodes.
+
+Each node is placed on the ring at a number of pseudo-random points (the
+replicas), so that adding or removing a node only moves the keys that hash
+to the arcs owned by that node.
+"""
+
+import bisect
+import hashlib
+
+from heat.openstack.common.gettextutils import _
+
+
+class HashRing(object):
+
+    DEFAULT_REPLICAS = 100
+
+    def __init__(self, nodes, replicas=DEFAULT_REPLICAS):
+        if replicas < 1:
+            raise ValueError(_('The number of replicas must be positive'))
+
+        self.nodes = frozenset(nodes)
+        self.replicas = replicas
+
+        ring = sorted((self._hash('%s-%d' % (node, r)), node)
+                      for node in self.nodes
+                      for r in range(replicas))
+        self._hashes = [h for h, node in ring]
+        self._ring_nodes = [node for h, node in ring]
+
+    @staticmethod
+    def _hash(key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return int(hashlib.md5(key).hexdigest()[:16], 16)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.nodes
+
+    def get_node(self, key):
+        """Return the node that owns the given key, or None if empty."""
+        if not self._hashes:
+            return None
+
+        index = bisect.bisect(self._hashes, self._hash(key))
+        return self._ring_nodes[index % len(self._ring_nodes)]
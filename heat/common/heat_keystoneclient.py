@@ -13,7 +13,9 @@
 
 """Keystone Client functionality for use by resources."""
 
+import collections
 from collections import namedtuple
+import hashlib
 import json
 import uuid
 
@@ -39,6 +41,70 @@ keystone_opts = [
                help="Fully qualified class name to use as a keystone backend.")
 ]
 cfg.CONF.register_opts(keystone_opts)
+cfg.CONF.import_opt('keystone_token_cache_size', 'heat.common.config')
+cfg.CONF.import_opt('keystone_token_refresh_margin', 'heat.common.config')
+
+
+class ClientCache(object):
+    '''
+    A process-wide cache of authenticated keystone clients.
+
+    Authenticating obtains a scoped token and the service catalog, so reusing
+    an authenticated client avoids a round-trip to keystone each time a stack
+    is loaded with the same credentials (in particular the same trust).
+    Clients are keyed by a digest of all of the arguments used to create and
+    authenticate them, and are discarded once their token is due to expire
+    within keystone_token_refresh_margin seconds.
+    '''
+
+    def __init__(self):
+        self._clients = collections.OrderedDict()
+
+    @staticmethod
+    def _key(kwargs):
+        '''
+        Return the cache key for the given arguments, or None if they can not
+        be serialised (and so the client can not be cached).
+        '''
+        try:
+            data = json.dumps(sorted(kwargs.items()))
+        except TypeError:
+            return None
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, kwargs):
+        if cfg.CONF.keystone_token_cache_size <= 0:
+            return None
+
+        key = self._key(kwargs)
+        client = self._clients.pop(key, None)
+        if client is None:
+            return None
+        margin = cfg.CONF.keystone_token_refresh_margin
+        if client.auth_ref.will_expire_soon(stale_duration=margin):
+            return None
+
+        self._clients[key] = client
+        return client
+
+    def put(self, kwargs, client):
+        size = cfg.CONF.keystone_token_cache_size
+        if size <= 0:
+            return
+
+        key = self._key(kwargs)
+        if key is None:
+            return
+
+        self._clients[key] = client
+        while len(self._clients) > size:
+            self._clients.popitem(last=False)
+
+    def clear(self):
+        self._clients.clear()
+
+
+_client_cache = ClientCache()
 
 
 class KeystoneClientV3(object):
@@ -115,12 +181,14 @@ class KeystoneClientV3(object):
             # Create admin client connection to v3 API
             admin_creds = self._service_admin_creds()
             admin_creds.update(self._ssl_options())
-            c = kc_v3.Client(**admin_creds)
-            if c.authenticate():
-                self._admin_client = c
-            else:
-                logger.error("Admin client authentication failed")
-                raise exception.AuthorizationFailure()
+            c = _client_cache.get(admin_creds)
+            if c is None:
+                c = kc_v3.Client(**admin_creds)
+                if not c.authenticate():
+                    logger.error("Admin client authentication failed")
+                    raise exception.AuthorizationFailure()
+                _client_cache.put(admin_creds, c)
+            self._admin_client = c
         return self._admin_client
 
     @property
@@ -129,14 +197,17 @@ class KeystoneClientV3(object):
             # Create domain admin client connection to v3 API
             admin_creds = self._domain_admin_creds()
             admin_creds.update(self._ssl_options())
-            c = kc_v3.Client(**admin_creds)
-            # Note we must specify the domain when getting the token
-            # as only a domain scoped token can create projects in the domain
-            if c.authenticate(domain_id=self.stack_domain_id):
-                self._domain_admin_client = c
-            else:
-                logger.error("Domain admin client authentication failed")
-                raise exception.AuthorizationFailure()
+            cache_key = dict(admin_creds, domain_id=self.stack_domain_id)
+            c = _client_cache.get(cache_key)
+            if c is None:
+                c = kc_v3.Client(**admin_creds)
+                # Note we must specify the domain when getting the token as
+                # only a domain scoped token can create projects in the domain
+                if not c.authenticate(domain_id=self.stack_domain_id):
+                    logger.error("Domain admin client authentication failed")
+                    raise exception.AuthorizationFailure()
+                _client_cache.put(cache_key, c)
+            self._domain_admin_client = c
         return self._domain_admin_client
 
     def _v3_client_init(self):
@@ -164,8 +235,11 @@ class KeystoneClientV3(object):
                          "trust or auth_token!"))
             raise exception.AuthorizationFailure()
         kwargs.update(self._ssl_options())
-        client = kc_v3.Client(**kwargs)
-        client.authenticate()
+        client = _client_cache.get(kwargs)
+        cached = client is not None
+        if not cached:
+            client = kc_v3.Client(**kwargs)
+            client.authenticate()
         # If we are authenticating with a trust set the context auth_token
         # with the trust scoped token
         if 'trust_id' in kwargs:
@@ -181,6 +255,8 @@ class KeystoneClientV3(object):
                 logger.error("Trust impersonation failed")
                 raise exception.AuthorizationFailure()
 
+        if not cached:
+            _client_cache.put(kwargs, client)
         return client
 
     def _service_admin_creds(self):
@@ -51,6 +51,10 @@ def raw_template_get(context, template_id):
     return IMPL.raw_template_get(context, template_id)
 
 
+def raw_template_get_hash(context, template_id):
+    return IMPL.raw_template_get_hash(context, template_id)
+
+
 def raw_template_create(context, values):
     return IMPL.raw_template_create(context, values)
 
@@ -159,6 +163,14 @@ def stack_lock_steal(stack_id, old_engine_id, new_engine_id):
     return IMPL.stack_lock_steal(stack_id, old_engine_id, new_engine_id)
 
 
+def stack_lock_renew(engine_id):
+    return IMPL.stack_lock_renew(engine_id)
+
+
+def stack_lock_lease_alive(engine_id):
+    return IMPL.stack_lock_lease_alive(engine_id)
+
+
 def stack_lock_release(stack_id, engine_id):
     return IMPL.stack_lock_release(stack_id, engine_id)
 
@@ -215,6 +227,18 @@ def watch_rule_get_all_by_stack(context, stack_id):
     return IMPL.watch_rule_get_all_by_stack(context, stack_id)
 
 
+def watch_rule_get_all_after(context, watch_rule_id):
+    return IMPL.watch_rule_get_all_after(context, watch_rule_id)
+
+
+def watch_rule_get_all_by_ids(context, watch_rule_ids):
+    return IMPL.watch_rule_get_all_by_ids(context, watch_rule_ids)
+
+
+def watch_rule_update_all(context, values):
+    return IMPL.watch_rule_update_all(context, values)
+
+
 def watch_rule_create(context, values):
     return IMPL.watch_rule_create(context, values)
 
@@ -231,6 +255,10 @@ def watch_data_create(context, values):
     return IMPL.watch_data_create(context, values)
 
 
+def watch_data_create_all(context, values_list):
+    return IMPL.watch_data_create_all(context, values_list)
+
+
 def watch_data_get_all(context):
     return IMPL.watch_data_get_all(context)
 
@@ -283,6 +311,22 @@ def snapshot_delete(context, snapshot_id):
     return IMPL.snapshot_delete(context, snapshot_id)
 
 
+def service_create(context, values):
+    return IMPL.service_create(context, values)
+
+
+def service_update(context, service_id, values):
+    return IMPL.service_update(context, service_id, values)
+
+
+def service_delete(context, service_id):
+    return IMPL.service_delete(context, service_id)
+
+
+def service_get_all(context):
+    return IMPL.service_get_all(context)
+
+
 def db_sync(engine, version=None):
     """Migrate the database to `version` or the most recent version."""
     return IMPL.db_sync(engine, version=version)
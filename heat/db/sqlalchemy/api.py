@@ -14,6 +14,8 @@
 '''Implementation of SQLAlchemy backend.'''
 from datetime import datetime
 from datetime import timedelta
+import hashlib
+import json
 import sys
 
 from oslo.config import cfg
@@ -29,8 +31,10 @@ from heat.db.sqlalchemy import models
 from heat.openstack.common.db.sqlalchemy import session as db_session
 from heat.openstack.common.db.sqlalchemy import utils
 from heat.openstack.common.gettextutils import _
+from heat.openstack.common import timeutils
 
 cfg.CONF.import_opt('max_events_per_stack', 'heat.common.config')
+cfg.CONF.import_opt('stack_lock_lease_duration', 'heat.common.config')
 
 CONF = cfg.CONF
 CONF.import_opt('max_events_per_stack', 'heat.common.config')
@@ -84,7 +88,8 @@ def _session(context):
 
 
 def raw_template_get(context, template_id):
-    result = model_query(context, models.RawTemplate).get(template_id)
+    result = model_query(context, models.RawTemplate).\
+        options(orm.joinedload_all('file_refs.file')).get(template_id)
 
     if not result:
         raise exception.NotFound(_('raw template with id %s not found') %
@@ -93,10 +98,63 @@ def raw_template_get(context, template_id):
     return result
 
 
+def raw_template_get_hash(context, template_id):
+    result = model_query(context, models.RawTemplate.template_hash).\
+        filter_by(id=template_id).first()
+
+    if not result:
+        raise exception.NotFound(_('raw template with id %s not found') %
+                                 template_id)
+
+    return result.template_hash
+
+
+def _content_hash(*content):
+    return hashlib.sha1(json.dumps(content, sort_keys=True)).hexdigest()
+
+
 def raw_template_create(context, values):
-    raw_template_ref = models.RawTemplate()
-    raw_template_ref.update(values)
-    raw_template_ref.save(_session(context))
+    """
+    Store a template and its files, sharing the stored copy of any
+    identical template or file.
+    """
+    values = dict(values)
+    files = values.pop('files', None) or {}
+    template_hash = _content_hash(values.get('template'), files)
+
+    session = _session(context)
+    with session.begin(subtransactions=True):
+        # Reused rows are locked and touched, so that purge_deleted can not
+        # delete them before the new stack refers to them.
+        raw_template_ref = session.query(models.RawTemplate).\
+            filter_by(template_hash=template_hash).\
+            with_lockmode('update').first()
+        if raw_template_ref is not None:
+            raw_template_ref.updated_at = timeutils.utcnow()
+            return raw_template_ref
+
+        raw_template_ref = models.RawTemplate()
+        raw_template_ref.update(values)
+        raw_template_ref.template_hash = template_hash
+        raw_template_ref.legacy_files = None
+
+        stored_files = {}
+        for name, contents in files.iteritems():
+            content_hash = _content_hash(contents)
+            if content_hash not in stored_files:
+                stored_file = session.query(models.RawTemplateFile).\
+                    filter_by(content_hash=content_hash).\
+                    with_lockmode('update').first()
+                if stored_file is None:
+                    stored_file = models.RawTemplateFile(
+                        content_hash=content_hash, contents=contents)
+                else:
+                    stored_file.updated_at = timeutils.utcnow()
+                stored_files[content_hash] = stored_file
+            raw_template_ref.file_refs.append(models.RawTemplateFileRef(
+                name=name, file=stored_files[content_hash]))
+
+        session.add(raw_template_ref)
     return raw_template_ref
 
 
@@ -288,7 +346,8 @@ def stack_get(context, stack_id, show_deleted=False, tenant_safe=True,
               eager_load=False):
     query = model_query(context, models.Stack)
     if eager_load:
-        query = query.options(orm.joinedload("raw_template"))
+        query = query.options(
+            orm.joinedload_all("raw_template.file_refs.file"))
     result = query.get(stack_id)
 
     deleted_ok = show_deleted or context.show_deleted
@@ -430,26 +489,56 @@ def stack_delete(context, stack_id):
     session.flush()
 
 
+def _stack_lock_lease_expiry():
+    return timeutils.utcnow() + timedelta(
+        seconds=cfg.CONF.stack_lock_lease_duration)
+
+
 def stack_lock_create(stack_id, engine_id):
     session = get_session()
     with session.begin():
         lock = session.query(models.StackLock).get(stack_id)
         if lock is not None:
             return lock.engine_id
-        session.add(models.StackLock(stack_id=stack_id, engine_id=engine_id))
+        session.add(models.StackLock(stack_id=stack_id, engine_id=engine_id,
+                                     expires_at=_stack_lock_lease_expiry()))
 
 
 def stack_lock_steal(stack_id, old_engine_id, new_engine_id):
+    # Locks created before leases were introduced have no expiry, and are
+    # treated as expired.
+    lease_expired = sqlalchemy.or_(
+        models.StackLock.expires_at.is_(None),
+        models.StackLock.expires_at < timeutils.utcnow())
     session = get_session()
     with session.begin():
-        lock = session.query(models.StackLock).get(stack_id)
         rows_affected = session.query(models.StackLock).\
             filter_by(stack_id=stack_id, engine_id=old_engine_id).\
-            update({"engine_id": new_engine_id})
+            filter(lease_expired).\
+            update({"engine_id": new_engine_id,
+                    "expires_at": _stack_lock_lease_expiry()},
+                   synchronize_session=False)
     if not rows_affected:
+        lock = session.query(models.StackLock).get(stack_id)
         return lock.engine_id if lock is not None else True
 
 
+def stack_lock_renew(engine_id):
+    session = get_session()
+    with session.begin():
+        return session.query(models.StackLock).\
+            filter_by(engine_id=engine_id).\
+            update({"expires_at": _stack_lock_lease_expiry()},
+                   synchronize_session=False)
+
+
+def stack_lock_lease_alive(engine_id):
+    result = model_query(None, models.StackLock).\
+        filter_by(engine_id=engine_id).\
+        filter(models.StackLock.expires_at >= timeutils.utcnow()).first()
+    return result is not None
+
+
 def stack_lock_release(stack_id, engine_id):
     session = get_session()
     with session.begin():
@@ -603,6 +692,33 @@ def watch_rule_get_all_by_stack(context, stack_id):
     return results
 
 
+def watch_rule_get_all_after(context, watch_rule_id):
+    """Return the watch rules created after the given watch rule ID."""
+    results = model_query(context, models.WatchRule).\
+        filter(models.WatchRule.id > watch_rule_id).\
+        order_by(models.WatchRule.id).all()
+    return results
+
+
+def watch_rule_get_all_by_ids(context, watch_rule_ids):
+    """
+    Return the given watch rules of live stacks, with their stack and watch
+    data loaded in the same round trip.
+    """
+    results = model_query(context, models.WatchRule).\
+        join(models.WatchRule.stack).\
+        options(orm.contains_eager(models.WatchRule.stack),
+                orm.subqueryload(models.WatchRule.watch_data)).\
+        filter(models.WatchRule.id.in_(watch_rule_ids)).\
+        filter(models.Stack.deleted_at.is_(None)).all()
+    return results
+
+
+def watch_rule_update_all(context, values):
+    return model_query(context, models.WatchRule).\
+        update(values, synchronize_session=False)
+
+
 def watch_rule_create(context, values):
     obj_ref = models.WatchRule()
     obj_ref.update(values)
@@ -646,6 +762,28 @@ def watch_data_create(context, values):
     return obj_ref
 
 
+def watch_data_create_all(context, values_list):
+    """
+    Create watch data for many watch rules in one statement, skipping any
+    data for watch rules that have been deleted. Returns the number of
+    rows created.
+    """
+    rule_ids = set(values['watch_rule_id'] for values in values_list)
+    if not rule_ids:
+        return 0
+
+    session = _session(context)
+    with session.begin(subtransactions=True):
+        live_ids = set(rule_id for (rule_id,) in
+                       session.query(models.WatchRule.id).
+                       filter(models.WatchRule.id.in_(rule_ids)))
+        rows = [values for values in values_list
+                if values['watch_rule_id'] in live_ids]
+        if rows:
+            session.execute(models.WatchData.__table__.insert(), rows)
+    return len(rows)
+
+
 def watch_data_get_all(context):
     results = model_query(context, models.WatchData).all()
     return results
@@ -757,6 +895,92 @@ def snapshot_delete(context, snapshot_id):
     session.flush()
 
 
+def service_create(context, values):
+    service = models.Service()
+    service.update(values)
+    service.save(_session(context))
+    return service
+
+
+def service_get(context, service_id):
+    result = soft_delete_aware_query(context, models.Service).\
+        filter_by(id=service_id).first()
+    if result is None:
+        raise exception.NotFound(_('Service with id %s not found') %
+                                 service_id)
+    return result
+
+
+def service_update(context, service_id, values):
+    service = service_get(context, service_id)
+    values.setdefault('updated_at', timeutils.utcnow())
+    service.update(values)
+    service.save(_session(context))
+    return service
+
+
+def service_delete(context, service_id):
+    service = service_get(context, service_id)
+    service.soft_delete(session=_session(context))
+
+
+def service_get_all(context):
+    return soft_delete_aware_query(context, models.Service).all()
+
+
+def _reused_since(conn, table, row_id, time_line):
+    """
+    Lock a row of a shared table, and return whether it is gone or has been
+    reused by raw_template_create since time_line.
+    """
+    stmt = sqlalchemy.select([table.c.updated_at]).\
+        where(table.c.id == row_id).with_for_update()
+    row = conn.execute(stmt).first()
+    return row is None or (row[0] is not None and row[0] >= time_line)
+
+
+def _purge_raw_template(engine, meta, raw_template_id, time_line):
+    """
+    Delete a raw template, and any files only it uses, once no stack
+    refers to it any more.
+
+    The references are checked with the rows locked, in the transaction
+    deleting them, so a concurrent raw_template_create either reuses the
+    rows before they are checked or stores new ones after they are gone.
+    """
+    stack = sqlalchemy.Table('stack', meta, autoload=True)
+    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
+    file_ref = sqlalchemy.Table('raw_template_file_ref', meta, autoload=True)
+    tmpl_file = sqlalchemy.Table('raw_template_file', meta, autoload=True)
+
+    with engine.begin() as conn:
+        if _reused_since(conn, raw_template, raw_template_id, time_line):
+            return
+
+        stmt = sqlalchemy.select([sqlalchemy.func.count(stack.c.id)]).\
+            where(stack.c.raw_template_id == raw_template_id)
+        if conn.execute(stmt).scalar():
+            return
+
+        stmt = sqlalchemy.select([file_ref.c.file_id]).\
+            where(file_ref.c.raw_template_id == raw_template_id)
+        file_ids = set(file_id for (file_id,) in conn.execute(stmt))
+
+        conn.execute(file_ref.delete().
+                     where(file_ref.c.raw_template_id == raw_template_id))
+        conn.execute(raw_template.delete().
+                     where(raw_template.c.id == raw_template_id))
+
+        for file_id in sorted(file_ids):
+            if _reused_since(conn, tmpl_file, file_id, time_line):
+                continue
+            stmt = sqlalchemy.select([sqlalchemy.func.count(file_ref.c.id)]).\
+                where(file_ref.c.file_id == file_id)
+            if not conn.execute(stmt).scalar():
+                conn.execute(tmpl_file.delete().
+                             where(tmpl_file.c.id == file_id))
+
+
 def purge_deleted(age, granularity='days'):
     try:
         age = int(age)
@@ -783,7 +1007,6 @@ def purge_deleted(age, granularity='days'):
 
     stack = sqlalchemy.Table('stack', meta, autoload=True)
     event = sqlalchemy.Table('event', meta, autoload=True)
-    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
     user_creds = sqlalchemy.Table('user_creds', meta, autoload=True)
 
     stmt = sqlalchemy.select([stack.c.id,
@@ -797,9 +1020,7 @@ def purge_deleted(age, granularity='days'):
         engine.execute(event_del)
         stack_del = stack.delete().where(stack.c.id == s[0])
         engine.execute(stack_del)
-        raw_template_del = raw_template.delete().\
-            where(raw_template.c.id == s[1])
-        engine.execute(raw_template_del)
+        _purge_raw_template(engine, meta, s[1], time_line)
         user_creds_del = user_creds.delete().where(user_creds.c.id == s[2])
         engine.execute(user_creds_del)
 
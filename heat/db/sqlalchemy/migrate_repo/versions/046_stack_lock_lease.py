@@ -0,0 +1,36 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    stack_lock = sqlalchemy.Table('stack_lock', meta, autoload=True)
+    expires_at = sqlalchemy.Column('expires_at', sqlalchemy.DateTime)
+    expires_at.create(stack_lock)
+
+    sqlalchemy.Index('ix_stack_lock_engine_id',
+                     stack_lock.c.engine_id).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    stack_lock = sqlalchemy.Table('stack_lock', meta, autoload=True)
+    sqlalchemy.Index('ix_stack_lock_engine_id',
+                     stack_lock.c.engine_id).drop(migrate_engine)
+    stack_lock.c.expires_at.drop()
@@ -0,0 +1,134 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+
+import sqlalchemy
+
+from heat.db.sqlalchemy import types as heat_db_types
+
+BATCH_SIZE = 100
+
+
+def _content_hash(*content):
+    return hashlib.sha1(json.dumps(content, sort_keys=True)).hexdigest()
+
+
+def _batches(migrate_engine, table):
+    last_id = 0
+    while True:
+        stmt = sqlalchemy.select([table.c.id, table.c.template,
+                                  table.c.files]).\
+            where(table.c.id > last_id).\
+            order_by(table.c.id).limit(BATCH_SIZE)
+        rows = migrate_engine.execute(stmt).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        yield rows
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
+    template_hash = sqlalchemy.Column('template_hash', sqlalchemy.String(40))
+    template_hash.create(raw_template)
+    sqlalchemy.Index('ix_raw_template_template_hash',
+                     raw_template.c.template_hash).create(migrate_engine)
+
+    tmpl_file = sqlalchemy.Table(
+        'raw_template_file', meta,
+        sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True,
+                          nullable=False),
+        sqlalchemy.Column('content_hash', sqlalchemy.String(40),
+                          index=True),
+        sqlalchemy.Column('contents', heat_db_types.LongText),
+        sqlalchemy.Column('created_at', sqlalchemy.DateTime),
+        sqlalchemy.Column('updated_at', sqlalchemy.DateTime),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+    tmpl_file.create()
+
+    file_ref = sqlalchemy.Table(
+        'raw_template_file_ref', meta,
+        sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True,
+                          nullable=False),
+        sqlalchemy.Column('name', sqlalchemy.Text),
+        sqlalchemy.Column('raw_template_id', sqlalchemy.Integer,
+                          sqlalchemy.ForeignKey('raw_template.id'),
+                          nullable=False),
+        sqlalchemy.Column('file_id', sqlalchemy.Integer,
+                          sqlalchemy.ForeignKey('raw_template_file.id'),
+                          nullable=False),
+        sqlalchemy.Column('created_at', sqlalchemy.DateTime),
+        sqlalchemy.Column('updated_at', sqlalchemy.DateTime),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+    file_ref.create()
+
+    # Move the files of the existing templates into the shared table
+    for rows in _batches(migrate_engine, raw_template):
+        for rt_id, template, files in rows:
+            files = json.loads(files) if files else {}
+            for name, contents in (files or {}).iteritems():
+                content_hash = _content_hash(contents)
+                stmt = sqlalchemy.select([tmpl_file.c.id]).\
+                    where(tmpl_file.c.content_hash == content_hash)
+                file_id = migrate_engine.execute(stmt).scalar()
+                if file_id is None:
+                    file_id = migrate_engine.execute(
+                        tmpl_file.insert(),
+                        content_hash=content_hash,
+                        contents=contents).inserted_primary_key[0]
+                migrate_engine.execute(file_ref.insert(), name=name,
+                                       raw_template_id=rt_id,
+                                       file_id=file_id)
+
+            template = json.loads(template) if template else None
+            migrate_engine.execute(
+                raw_template.update().where(raw_template.c.id == rt_id),
+                template_hash=_content_hash(template, files or {}),
+                files=json.dumps(None))
+
+
+def downgrade(migrate_engine):
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    raw_template = sqlalchemy.Table('raw_template', meta, autoload=True)
+    tmpl_file = sqlalchemy.Table('raw_template_file', meta, autoload=True)
+    file_ref = sqlalchemy.Table('raw_template_file_ref', meta, autoload=True)
+
+    # Copy the shared files back into each template
+    for rows in _batches(migrate_engine, raw_template):
+        for rt_id, template, files in rows:
+            files = (json.loads(files) if files else None) or {}
+            stmt = sqlalchemy.select([file_ref.c.name, tmpl_file.c.contents]).\
+                where(file_ref.c.file_id == tmpl_file.c.id).\
+                where(file_ref.c.raw_template_id == rt_id)
+            for name, contents in migrate_engine.execute(stmt):
+                files[name] = contents
+            migrate_engine.execute(
+                raw_template.update().where(raw_template.c.id == rt_id),
+                files=json.dumps(files))
+
+    file_ref.drop()
+    tmpl_file.drop()
+    sqlalchemy.Index('ix_raw_template_template_hash',
+                     raw_template.c.template_hash).drop(migrate_engine)
+    raw_template.c.template_hash.drop()
@@ -0,0 +1,78 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+from heat.db.sqlalchemy import types as heat_db_types
+
+BATCH_SIZE = 100
+
+# (table, columns, binary)
+COLUMNS = [
+    ('raw_template', ('template', 'files'), False),
+    ('raw_template_file', ('contents',), False),
+    ('resource', ('rsrc_metadata',), False),
+    ('software_config', ('config',), False),
+    ('event', ('resource_properties',), True),
+]
+
+
+def _convert(migrate_engine, convert):
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, column_names, binary in COLUMNS:
+        table = sqlalchemy.Table(table_name, meta, autoload=True)
+        columns = [table.c[name] for name in column_names]
+
+        last_id = 0
+        while True:
+            stmt = sqlalchemy.select([table.c.id] + columns).\
+                where(table.c.id > last_id).\
+                order_by(table.c.id).limit(BATCH_SIZE)
+            rows = migrate_engine.execute(stmt).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            for row in rows:
+                values = {}
+                for name, value in zip(column_names, row[1:]):
+                    if value is None:
+                        continue
+                    if binary:
+                        value = str(value)
+                    new_value = convert(value, binary)
+                    if new_value != value:
+                        values[name] = new_value
+                if values:
+                    migrate_engine.execute(
+                        table.update().where(table.c.id == row[0]), **values)
+
+
+def _compress(value, binary):
+    if heat_db_types.is_compressed(value):
+        return value
+    return heat_db_types.compress(value, binary=binary)
+
+
+def _decompress(value, binary):
+    return heat_db_types.decompress(value)
+
+
+def upgrade(migrate_engine):
+    _convert(migrate_engine, _compress)
+
+
+def downgrade(migrate_engine):
+    _convert(migrate_engine, _decompress)
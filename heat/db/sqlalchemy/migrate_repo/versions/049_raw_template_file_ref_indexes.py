@@ -0,0 +1,41 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy
+
+INDEXES = ('raw_template_id', 'file_id')
+
+
+def upgrade(migrate_engine):
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    file_ref = sqlalchemy.Table('raw_template_file_ref', meta, autoload=True)
+    for column in INDEXES:
+        sqlalchemy.Index('ix_raw_template_file_ref_%s' % column,
+                         file_ref.c[column]).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    # InnoDB uses these indexes for the foreign keys on the same columns, in
+    # place of the ones it created itself, so they can not be dropped there.
+    if migrate_engine.name == 'mysql':
+        return
+
+    meta = sqlalchemy.MetaData()
+    meta.bind = migrate_engine
+
+    file_ref = sqlalchemy.Table('raw_template_file_ref', meta, autoload=True)
+    for column in INDEXES:
+        sqlalchemy.Index('ix_raw_template_file_ref_%s' % column,
+                         file_ref.c[column]).drop(migrate_engine)
@@ -13,15 +13,33 @@
 
 import os
 
+from heat.db.sqlalchemy import types as heat_db_types
 from heat.openstack.common.db.sqlalchemy import migration as oslo_migration
 
 
 INIT_VERSION = 14
 
+# The first version whose code reads compressed columns
+COMPRESSION_VERSION = 48
+
 
 def db_sync(engine, version=None):
     path = os.path.join(os.path.abspath(os.path.dirname(__file__)),
                         'migrate_repo')
+
+    # Some earlier data migrations write through the current models, which
+    # would otherwise compress values the migrations after them parse.
+    target = COMPRESSION_VERSION - 1
+    if version is not None and str(version).isdigit():
+        target = min(int(version), target)
+    elif version is not None:
+        target = None
+    current = oslo_migration.db_version(engine, path, INIT_VERSION)
+    if target is not None and current < target:
+        with heat_db_types.uncompressed():
+            oslo_migration.db_sync(engine, path, target,
+                                   init_version=INIT_VERSION)
+
     return oslo_migration.db_sync(engine, path, version,
                                   init_version=INIT_VERSION)
 
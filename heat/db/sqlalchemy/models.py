@@ -19,9 +19,13 @@ import uuid
 import sqlalchemy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import backref
+from sqlalchemy.orm import deferred
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.session import Session
 
+from heat.db.sqlalchemy.types import CompressedJson
+from heat.db.sqlalchemy.types import CompressedLongText
+from heat.db.sqlalchemy.types import CompressedPickle
 from heat.db.sqlalchemy.types import Json
 from heat.openstack.common.db.sqlalchemy import models
 from heat.openstack.common import timeutils
@@ -103,8 +107,44 @@ class RawTemplate(BASE, HeatBase):
 
     __tablename__ = 'raw_template'
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
-    template = sqlalchemy.Column(Json)
-    files = sqlalchemy.Column(Json)
+    template = sqlalchemy.Column(CompressedJson)
+    template_hash = deferred(sqlalchemy.Column(sqlalchemy.String(40),
+                                               index=True))
+    # Files of templates stored before files were shared between templates
+    legacy_files = sqlalchemy.Column('files', CompressedJson)
+
+    @property
+    def files(self):
+        files = dict(self.legacy_files or {})
+        files.update((ref.name, ref.file.contents) for ref in self.file_refs)
+        return files
+
+
+class RawTemplateFile(BASE, HeatBase):
+    """Represents the contents of a file, shared by the templates using it."""
+
+    __tablename__ = 'raw_template_file'
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    content_hash = sqlalchemy.Column(sqlalchemy.String(40), index=True)
+    contents = sqlalchemy.Column(CompressedLongText)
+
+
+class RawTemplateFileRef(BASE, HeatBase):
+    """Represents the use of a file by a template, under a given name."""
+
+    __tablename__ = 'raw_template_file_ref'
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    name = sqlalchemy.Column(sqlalchemy.Text)
+    raw_template_id = sqlalchemy.Column(
+        sqlalchemy.Integer,
+        sqlalchemy.ForeignKey('raw_template.id'),
+        nullable=False, index=True)
+    raw_template = relationship(RawTemplate, backref=backref('file_refs'))
+    file_id = sqlalchemy.Column(
+        sqlalchemy.Integer,
+        sqlalchemy.ForeignKey('raw_template_file.id'),
+        nullable=False, index=True)
+    file = relationship(RawTemplateFile)
 
 
 class Stack(BASE, HeatBase, SoftDelete, StateAware):
@@ -147,7 +187,8 @@ class StackLock(BASE, HeatBase):
     stack_id = sqlalchemy.Column(sqlalchemy.String(36),
                                  sqlalchemy.ForeignKey('stack.id'),
                                  primary_key=True)
-    engine_id = sqlalchemy.Column(sqlalchemy.String(36))
+    engine_id = sqlalchemy.Column(sqlalchemy.String(36), index=True)
+    expires_at = sqlalchemy.Column(sqlalchemy.DateTime)
 
 
 class UserCreds(BASE, HeatBase):
@@ -191,7 +232,7 @@ class Event(BASE, HeatBase):
     _resource_status_reason = sqlalchemy.Column(
         'resource_status_reason', sqlalchemy.String(255))
     resource_type = sqlalchemy.Column(sqlalchemy.String(255))
-    resource_properties = sqlalchemy.Column(sqlalchemy.PickleType)
+    resource_properties = sqlalchemy.Column(CompressedPickle)
 
     @property
     def resource_status_reason(self):
@@ -232,7 +273,7 @@ class Resource(BASE, HeatBase, StateAware):
     name = sqlalchemy.Column('name', sqlalchemy.String(255), nullable=True)
     nova_instance = sqlalchemy.Column('nova_instance', sqlalchemy.String(255))
     # odd name as "metadata" is reserved
-    rsrc_metadata = sqlalchemy.Column('rsrc_metadata', Json)
+    rsrc_metadata = sqlalchemy.Column('rsrc_metadata', CompressedJson)
 
     stack_id = sqlalchemy.Column(sqlalchemy.String(36),
                                  sqlalchemy.ForeignKey('stack.id'),
@@ -294,7 +335,7 @@ class SoftwareConfig(BASE, HeatBase):
     name = sqlalchemy.Column('name', sqlalchemy.String(255),
                              nullable=True)
     group = sqlalchemy.Column('group', sqlalchemy.String(255))
-    config = sqlalchemy.Column('config', Json)
+    config = sqlalchemy.Column('config', CompressedJson)
     tenant = sqlalchemy.Column(
         'tenant', sqlalchemy.String(256), nullable=False)
 
@@ -341,3 +382,20 @@ class Snapshot(BASE, HeatBase):
     status = sqlalchemy.Column('status', sqlalchemy.String(255))
     status_reason = sqlalchemy.Column('status_reason', sqlalchemy.String(255))
     stack = relationship(Stack, backref=backref('snapshot'))
+
+
+class Service(BASE, HeatBase, SoftDelete):
+    """Represents a running engine, for multi-engine stack affinity."""
+
+    __tablename__ = 'service'
+
+    id = sqlalchemy.Column('id', sqlalchemy.String(36), primary_key=True,
+                           default=lambda: str(uuid.uuid4()))
+    engine_id = sqlalchemy.Column('engine_id', sqlalchemy.String(36),
+                                  nullable=False)
+    host = sqlalchemy.Column('host', sqlalchemy.String(255), nullable=False)
+    topic = sqlalchemy.Column('topic', sqlalchemy.String(255),
+                              nullable=False)
+    report_interval = sqlalchemy.Column('report_interval',
+                                        sqlalchemy.Integer,
+                                        nullable=False)
@@ -11,12 +11,65 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import contextlib
 from json import dumps
 from json import loads
+import pickle
+import zlib
 
 from sqlalchemy.dialects import mysql
 from sqlalchemy import types
 
+# Values at least this long are stored compressed
+COMPRESSION_THRESHOLD = 1024
+
+# The first character of a compressed value identifies its format. JSON text
+# and pickles never start with either, so values stored before compression
+# was introduced are still read back as they are.
+ZLIB_BASE64 = '\x01'
+ZLIB = '\x02'
+
+
+# Cleared while migrations that predate compressed columns write through
+# the models, so that the migrations after them can read the values back.
+_compression_enabled = True
+
+
+@contextlib.contextmanager
+def uncompressed():
+    """Store values uncompressed within the context."""
+    global _compression_enabled
+    enabled, _compression_enabled = _compression_enabled, False
+    try:
+        yield
+    finally:
+        _compression_enabled = enabled
+
+
+def compress(data, binary=False):
+    """Return the data compressed, if it is long enough to be worth it."""
+    if not _compression_enabled or len(data) < COMPRESSION_THRESHOLD:
+        return data
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    if binary:
+        return ZLIB + zlib.compress(data)
+    return ZLIB_BASE64 + base64.b64encode(zlib.compress(data))
+
+
+def is_compressed(data):
+    return bool(data) and data[0] in (ZLIB_BASE64, ZLIB)
+
+
+def decompress(data):
+    """Return the data uncompressed, whether it was compressed or not."""
+    if not is_compressed(data):
+        return data
+    if data[0] == ZLIB:
+        return zlib.decompress(data[1:])
+    return zlib.decompress(base64.b64decode(data[1:])).decode('utf-8')
+
 
 class LongText(types.TypeDecorator):
     impl = types.Text
@@ -37,15 +90,58 @@ class Json(LongText):
         return loads(value)
 
 
+class CompressedLongText(LongText):
+    """A LongText which is compressed when it is large."""
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress(value)
+
+
+class CompressedJson(CompressedLongText):
+    """A Json which is compressed when it is large."""
+
+    def process_bind_param(self, value, dialect):
+        return super(CompressedJson, self).process_bind_param(dumps(value),
+                                                              dialect)
+
+    def process_result_value(self, value, dialect):
+        return loads(super(CompressedJson, self).process_result_value(
+            value, dialect))
+
+
+class CompressedPickle(types.TypeDecorator):
+    """A PickleType which is compressed when it is large."""
+
+    impl = types.LargeBinary
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        binary=True)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return pickle.loads(decompress(value))
+
+
 def associate_with(sqltype):
     # TODO(leizhang) When we removed sqlalchemy 0.7 dependence
     # we can import MutableDict directly and remove ./mutable.py
     try:
         from sqlalchemy.ext.mutable import MutableDict as sa_MutableDict
-        sa_MutableDict.associate_with(Json)
+        sa_MutableDict.associate_with(sqltype)
     except ImportError:
         from heat.db.sqlalchemy.mutable import MutableDict
-        MutableDict.associate_with(Json)
+        MutableDict.associate_with(sqltype)
 
-associate_with(LongText)
 associate_with(Json)
+associate_with(CompressedJson)
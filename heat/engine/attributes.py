@@ -95,6 +95,20 @@ class Attribute(object):
         }
 
 
+class CompiledSchemata(dict):
+    """
+    A mapping of attribute names to Attribute objects for an attributes
+    schema, which may be shared read-only between Attributes objects.
+    """
+
+
+def compile_schemata(schema):
+    """Return compiled schemata for the given attributes schema."""
+    if isinstance(schema, CompiledSchemata):
+        return schema
+    return CompiledSchemata((n, Attribute(n, d)) for n, d in schema.items())
+
+
 class Attributes(collections.Mapping):
     """Models a collection of Resource Attributes."""
 
@@ -105,7 +119,7 @@ class Attributes(collections.Mapping):
 
     @staticmethod
     def _make_attributes(schema):
-        return dict((n, Attribute(n, d)) for n, d in schema.items())
+        return compile_schemata(schema)
 
     @staticmethod
     def as_outputs(resource_name, resource_class):
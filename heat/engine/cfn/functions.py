@@ -13,6 +13,7 @@
 
 import collections
 import json
+import re
 
 import six
 
@@ -109,7 +110,9 @@ class ResourceRef(function.Function):
                                                      key=path)
 
     def result(self):
-        return self._resource().FnGetRefId()
+        resource = self._resource()
+        self.depends_on(resource)
+        return resource.FnGetRefId()
 
 
 def Ref(stack, fn_name, args):
@@ -141,6 +144,9 @@ class GetAtt(function.Function):
                            "<attribute_name" ] }
     '''
 
+    # Attribute values can change without the resource's state changing
+    memoize = False
+
     def __init__(self, stack, fn_name, args):
         super(GetAtt, self).__init__(stack, fn_name, args)
 
@@ -359,14 +365,16 @@ class Replace(function.Function):
 
         "<value_1> <value_2>"
 
-    This is implemented using python str.replace on each key. The order in
-    which replacements are performed is undefined.
+    All keys are replaced in a single pass over the string, so values are
+    never themselves subject to replacement. Where keys overlap, the longest
+    matching key is replaced.
     '''
 
     def __init__(self, stack, fn_name, args):
         super(Replace, self).__init__(stack, fn_name, args)
 
         self._mapping, self._string = self._parse_args()
+        self._pattern = None
 
         if not isinstance(self._mapping, collections.Mapping):
             raise TypeError(_('"%s" parameters must be a mapping') %
@@ -402,9 +410,8 @@ class Replace(function.Function):
         if not isinstance(mapping, collections.Mapping):
             raise TypeError(_('"%s" params must be a map') % self.fn_name)
 
-        def replace(string, change):
-            placeholder, value = change
-
+        values = {}
+        for placeholder, value in mapping.iteritems():
             if not isinstance(placeholder, basestring):
                 raise TypeError(_('"%s" param placeholders must be strings') %
                                 self.fn_name)
@@ -416,9 +423,27 @@ class Replace(function.Function):
                 raise TypeError(_('"%s" params must be strings or numbers') %
                                 self.fn_name)
 
-            return string.replace(placeholder, unicode(value))
+            values[placeholder] = unicode(value)
+
+        if not values:
+            return template
 
-        return reduce(replace, mapping.iteritems(), template)
+        pattern = self._compile(values)
+        return pattern.sub(lambda match: values[match.group(0)], template)
+
+    def _compile(self, placeholders):
+        '''
+        Return a regular expression matching any of the placeholders.
+
+        Longer placeholders come first in the alternation, so that they take
+        precedence over any shorter ones that they begin with. The expression
+        is cached until the set of placeholders changes.
+        '''
+        keys = sorted(placeholders, key=lambda p: (-len(p), p))
+        if self._pattern is None or self._pattern[0] != keys:
+            regex = re.compile('|'.join(re.escape(k) for k in keys))
+            self._pattern = keys, regex
+        return self._pattern[1]
 
 
 class Base64(function.Function):
@@ -511,6 +536,9 @@ class ResourceFacade(function.Function):
     "UpdatePolicy".
     '''
 
+    # The facade resource belongs to the parent stack
+    memoize = False
+
     _RESOURCE_ATTRIBUTES = (
         METADATA, DELETION_POLICY, UPDATE_POLICY,
     ) = (
@@ -11,6 +11,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import functools
+import time
+import urlparse
+
+import eventlet
 from heatclient import client as heatclient
 from novaclient import client as novaclient
 from novaclient import shell as novashell
@@ -66,6 +72,220 @@ cloud_opts = [
                help="Fully qualified class name to use as a client backend.")
 ]
 cfg.CONF.register_opts(cloud_opts)
+cfg.CONF.import_opt('client_pool_size', 'heat.common.config')
+cfg.CONF.import_opt('client_pool_ttl', 'heat.common.config')
+cfg.CONF.import_opt('backend_request_rate', 'heat.common.config')
+cfg.CONF.import_opt('backend_rate_limit_retries', 'heat.common.config')
+
+_nova_extensions = None
+
+
+def nova_extensions():
+    '''
+    Return the novaclient extensions, discovering them only once per process.
+    '''
+    global _nova_extensions
+    if _nova_extensions is None:
+        computeshell = novashell.OpenStackComputeShell()
+        _nova_extensions = computeshell._discover_extensions("1.1")
+    return _nova_extensions
+
+
+class ClientPool(object):
+    '''
+    A process-wide cache of API clients, shared between stacks.
+
+    Clients are keyed by the service, endpoint and credentials they were
+    created with, so that every Stack loaded with the same request context
+    (or trust) reuses the same client and its keep-alive HTTP connections.
+    The least recently used clients are evicted once the pool is full, and
+    clients are recreated once they are older than client_pool_ttl seconds.
+    '''
+
+    def __init__(self):
+        self._clients = collections.OrderedDict()
+
+    def get(self, key, create):
+        ttl = cfg.CONF.client_pool_ttl
+        size = cfg.CONF.client_pool_size
+        if key is None or ttl <= 0 or size <= 0:
+            return create()
+
+        now = time.time()
+        try:
+            expiry, client = self._clients.pop(key)
+        except KeyError:
+            pass
+        else:
+            if now < expiry:
+                self._clients[key] = expiry, client
+                return client
+
+        client = create()
+        if client is not None:
+            self._clients[key] = now + ttl, client
+            while len(self._clients) > size:
+                self._clients.popitem(last=False)
+        return client
+
+    def clear(self):
+        self._clients.clear()
+
+
+_pool = ClientPool()
+
+
+def pooled(getter):
+    '''
+    Decorator for OpenStackClients methods returning a client that may be
+    shared with other OpenStackClients instances through the client pool.
+    '''
+    @functools.wraps(getter)
+    def get_client(self, *args, **kwargs):
+        key = self._pool_key(getter.__name__, *args, **kwargs)
+        return _pool.get(key, lambda: getter(self, *args, **kwargs))
+
+    return get_client
+
+
+class RateLimiter(object):
+    '''
+    An adaptive token bucket limiting the rate of requests to an endpoint.
+
+    The bucket holds up to one second's worth of requests at the current
+    rate. Each time the endpoint reports that it is over its rate limit the
+    rate is halved and no requests are sent until any Retry-After period has
+    passed; each successful request then raises the rate again, by a
+    hundredth of the configured maximum, until the maximum is reached.
+    '''
+
+    MIN_RATE = 0.1
+
+    def __init__(self, max_rate):
+        self.max_rate = float(max_rate)
+        self.rate = self.max_rate
+        self.tokens = self.max_rate
+        self.updated = time.time()
+        self.hold_until = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.rate,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        '''Wait until a request may be sent to the endpoint.'''
+        while True:
+            now = time.time()
+            self._refill(now)
+            if now >= self.hold_until and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = max(self.hold_until - now,
+                       (1 - self.tokens) / self.rate)
+            eventlet.sleep(wait)
+
+    def throttle(self, retry_after=0):
+        '''Slow down after the endpoint rejected a request.'''
+        now = time.time()
+        self._refill(now)
+        self.rate = max(self.rate / 2, self.MIN_RATE)
+        self.tokens = 0
+        self.hold_until = max(self.hold_until, now + retry_after)
+        logger.warning(_('Rate limited by backend API, reducing request rate '
+                         'to %.1f/s') % self.rate)
+
+    def relax(self):
+        '''Speed up again after a request succeeded.'''
+        if self.rate < self.max_rate:
+            self.rate = min(self.rate + self.max_rate / 100.0, self.max_rate)
+
+
+_rate_limiters = {}
+
+
+def rate_limiter(url, tenant_id=None):
+    '''
+    Return the RateLimiter for a tenant's requests to the endpoint of a URL,
+    shared by all of that tenant's stacks handled by this engine, or None if
+    rate limiting is disabled.
+    '''
+    max_rate = cfg.CONF.backend_request_rate
+    if max_rate <= 0:
+        return None
+
+    key = (tenant_id, urlparse.urlparse(url).netloc)
+    limiter = _rate_limiters.get(key)
+    if limiter is None or limiter.max_rate != max_rate:
+        limiter = _rate_limiters[key] = RateLimiter(max_rate)
+    return limiter
+
+
+def _retry_after(value):
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _rate_limit_delay(status, retry_after):
+    '''
+    Return the number of seconds to hold off for if a response indicates that
+    the request was rate limited, or None if it does not.
+
+    A 429 is always a rate limit. A 413 is also returned for other reasons
+    (e.g. an exceeded quota), so it is only treated as a rate limit when the
+    endpoint asks for the request to be retried later.
+    '''
+    delay = _retry_after(retry_after)
+    if status == 429 or (status == 413 and delay > 0):
+        return delay
+    return None
+
+
+def rate_limited(request, tenant_id=None):
+    '''
+    Wrap the request method of a client's HTTP client so that requests wait
+    for the tenant's RateLimiter for the endpoint, and are retried after the
+    rate has been reduced when the endpoint responds that the request was
+    rate limited.
+
+    Clients either raise an exception for these responses (Nova, Cinder,
+    Trove) or return the response to the caller (Neutron); both are handled.
+    '''
+    def limited_request(url, method, **kwargs):
+        limiter = rate_limiter(url, tenant_id)
+        if limiter is None:
+            return request(url, method, **kwargs)
+
+        retries = cfg.CONF.backend_rate_limit_retries
+        for attempt in range(retries + 1):
+            limiter.acquire()
+            try:
+                resp, body = request(url, method, **kwargs)
+            except Exception as exc:
+                status = getattr(exc, 'http_status', getattr(exc, 'code',
+                                                             None))
+                delay = _rate_limit_delay(status,
+                                          getattr(exc, 'retry_after', None))
+                if delay is None:
+                    raise
+                limiter.throttle(delay)
+                if attempt == retries:
+                    raise
+            else:
+                delay = None
+                if hasattr(resp, 'status'):
+                    delay = _rate_limit_delay(resp.status,
+                                              resp.get('retry-after'))
+                if delay is None:
+                    limiter.relax()
+                    return resp, body
+                limiter.throttle(delay)
+                if attempt == retries:
+                    return resp, body
+
+    return limited_request
 
 
 class OpenStackClients(object):
@@ -100,14 +320,24 @@ class OpenStackClients(object):
     def url_for(self, **kwargs):
         return self.keystone().url_for(**kwargs)
 
+    def _pool_key(self, service, *args, **kwargs):
+        '''
+        Return the key identifying a client in the client pool, or None if
+        the context carries neither a token nor a trust to identify it by.
+        '''
+        con = self.context
+        credentials = con.auth_token or getattr(con, 'trust_id', None)
+        if not credentials:
+            return None
+        return (service, args, tuple(sorted(kwargs.items())),
+                con.auth_url, con.tenant_id, credentials)
+
+    @pooled
     def nova(self, service_type='compute'):
         if service_type in self._nova:
             return self._nova[service_type]
 
         con = self.context
-        computeshell = novashell.OpenStackComputeShell()
-        extensions = computeshell._discover_extensions("1.1")
-
         endpoint_type = self._get_client_option('nova', 'endpoint_type')
         args = {
             'project_id': con.tenant,
@@ -115,13 +345,15 @@ class OpenStackClients(object):
             'service_type': service_type,
             'username': None,
             'api_key': None,
-            'extensions': extensions,
+            'extensions': nova_extensions(),
             'endpoint_type': endpoint_type,
             'cacert': self._get_client_option('nova', 'ca_file'),
             'insecure': self._get_client_option('nova', 'insecure')
         }
 
         client = novaclient.Client(1.1, **args)
+        client.client.request = rate_limited(client.client.request,
+                                             con.tenant_id)
 
         management_url = self.url_for(service_type=service_type,
                                       endpoint_type=endpoint_type)
@@ -131,6 +363,7 @@ class OpenStackClients(object):
         self._nova[service_type] = client
         return client
 
+    @pooled
     def swift(self):
         if swiftclient is None:
             return None
@@ -155,6 +388,7 @@ class OpenStackClients(object):
         self._swift = swiftclient.Connection(**args)
         return self._swift
 
+    @pooled
     def glance(self):
         if glanceclient is None:
             return None
@@ -180,6 +414,7 @@ class OpenStackClients(object):
         self._glance = glanceclient.Client('1', endpoint, **args)
         return self._glance
 
+    @pooled
     def neutron(self):
         if neutronclient is None:
             return None
@@ -204,9 +439,12 @@ class OpenStackClients(object):
         }
 
         self._neutron = neutronclient.Client(**args)
+        http = self._neutron.httpclient
+        http.request = rate_limited(http.request, con.tenant_id)
 
         return self._neutron
 
+    @pooled
     def cinder(self):
         if cinderclient is None:
             return self.nova('volume')
@@ -227,6 +465,8 @@ class OpenStackClients(object):
         }
 
         self._cinder = cinderclient.Client('1', **args)
+        self._cinder.client.request = rate_limited(
+            self._cinder.client.request, con.tenant_id)
         management_url = self.url_for(service_type='volume',
                                       endpoint_type=endpoint_type)
         self._cinder.client.auth_token = self.auth_token
@@ -234,6 +474,7 @@ class OpenStackClients(object):
 
         return self._cinder
 
+    @pooled
     def trove(self, service_type="database"):
         if troveclient is None:
             return None
@@ -254,6 +495,8 @@ class OpenStackClients(object):
         }
 
         self._trove = troveclient.Client('1.0', **args)
+        self._trove.client.request = rate_limited(self._trove.client.request,
+                                                  con.tenant_id)
         management_url = self.url_for(service_type=service_type,
                                       endpoint_type=endpoint_type)
         self._trove.client.auth_token = con.auth_token
@@ -261,6 +504,7 @@ class OpenStackClients(object):
 
         return self._trove
 
+    @pooled
     def ceilometer(self):
         if ceilometerclient is None:
             return None
@@ -305,6 +549,7 @@ class OpenStackClients(object):
             heat_url = heat_url % {'tenant_id': tenant_id}
         return heat_url
 
+    @pooled
     def heat(self):
         if self._heat:
             return self._heat
@@ -14,7 +14,9 @@
 import collections
 import numbers
 import re
+import time
 
+from oslo.config import cfg
 import six
 
 from heat.engine import clients
@@ -22,6 +24,8 @@ from heat.engine import resources
 
 from heat.common import exception
 
+cfg.CONF.import_opt('constraint_cache_ttl', 'heat.common.config')
+
 
 class InvalidSchemaError(exception.Error):
     pass
@@ -523,7 +527,46 @@ class CustomConstraint(Constraint):
         constraint = self.custom_constraint
         if not constraint:
             return False
-        return constraint.validate(value, context)
+
+        key = None
+        if cfg.CONF.constraint_cache_ttl > 0:
+            key = self._cache_key(value, context)
+        if key is not None and _valid_values.get(key, 0) > time.time():
+            return True
+
+        valid = constraint.validate(value, context)
+        if valid and key is not None:
+            _cache_valid_value(key)
+        return valid
+
+    def _cache_key(self, value, context):
+        tenant_id = getattr(context, 'tenant_id', None)
+        if tenant_id is None:
+            return None
+        key = (tenant_id, self.name, value)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+
+# Expiry times of values that passed custom constraint checks, keyed by
+# tenant, constraint name and value
+_valid_values = {}
+
+_VALID_VALUES_MAX = 1000
+
+
+def _cache_valid_value(key):
+    now = time.time()
+    if len(_valid_values) >= _VALID_VALUES_MAX:
+        for k, expiry in _valid_values.items():
+            if expiry <= now:
+                del _valid_values[k]
+        if len(_valid_values) >= _VALID_VALUES_MAX:
+            _valid_values.clear()
+    _valid_values[key] = now + cfg.CONF.constraint_cache_ttl
 
 
 class BaseCustomConstraint(object):
@@ -152,6 +152,8 @@ class ResourceRegistry(object):
     def __init__(self, global_registry):
         self._registry = {'resources': {}}
         self.global_registry = global_registry
+        # Incremented whenever the registry is changed
+        self.version = 0
 
     def load(self, json_snippet):
         self._load_registry([], json_snippet)
@@ -176,6 +178,7 @@ class ResourceRegistry(object):
         """
         descriptive_path = '/'.join(path)
         name = path[-1]
+        self.version += 1
         # create the structure if needed
         registry = self._registry
         for key in path[:-1]:
@@ -13,6 +13,8 @@
 
 import abc
 import collections
+import contextlib
+import functools
 
 
 class Function(object):
@@ -22,6 +24,13 @@ class Function(object):
 
     __metaclass__ = abc.ABCMeta
 
+    # Whether the result may be reused within a resolution pass. Functions
+    # whose result depends on anything other than their arguments, the
+    # stack's parameters and the state of the resources they reference must
+    # set this to False. Their result is then recalculated to check whether
+    # the memoised results of the functions using them are still valid.
+    memoize = True
+
     def __init__(self, stack, fn_name, args):
         """
         Initialise with a Stack, the function name and the arguments.
@@ -54,6 +63,18 @@ class Function(object):
         """
         return {self.fn_name: self.args}
 
+    def depends_on(self, resource):
+        """
+        Record that the result of this function depends on a resource.
+
+        Function subclasses that read from a resource must call this, so
+        that a memoised result is discarded when the resource's state
+        changes.
+        """
+        memo = getattr(self.stack, 'resolution_pass', None)
+        if isinstance(memo, ResolutionPass):
+            memo.depends_on(resource)
+
     def __reduce__(self):
         """
         Return a representation of the function suitable for pickling.
@@ -107,9 +128,100 @@ class Function(object):
         return not eq
 
 
+class ResolutionPass(object):
+    """
+    Memoise the results of functions for the duration of a resolution.
+
+    Each result is stored along with the state of the resources it was
+    calculated from and the results of any functions it used that can not
+    be memoised, and is recalculated once any of those changes.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self._results = {}
+        self._frames = []
+
+    @staticmethod
+    def _state(resource):
+        return resource.action, resource.status, resource.resource_id
+
+    def _add_dependencies(self, deps):
+        if self._frames:
+            self._frames[-1].extend(deps)
+
+    def depends_on(self, resource):
+        self._add_dependencies([(functools.partial(self._state, resource),
+                                 self._state(resource))])
+
+    def uncached_result(self, func):
+        result = func.result()
+        self._add_dependencies([(func.result, result)])
+        return result
+
+    def _unchanged(self, deps):
+        # Anything recorded while checking is already in deps
+        self._frames.append([])
+        try:
+            return all(current() == state for current, state in deps)
+        finally:
+            self._frames.pop()
+
+    def result(self, func):
+        memo = self._results.get(id(func))
+        if memo is not None:
+            f, deps, result = memo
+            if self._unchanged(deps):
+                self._add_dependencies(deps)
+                return result
+
+        self._frames.append([])
+        try:
+            result = func.result()
+        finally:
+            deps = self._frames.pop()
+
+        # Hold a reference to the function, so its id is not reused
+        self._results[id(func)] = func, deps, result
+        self._add_dependencies(deps)
+        return result
+
+
+@contextlib.contextmanager
+def resolution_pass(stack):
+    """
+    Memoise the results of the stack's functions within the context.
+
+    Contexts may be nested; the memoised results are discarded once the
+    outermost of them exits. A context must not span a yield, since the
+    attributes of resources can change while other tasks run.
+    """
+    memo = getattr(stack, 'resolution_pass', None)
+    if not isinstance(memo, ResolutionPass):
+        memo = ResolutionPass()
+        stack.resolution_pass = memo
+
+    memo.depth += 1
+    try:
+        yield memo
+    finally:
+        memo.depth -= 1
+        if memo.depth == 0 and stack.resolution_pass is memo:
+            stack.resolution_pass = None
+
+
+def _result(func):
+    memo = getattr(func.stack, 'resolution_pass', None)
+    if not isinstance(memo, ResolutionPass):
+        return func.result()
+    if func.memoize:
+        return memo.result(func)
+    return memo.uncached_result(func)
+
+
 def resolve(snippet):
     while isinstance(snippet, Function):
-        snippet = snippet.result()
+        snippet = _result(snippet)
 
     if isinstance(snippet, collections.Mapping):
         return dict((k, resolve(v)) for k, v in snippet.items())
@@ -151,8 +151,9 @@ class Replace(cfn_funcs.Replace):
 
         "<value_1> <value_2>"
 
-    This is implemented using Python's str.replace on each key. The order in
-    which replacements are performed is undefined.
+    All keys are replaced in a single pass over the template, so values are
+    never themselves subject to replacement. Where keys overlap, the longest
+    matching key is replaced.
     '''
 
     def _parse_args(self):
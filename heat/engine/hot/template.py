@@ -65,11 +65,14 @@ class HOTemplate(template.Template):
         # a section into CFN format (case, naming, etc) so the rest of the
         # engine can cope with it.
         # This is a shortcut for now and might be changed in the future.
-        if section == self.RESOURCES:
-            return self._translate_resources(the_section)
-
-        if section == self.OUTPUTS:
-            return self._translate_outputs(the_section)
+        if section in (self.RESOURCES, self.OUTPUTS):
+            if section not in self._sections:
+                if section == self.RESOURCES:
+                    translated = self._translate_resources(the_section)
+                else:
+                    translated = self._translate_outputs(the_section)
+                self._sections[section] = translated
+            return self._sections[section]
 
         return the_section
 
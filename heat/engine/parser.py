@@ -32,6 +32,7 @@ from heat.engine.notification import stack as notification
 from heat.engine.parameter_groups import ParameterGroups
 from heat.engine import resource
 from heat.engine import resources
+from heat.engine.resources import nova_utils
 from heat.engine import scheduler
 from heat.engine.template import Template
 from heat.engine import update
@@ -89,6 +90,7 @@ class Stack(collections.Mapping):
         self._dependencies = None
         self._access_allowed_handlers = {}
         self._db_resources = None
+        self.resolution_pass = None
         self.adopt_stack_data = adopt_stack_data
         self.stack_user_project_id = stack_user_project_id
         self.created_time = created_time
@@ -518,7 +520,7 @@ class Stack(collections.Mapping):
             return self.load(self.context, stack=s)
         elif create_if_missing:
             templ = Template.load(self.context, self.t.id)
-            templ.files = copy.deepcopy(self.t.files)
+            templ.files = copy.copy(self.t.files)
             prev = type(self)(self.context, self.name, templ, self.env,
                               owner_id=self.id)
             prev.store(backup=True)
@@ -799,9 +801,8 @@ class Stack(collections.Mapping):
 
     def get_availability_zones(self):
         if self._zones is None:
-            self._zones = [
-                zone.zoneName for zone in
-                self.clients.nova().availability_zones.list(detailed=False)]
+            self._zones = nova_utils.get_availability_zones(
+                self.clients.nova())
         return self._zones
 
     def set_stack_user_project_id(self, project_id):
@@ -12,6 +12,7 @@
 #    under the License.
 
 import collections
+import copy
 
 import six
 
@@ -165,6 +166,23 @@ def schemata(schema_dicts):
     return dict((n, Schema.from_legacy(s)) for n, s in schema_dicts.items())
 
 
+class CompiledSchemata(dict):
+    """
+    A mapping of property names to Property objects for a properties schema.
+
+    Compiled schemata hold no per-resource state, so a single instance may be
+    shared, read-only, between any number of Properties objects.
+    """
+
+
+def compile_schemata(schema_dicts):
+    """Return compiled schemata for the given properties schema."""
+    if isinstance(schema_dicts, CompiledSchemata):
+        return schema_dicts
+    return CompiledSchemata((n, Property(s, n))
+                            for n, s in schema_dicts.items())
+
+
 class Property(object):
 
     def __init__(self, schema, name=None, context=None):
@@ -172,6 +190,20 @@ class Property(object):
         self.name = name
         self.context = context
 
+        validators = {
+            Schema.STRING: self._validate_string,
+            Schema.INTEGER: self._validate_integer,
+            Schema.NUMBER: self._validate_number,
+            Schema.MAP: self._validate_map,
+            Schema.LIST: self._validate_list,
+            Schema.BOOLEAN: self._validate_bool,
+        }
+        self._validate_type = validators.get(self.schema.type,
+                                             lambda value: None)
+        if self.schema.schema is not None:
+            self._child_schemata = compile_schemata(dict(self.schema.schema))
+            self._item_properties = []
+
     def required(self):
         return self.schema.required
 
@@ -215,28 +247,43 @@ class Property(object):
             raise ValueError(_('Value must be a string'))
         return value
 
-    def _validate_children(self, child_values, keys=None):
+    def _item_property(self, index):
+        if isinstance(self.schema.schema, constr.AnyIndexDict):
+            # Every item has the same schema, so they share one Property
+            return self._child_schemata[constr.AnyIndexDict.ANYTHING]
+        while len(self._item_properties) <= index:
+            i = len(self._item_properties)
+            self._item_properties.append(Property(self.schema.schema[i], i))
+        return self._item_properties[index]
+
+    def _validate_children(self, child_values, keys=None, context=None,
+                           name=None):
         if self.schema.schema is not None:
             if keys is None:
-                keys = list(self.schema.schema)
-            schemata = dict((k, self.schema.schema[k]) for k in keys)
+                keys = list(self._child_schemata)
+                schemata = self._child_schemata
+            else:
+                schemata = CompiledSchemata((k, self._item_property(k))
+                                            for k in keys)
             properties = Properties(schemata, dict(child_values),
-                                    parent_name=self.name,
-                                    context=self.context)
+                                    parent_name=name,
+                                    context=context)
             properties.validate()
             return ((k, properties[k]) for k in keys)
         else:
             return child_values
 
-    def _validate_map(self, value):
+    def _validate_map(self, value, context=None, name=None):
         if value is None:
             value = self.has_default() and self.default() or {}
         if not isinstance(value, collections.Mapping):
             raise TypeError(_('"%s" is not a map') % value)
 
-        return dict(self._validate_children(value.iteritems()))
+        return dict(self._validate_children(value.iteritems(),
+                                            context=context,
+                                            name=name))
 
-    def _validate_list(self, value):
+    def _validate_list(self, value, context=None, name=None):
         if value is None:
             value = self.has_default() and self.default() or []
         if (not isinstance(value, collections.Sequence) or
@@ -244,7 +291,8 @@ class Property(object):
             raise TypeError(_('"%s" is not a list') % repr(value))
 
         return [v[1] for v in self._validate_children(enumerate(value),
-                                                      range(len(value)))]
+                                                      range(len(value)),
+                                                      context, name)]
 
     def _validate_bool(self, value):
         if value is None:
@@ -257,35 +305,43 @@ class Property(object):
 
         return normalised == 'true'
 
-    def _validate_data_type(self, value):
-        t = self.type()
-        if t == Schema.STRING:
-            return self._validate_string(value)
-        elif t == Schema.INTEGER:
-            return self._validate_integer(value)
-        elif t == Schema.NUMBER:
-            return self._validate_number(value)
-        elif t == Schema.MAP:
-            return self._validate_map(value)
-        elif t == Schema.LIST:
-            return self._validate_list(value)
-        elif t == Schema.BOOLEAN:
-            return self._validate_bool(value)
-
-    def validate_data(self, value):
-        value = self._validate_data_type(value)
-        self.schema.validate_constraints(value, self.context)
+    def _validate_data_type(self, value, context=None, name=None):
+        if self.schema.type in (Schema.MAP, Schema.LIST):
+            return self._validate_type(value, context, name)
+        return self._validate_type(value)
+
+    def validate_data(self, value, context=None, name=None):
+        """
+        Return the validated form of the data for this property.
+
+        The items of a list share a single Property, so the name to report
+        errors under may be given; it defaults to the property's own name.
+        """
+        if context is None:
+            context = self.context
+        if name is None:
+            name = self.name
+        value = self._validate_data_type(value, context, name)
+        self.schema.validate_constraints(value, context)
         return value
 
 
+def _copy(value):
+    """Return a copy of a value that is safe to modify in place."""
+    if isinstance(value, (collections.Mapping, list)):
+        return copy.deepcopy(value)
+    return value
+
+
 class Properties(collections.Mapping):
 
     def __init__(self, schema, data, resolver=lambda d: d, parent_name=None,
                  context=None):
-        self.props = dict((k, Property(s, k, context))
-                          for k, s in schema.items())
+        self.props = compile_schemata(schema)
         self.resolve = resolver
         self.data = data
+        # Validated values, along with the resolved data they came from
+        self._validated = {}
         if parent_name is None:
             self.error_prefix = ''
         else:
@@ -335,7 +391,7 @@ class Properties(collections.Mapping):
         if key in self.data:
             try:
                 value = self.resolve(self.data[key])
-                return prop.validate_data(value)
+                return self._validated_value(key, prop, value)
             # the resolver function could raise any number of exceptions,
             # so handle this generically
             except Exception as e:
@@ -347,6 +403,21 @@ class Properties(collections.Mapping):
             raise ValueError(_('%(prefix)sProperty %(key)s not assigned') %
                              {'prefix': self.error_prefix, 'key': key})
 
+    def _validated_value(self, key, prop, value):
+        """
+        Return the validated form of the resolved data for a property.
+
+        Validation is repeated only when the resolved data has changed since
+        the last time the property was read.
+        """
+        cached = self._validated.get(key)
+        if (cached is None or type(cached[0]) is not type(value) or
+                cached[0] != value):
+            cached = (_copy(value),
+                      _copy(prop.validate_data(value, self.context, key)))
+            self._validated[key] = cached
+        return _copy(cached[1])
+
     def __len__(self):
         return len(self.props)
 
@@ -21,9 +21,11 @@ from heat.common import exception
 from heat.common import identifier
 from heat.common import short_id
 from heat.db import api as db_api
+from heat.engine import attributes
 from heat.engine.attributes import Attributes
 from heat.engine import event
 from heat.engine import function
+from heat.engine import properties
 from heat.engine.properties import Properties
 from heat.engine import resources
 from heat.engine import scheduler
@@ -115,8 +117,10 @@ class Resource(object):
         self.name = name
         self.json_snippet = json_snippet
         self.reparse()
+        schema = self._compiled_schemata('attributes_schema',
+                                         attributes.compile_schemata)
         self.attributes = Attributes(self.name,
-                                     self.attributes_schema,
+                                     schema,
                                      self._resolve_attribute)
 
         self.abandon_in_progress = False
@@ -153,12 +157,33 @@ class Resource(object):
 
     def reparse(self):
         self.t = self.stack.resolve_static_data(self.json_snippet)
-        self.properties = Properties(self.properties_schema,
+        schema = self._compiled_schemata('properties_schema',
+                                         properties.compile_schemata)
+        self.properties = Properties(schema,
                                      self.t.get('Properties', {}),
                                      function.resolve,
                                      self.name,
                                      self.context)
 
+    def _compiled_schemata(self, schema_attr, compile_schemata):
+        '''
+        Return the compiled form of a schema attribute.
+
+        Schemata defined by the resource class are compiled once and shared
+        by all of its instances.
+        '''
+        schema = getattr(self, schema_attr)
+        if schema_attr in self.__dict__:
+            return compile_schemata(schema)
+
+        cls = type(self)
+        cache_attr = '_compiled_%s' % schema_attr
+        source, compiled = cls.__dict__.get(cache_attr, (None, None))
+        if source is not schema:
+            compiled = compile_schemata(schema)
+            setattr(cls, cache_attr, (schema, compiled))
+        return compiled
+
     def __eq__(self, other):
         '''Allow == comparison of two resources.'''
         # For the purposes of comparison, we declare two resource objects
@@ -367,6 +392,12 @@ class Resource(object):
         '''
         assert action in self.ACTIONS, 'Invalid action %s' % action
 
+        def resolving(func, *args):
+            # Memoise function results only between yields, since other
+            # resources change while this task is suspended
+            with function.resolution_pass(self.stack):
+                return func(*args)
+
         try:
             self.state_set(action, self.IN_PROGRESS)
 
@@ -375,15 +406,15 @@ class Resource(object):
             check = getattr(self, 'check_%s_complete' % action_l, None)
 
             if callable(pre_func):
-                pre_func()
+                resolving(pre_func)
 
             handle_data = None
             if callable(handle):
-                handle_data = (handle(resource_data) if resource_data else
-                               handle())
+                handle_data = (resolving(handle, resource_data)
+                               if resource_data else resolving(handle))
                 yield
                 if callable(check):
-                    while not check(handle_data):
+                    while not resolving(check, handle_data):
                         yield
         except Exception as ex:
             logger.exception('%s : %s' % (action, str(self)))
@@ -617,7 +648,8 @@ class Resource(object):
 
         function.validate(self.t)
         self.validate_deletion_policy(self.t)
-        return self.properties.validate()
+        with function.resolution_pass(self.stack):
+            return self.properties.validate()
 
     @classmethod
     def validate_deletion_policy(cls, template):
@@ -11,6 +11,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 import json
 import math
@@ -167,6 +168,9 @@ class InstanceGroup(stack_resource.StackResource):
                                         self.t.get('UpdatePolicy', {}),
                                         parent_name=self.name,
                                         context=self.context)
+        # Names of the load balancers waiting to be reloaded at the end of
+        # the scaling action in progress, if any
+        self._lb_pending = None
 
     def validate(self):
         """
@@ -247,15 +251,16 @@ class InstanceGroup(stack_resource.StackResource):
                                          self.name,
                                          self.context)
 
-            # Replace instances first if launch configuration has changed
-            self._try_rolling_update(prop_diff)
+            with self._lb_reload_coalesced():
+                # Replace instances first if launch configuration has changed
+                self._try_rolling_update(prop_diff)
 
-            # Get the current capacity, we may need to adjust if
-            # Size has changed
-            if self.SIZE in prop_diff:
-                inst_list = self.get_instances()
-                if len(inst_list) != self.properties[self.SIZE]:
-                    self.resize(self.properties[self.SIZE])
+                # Get the current capacity, we may need to adjust if
+                # Size has changed
+                if self.SIZE in prop_diff:
+                    inst_list = self.get_instances()
+                    if len(inst_list) != self.properties[self.SIZE]:
+                        self.resize(self.properties[self.SIZE])
 
     def _tags(self):
         """
@@ -363,7 +368,7 @@ class InstanceGroup(stack_resource.StackResource):
                 self.check_update_complete(updater)
                 remainder -= efft_bat_sz
                 if remainder > 0 and pause_sec > 0:
-                    self._lb_reload()
+                    self._lb_reload(defer=False)
                     waiter = scheduler.TaskRunner(pause_between_batch)
                     waiter(timeout=pause_sec)
         finally:
@@ -386,18 +391,50 @@ class InstanceGroup(stack_resource.StackResource):
             # nodes.
             self._lb_reload()
 
-    def _lb_reload(self, exclude=[]):
+    @contextlib.contextmanager
+    def _lb_reload_coalesced(self):
+        '''
+        Defer the load balancer reloads requested during a scaling action,
+        so that each load balancer is reloaded only once, when it ends.
+        '''
+        if self._lb_pending is not None:
+            # Already within a scaling action, which will do the reload
+            yield
+            return
+
+        self._lb_pending = set()
+        try:
+            yield
+        finally:
+            pending, self._lb_pending = self._lb_pending, None
+            if pending:
+                self._lb_reload_now(sorted(pending))
+
+    def _lb_reload(self, exclude=[], defer=True):
         '''
         Notify the LoadBalancer to reload its config to include
         the changes in instances we have just made.
 
         This must be done after activation (instance in ACTIVE state),
         otherwise the instances' IP addresses may not be available.
+
+        During a scaling action, the reload is deferred until the action
+        ends unless some instances are to be excluded or defer is False.
         '''
-        if self.properties[self.LOAD_BALANCER_NAMES]:
+        lb_names = self.properties[self.LOAD_BALANCER_NAMES] or []
+        if self._lb_pending is not None and defer and not exclude:
+            self._lb_pending.update(lb_names)
+            return
+
+        if self._lb_pending is not None and not exclude:
+            self._lb_pending.difference_update(lb_names)
+        self._lb_reload_now(lb_names, exclude)
+
+    def _lb_reload_now(self, lb_names, exclude=[]):
+        if lb_names:
             id_list = [inst.FnGetRefId() for inst in self.get_instances()
                        if inst.FnGetRefId() not in exclude]
-            for lb in self.properties[self.LOAD_BALANCER_NAMES]:
+            for lb in lb_names:
                 lb_resource = self.stack[lb]
                 lb_defn = copy.deepcopy(lb_resource.t)
                 if 'Instances' in lb_resource.properties_schema:
@@ -596,27 +633,28 @@ class AutoScalingGroup(InstanceGroup, CooldownMixin):
                                          self.name,
                                          self.context)
 
-            # Replace instances first if launch configuration has changed
-            self._try_rolling_update(prop_diff)
-
-            # Get the current capacity, we may need to adjust if
-            # MinSize or MaxSize has changed
-            capacity = len(self.get_instances())
-
-            # Figure out if an adjustment is required
-            new_capacity = None
-            if self.MIN_SIZE in prop_diff:
-                if capacity < self.properties[self.MIN_SIZE]:
-                    new_capacity = self.properties[self.MIN_SIZE]
-            if self.MAX_SIZE in prop_diff:
-                if capacity > self.properties[self.MAX_SIZE]:
-                    new_capacity = self.properties[self.MAX_SIZE]
-            if self.DESIRED_CAPACITY in prop_diff:
-                if self.properties[self.DESIRED_CAPACITY] is not None:
-                    new_capacity = self.properties[self.DESIRED_CAPACITY]
-
-            if new_capacity is not None:
-                self.adjust(new_capacity, adjustment_type=EXACT_CAPACITY)
+            with self._lb_reload_coalesced():
+                # Replace instances first if launch configuration has changed
+                self._try_rolling_update(prop_diff)
+
+                # Get the current capacity, we may need to adjust if
+                # MinSize or MaxSize has changed
+                capacity = len(self.get_instances())
+
+                # Figure out if an adjustment is required
+                new_capacity = None
+                if self.MIN_SIZE in prop_diff:
+                    if capacity < self.properties[self.MIN_SIZE]:
+                        new_capacity = self.properties[self.MIN_SIZE]
+                if self.MAX_SIZE in prop_diff:
+                    if capacity > self.properties[self.MAX_SIZE]:
+                        new_capacity = self.properties[self.MAX_SIZE]
+                if self.DESIRED_CAPACITY in prop_diff:
+                    if self.properties[self.DESIRED_CAPACITY] is not None:
+                        new_capacity = self.properties[self.DESIRED_CAPACITY]
+
+                if new_capacity is not None:
+                    self.adjust(new_capacity, adjustment_type=EXACT_CAPACITY)
 
     def adjust(self, adjustment, adjustment_type=CHANGE_IN_CAPACITY):
         """
@@ -907,7 +945,7 @@ class AutoScalingResourceGroup(AutoScalingGroup):
     def _get_instance_definition(self):
         return self.properties[self.RESOURCE]
 
-    def _lb_reload(self, exclude=None):
+    def _lb_reload(self, exclude=None, defer=True):
         """AutoScalingResourceGroup does not maintain load balancer
         connections, so we just ignore calls to update the LB.
         """
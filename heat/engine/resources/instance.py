@@ -474,12 +474,8 @@ class Instance(resource.Resource):
         return server, scheduler.TaskRunner(self._attach_volumes_task())
 
     def _attach_volumes_task(self):
-        attach_tasks = (volume.VolumeAttachTask(self.stack,
-                                                self.resource_id,
-                                                volume_id,
-                                                device)
-                        for volume_id, device in self.volumes())
-        return scheduler.PollingTaskGroup(attach_tasks)
+        return volume.VolumeTaskGroup.attach(self.stack, self.resource_id,
+                                             self.volumes())
 
     def check_create_complete(self, cookie):
         server, volume_attach_task = cookie
@@ -682,11 +678,9 @@ class Instance(resource.Resource):
         '''
         Detach volumes from the instance
         '''
-        detach_tasks = (volume.VolumeDetachTask(self.stack,
-                                                self.resource_id,
-                                                volume_id)
-                        for volume_id, device in self.volumes())
-        return scheduler.PollingTaskGroup(detach_tasks)
+        return volume.VolumeTaskGroup.detach(
+            self.stack, self.resource_id,
+            (volume_id for volume_id, device in self.volumes()))
 
     def handle_delete(self):
         '''
@@ -15,6 +15,7 @@ from heat.common import exception
 from heat.engine import clients
 from heat.engine import properties
 from heat.engine import resource
+from heat.engine.resources import nova_utils
 from heat.engine.resources import route_table
 from heat.openstack.common.gettextutils import _
 
@@ -60,9 +61,27 @@ class InternetGateway(resource.Resource):
         pass
 
     @staticmethod
-    def get_external_network_id(client):
-        ext_filter = {'router:external': True}
-        ext_nets = client.list_networks(**ext_filter)['networks']
+    def get_external_network_id(client, refresh=False):
+        fetched = []
+
+        def list_external_networks():
+            fetched.append(True)
+            ext_filter = {'router:external': True}
+            return client.list_networks(**ext_filter)['networks']
+
+        def find_external_networks(refresh=False):
+            # The token identifies the tenant, since the endpoint does not
+            http_client = getattr(client, 'httpclient', None)
+            key = ('external_networks',
+                   getattr(http_client, 'endpoint_url', None),
+                   getattr(http_client, 'auth_token', None))
+            return nova_utils.cached_lookup(key, list_external_networks,
+                                            refresh)
+
+        ext_nets = find_external_networks(refresh)
+        if len(ext_nets) != 1 and not fetched:
+            # The networks may have changed since the list was cached
+            ext_nets = find_external_networks(refresh=True)
         if len(ext_nets) != 1:
             # TODO(sbaker) if there is more than one external network
             # add a heat configuration variable to set the ID of
@@ -11,6 +11,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import os
+import re
 
 from oslo.config import cfg
 
@@ -355,7 +356,12 @@ class LoadBalancer(stack_resource.StackResource):
                                             "security group.")
     }
 
-    def _haproxy_config(self, templ, instances):
+    def _haproxy_config(self, instances, addresses=None):
+        '''
+        Return the haproxy config for the given instances. Addresses already
+        known for some of the instances may be passed in a dict, so that they
+        need not be looked up again.
+        '''
         # initial simplifications:
         # - only one Listener
         # - only http (no tcp or ssl)
@@ -409,8 +415,11 @@ class LoadBalancer(stack_resource.StackResource):
         servers = []
         n = 1
         client = self.nova()
+        addresses = addresses or {}
         for i in instances:
-            ip = nova_utils.server_to_ipaddress(client, i) or '0.0.0.0'
+            ip = addresses.get(i)
+            if ip is None:
+                ip = nova_utils.server_to_ipaddress(client, i) or '0.0.0.0'
             logger.debug('haproxy server:%s' % ip)
             servers.append('%sserver server%d %s:%s %s' % (spaces, n,
                                                            ip, inst_port,
@@ -419,6 +428,20 @@ class LoadBalancer(stack_resource.StackResource):
 
         return '%s%s%s%s\n' % (gl, frontend, backend, '\n'.join(servers))
 
+    @staticmethod
+    def _haproxy_addresses(config, instances):
+        '''
+        Return a dict of the addresses of the given instances in a config
+        generated by _haproxy_config() for them, omitting any instances whose
+        address was not known when it was generated.
+        '''
+        addresses = re.findall(r'^\s*server server\d+ (\S+):', config,
+                               re.MULTILINE)
+        if len(addresses) != len(instances):
+            return {}
+        return dict((i, ip) for i, ip in zip(instances, addresses)
+                    if ip != '0.0.0.0')
+
     def get_parsed_template(self):
         if cfg.CONF.loadbalancer_template:
             with open(cfg.CONF.loadbalancer_template) as templ_fd:
@@ -457,7 +480,7 @@ class LoadBalancer(stack_resource.StackResource):
         if self.properties[self.INSTANCES]:
             md = templ['Resources']['LB_instance']['Metadata']
             files = md['AWS::CloudFormation::Init']['config']['files']
-            cfg = self._haproxy_config(templ, self.properties[self.INSTANCES])
+            cfg = self._haproxy_config(self.properties[self.INSTANCES])
             files['/etc/haproxy/haproxy.cfg']['content'] = cfg
 
         return self.create_with_template(templ, params)
@@ -467,16 +490,25 @@ class LoadBalancer(stack_resource.StackResource):
         re-generate the Metadata
         save it to the db.
         rely on the cfn-hup to reconfigure HAProxy
+
+        Only the addresses of instances that were not already members are
+        looked up, and the Metadata is saved only if the config changed.
         '''
         if self.INSTANCES in prop_diff:
-            templ = self.get_parsed_template()
-            cfg = self._haproxy_config(templ, prop_diff[self.INSTANCES])
-
-            md = self.nested()['LB_instance'].metadata_get()
+            lb_instance = self.nested()['LB_instance']
+            md = lb_instance.metadata_get()
             files = md['AWS::CloudFormation::Init']['config']['files']
-            files['/etc/haproxy/haproxy.cfg']['content'] = cfg
+            haproxy_cfg = files['/etc/haproxy/haproxy.cfg']
+
+            old_config = haproxy_cfg.get('content') or ''
+            addresses = self._haproxy_addresses(
+                old_config, self.properties[self.INSTANCES] or [])
+            config = self._haproxy_config(prop_diff[self.INSTANCES],
+                                          addresses)
 
-            self.nested()['LB_instance'].metadata_set(md)
+            if config != old_config:
+                haproxy_cfg['content'] = config
+                lb_instance.metadata_set(md)
 
     def handle_delete(self):
         return self.delete_nested()
@@ -91,17 +91,19 @@ class Net(neutron.NeutronResource):
 
         dhcp_agent_ids = props.pop(self.DHCP_AGENT_IDS, None)
 
-        net = self.neutron().create_network({'network': props})['network']
-        self.resource_id_set(net['id'])
-
         if dhcp_agent_ids:
+            net = self.neutron().create_network({'network': props})['network']
+            self.resource_id_set(net['id'])
             self._replace_dhcp_agents(dhcp_agent_ids)
+        else:
+            return self._bulk_create('network', props)
 
     def _show_resource(self):
         return self.neutron().show_network(
             self.resource_id)['network']
 
-    def check_create_complete(self, *args):
+    def check_create_complete(self, request):
+        self._bulk_create_complete(request)
         attributes = self._show_resource()
         return self.is_built(attributes)
 
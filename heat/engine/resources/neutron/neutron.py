@@ -13,6 +13,7 @@
 
 from neutronclient.common.exceptions import NeutronClientException
 from neutronclient.neutron import v2_0 as neutronV20
+from oslo.config import cfg
 
 from heat.common import exception
 from heat.engine import function
@@ -22,9 +23,125 @@ from heat.engine import scheduler
 from heat.openstack.common import log as logging
 from heat.openstack.common import uuidutils
 
+cfg.CONF.import_opt('neutron_bulk_create', 'heat.common.config')
+
 logger = logging.getLogger(__name__)
 
 
+class BulkCreateRequest(object):
+    '''A request to create a Neutron resource as part of a bulk request.'''
+
+    def __init__(self, creator, props, resource):
+        self.creator = creator
+        self.props = props
+        self.resource = resource
+        self.done = False
+        self.value = None
+        self.error = None
+
+    def result(self):
+        '''
+        Return the created resource, sending any outstanding requests first.
+        '''
+        if not self.done:
+            self.creator.flush()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def cancel(self):
+        '''Withdraw the request, if it has not been sent yet.'''
+        if not self.done:
+            self.creator.discard(self)
+
+
+class BulkCreator(object):
+    '''
+    Combine requests to create Neutron resources of one type into a single
+    bulk request.
+
+    Resources of a stack that are ready to be created in the same scheduler
+    step call add() from handle_create(); the first of them to call result()
+    on its request in check_create_complete() sends a single bulk request
+    for all of them. If the bulk request fails, each resource is created
+    separately so that any error is reported against the resource that
+    caused it. The ID of each created resource is stored as soon as the
+    request is sent, so that it can be deleted even if its own creation is
+    then cancelled.
+    '''
+
+    def __init__(self, client, resource_type, key=None):
+        self.resource_type = resource_type
+        self.collection = '%ss' % resource_type
+        self._create = getattr(client, 'create_%s' % resource_type)
+        self._key = key
+        self._pending = []
+
+    def add(self, props, resource=None):
+        request = BulkCreateRequest(self, props, resource)
+        self._pending.append(request)
+        return request
+
+    def discard(self, request):
+        if request in self._pending:
+            self._pending.remove(request)
+        if not self._pending:
+            self._release()
+
+    def _release(self):
+        # Requests made after this are sent in a new batch
+        if _bulk_creators.get(self._key) is self:
+            del _bulk_creators[self._key]
+
+    def _created(self, request, value):
+        request.value = value
+        request.done = True
+        if request.resource is not None:
+            request.resource.resource_id_set(value['id'])
+
+    def flush(self):
+        requests, self._pending = self._pending, []
+        self._release()
+
+        if len(requests) > 1:
+            body = {self.collection: [r.props for r in requests]}
+            try:
+                results = self._create(body)[self.collection]
+            except NeutronClientException as ex:
+                logger.warning(_('Bulk creation of %(num)d %(type)s resources '
+                                 'failed, creating them separately: %(ex)s')
+                               % {'num': len(requests),
+                                  'type': self.resource_type, 'ex': ex})
+            else:
+                for request, value in zip(requests, results):
+                    self._created(request, value)
+                return
+
+        for request in requests:
+            try:
+                body = {self.resource_type: request.props}
+                value = self._create(body)[self.resource_type]
+            except Exception as ex:
+                request.error = ex
+                request.done = True
+            else:
+                self._created(request, value)
+
+
+# The BulkCreators with outstanding requests, keyed by stack and resource
+# type. Each holds the client of its stack, so only resources of the same
+# stack (and hence tenant and credentials) are combined.
+_bulk_creators = {}
+
+
+def bulk_creator(stack, client, resource_type):
+    '''Return the current BulkCreator for a resource type in a stack.'''
+    key = (id(stack), resource_type)
+    if key not in _bulk_creators:
+        _bulk_creators[key] = BulkCreator(client, resource_type, key)
+    return _bulk_creators[key]
+
+
 class NeutronResource(resource.Resource):
 
     def validate(self):
@@ -203,6 +320,43 @@ class NeutronResource(resource.Resource):
                 seclist.append(groups[0])
         return seclist
 
+    def _bulk_create(self, resource_type, props):
+        '''
+        Create a Neutron resource of the given type, which may be deferred
+        in order to combine it with the creation of other resources of the
+        same type. Returns a request to pass to _bulk_create_complete().
+        '''
+        client = self.neutron()
+        if not cfg.CONF.neutron_bulk_create:
+            body = {resource_type: props}
+            value = getattr(client, 'create_%s' % resource_type)(body)
+            self.resource_id_set(value[resource_type]['id'])
+            return None
+
+        creator = bulk_creator(self.stack, client, resource_type)
+        self._bulk_request = creator.add(props, self)
+        return self._bulk_request
+
+    def _bulk_create_complete(self, request):
+        '''
+        Wait for a request made with _bulk_create(). The ID of the created
+        resource is stored once the request is sent.
+        '''
+        if request is not None:
+            request.result()
+
+    @scheduler.wrappertask
+    def create(self):
+        self._bulk_request = None
+        try:
+            yield super(NeutronResource, self).create()
+        finally:
+            # A request still queued when the creation fails or is
+            # cancelled would otherwise create a resource in a later batch
+            if self._bulk_request is not None:
+                self._bulk_request.cancel()
+                self._bulk_request = None
+
     def _delete_task(self):
         delete_task = scheduler.TaskRunner(self._confirm_delete)
         delete_task.start()
@@ -198,8 +198,7 @@ class Port(neutron.NeutronResource):
         if not props['fixed_ips']:
             del(props['fixed_ips'])
 
-        port = self.neutron().create_port({'port': props})['port']
-        self.resource_id_set(port['id'])
+        return self._bulk_create('port', props)
 
     def _prepare_list_properties(self, props):
         for fixed_ip in props.get(self.FIXED_IPS, []):
@@ -227,7 +226,8 @@ class Port(neutron.NeutronResource):
         return self.neutron().show_port(
             self.resource_id)['port']
 
-    def check_create_complete(self, *args):
+    def check_create_complete(self, request):
+        self._bulk_create_complete(request)
         attributes = self._show_resource()
         return self.is_built(attributes)
 
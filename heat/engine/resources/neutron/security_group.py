@@ -11,15 +11,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo.config import cfg
+
 from heat.common import exception
 from heat.engine import clients
 from heat.engine import constraints
 from heat.engine import properties
 from heat.engine.resources.neutron import neutron
+from heat.openstack.common import log as logging
 
 if clients.neutronclient is not None:
     import neutronclient.common.exceptions as neutron_exp
 
+cfg.CONF.import_opt('neutron_bulk_create', 'heat.common.config')
+
+logger = logging.getLogger(__name__)
+
 
 class SecurityGroup(neutron.NeutronResource):
 
@@ -174,16 +181,24 @@ class SecurityGroup(neutron.NeutronResource):
     def _create_rules(self, rules):
         egress_deleted = False
 
-        for i in rules:
-            if i[self.RULE_DIRECTION] == 'egress' and not egress_deleted:
-                # There is at least one egress rule, so delete the default
-                # rules which allow all egress traffic
+        if cfg.CONF.neutron_bulk_create and len(rules) > 1:
+            if any(i[self.RULE_DIRECTION] == 'egress' for i in rules):
                 egress_deleted = True
+                self._delete_egress_rules()
 
-                def is_egress(rule):
-                    return rule[self.RULE_DIRECTION] == 'egress'
+            body = {'security_group_rules': [self._format_rule(i)
+                                             for i in rules]}
+            try:
+                self.neutron().create_security_group_rule(body)
+                return
+            except neutron_exp.NeutronClientException as ex:
+                logger.warning(_('Bulk creation of security group rules '
+                                 'failed, creating them separately: %s') % ex)
 
-                self._delete_rules(is_egress)
+        for i in rules:
+            if i[self.RULE_DIRECTION] == 'egress' and not egress_deleted:
+                egress_deleted = True
+                self._delete_egress_rules()
 
             rule = self._format_rule(i)
 
@@ -195,6 +210,14 @@ class SecurityGroup(neutron.NeutronResource):
                 if ex.status_code != 409:
                     raise
 
+    def _delete_egress_rules(self):
+        # There is at least one egress rule, so delete the default
+        # rules which allow all egress traffic
+        def is_egress(rule):
+            return rule[self.RULE_DIRECTION] == 'egress'
+
+        self._delete_rules(is_egress)
+
     def _delete_rules(self, to_delete=None):
         try:
             sec = self.neutron().show_security_group(
@@ -179,8 +179,11 @@ class Subnet(neutron.NeutronResource):
             self.neutron(), props, self.NETWORK, 'network_id')
         self._null_gateway_ip(props)
 
-        subnet = self.neutron().create_subnet({'subnet': props})['subnet']
-        self.resource_id_set(subnet['id'])
+        return self._bulk_create('subnet', props)
+
+    def check_create_complete(self, request):
+        self._bulk_create_complete(request)
+        return True
 
     def handle_delete(self):
         client = self.neutron()
@@ -12,6 +12,7 @@
 #    under the License.
 """Utilities for Resources that use the OpenStack Nova API."""
 
+import collections
 import email
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -19,7 +20,10 @@ import json
 import os
 import pkgutil
 import string
+import sys
+import time
 
+from eventlet import event
 from novaclient import exceptions as nova_exceptions
 from oslo.config import cfg
 import six
@@ -32,6 +36,9 @@ from heat.openstack.common.gettextutils import _
 from heat.openstack.common import log as logging
 from heat.openstack.common import uuidutils
 
+cfg.CONF.import_opt('lookup_cache_ttl', 'heat.common.config')
+cfg.CONF.import_opt('lookup_cache_size', 'heat.common.config')
+
 logger = logging.getLogger(__name__)
 
 
@@ -71,6 +78,96 @@ def refresh_server(server):
             raise
 
 
+class LookupCache(object):
+    '''
+    A cache of rarely-changing data looked up from the backend APIs, shared
+    by the whole process.
+
+    Entries are keyed by the kind of lookup and whatever identifies the
+    tenant (or, where the result depends on the user, the user) it is for.
+    They expire after lookup_cache_ttl seconds and the least recently used
+    entries are evicted once there are lookup_cache_size of them.
+    Concurrent lookups of the same key wait for a single call to the API.
+    '''
+
+    def __init__(self):
+        self._entries = collections.OrderedDict()
+        self._pending = {}
+
+    def get(self, key, fetch, refresh=False):
+        '''
+        Return the cached value for key, calling fetch() to obtain it if it
+        is missing or expired (or if refresh is True).
+        '''
+        entry = self._entries.pop(key, None)
+        if entry is not None and not refresh and time.time() < entry[0]:
+            self._entries[key] = entry
+            return entry[1]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return pending.wait()
+
+        pending = self._pending[key] = event.Event()
+        try:
+            value = fetch()
+        except Exception:
+            pending.send_exception(*sys.exc_info())
+            raise
+        else:
+            pending.send(value)
+        finally:
+            del self._pending[key]
+
+        self._entries[key] = time.time() + cfg.CONF.lookup_cache_ttl, value
+        while len(self._entries) > cfg.CONF.lookup_cache_size:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+
+_lookup_cache = LookupCache()
+
+
+def _lookup_cache_enabled():
+    return cfg.CONF.lookup_cache_ttl > 0 and cfg.CONF.lookup_cache_size > 0
+
+
+def cached_lookup(key, fetch, refresh=False):
+    '''
+    Return the result of fetch(), cached in the process-wide lookup cache.
+
+    :param key: a tuple of the kind of lookup and the values identifying
+                the tenant or user it is for; the result is not cached if
+                any of them is None
+    :param fetch: a function to look the data up from the API
+    :param refresh: whether to replace any cached result
+    '''
+    if not _lookup_cache_enabled() or None in key:
+        return fetch()
+
+    return _lookup_cache.get(key, fetch, refresh)
+
+
+def _lookup(nova_client, kind, fetch, refresh=False, per_user=False):
+    '''
+    Return the result of fetch(), cached for the tenant (or, if per_user is
+    True, the user) that nova_client is authenticated as.
+    '''
+    if not _lookup_cache_enabled():
+        return fetch()
+
+    # The endpoint identifies the tenant, and the token the user
+    http_client = getattr(nova_client, 'client', None)
+    key = (kind, getattr(http_client, 'management_url', None))
+    if per_user:
+        key += (getattr(http_client, 'auth_token', None),)
+
+    return cached_lookup(key, fetch, refresh)
+
+
 def get_image_id(nova_client, image_identifier):
     '''
     Return an id for the specified image name or identifier.
@@ -99,14 +196,26 @@ def get_image_id_by_name(nova_client, image_identifier):
     :returns: the id of the requested :image_identifier:
     :raises: exception.ImageNotFound, exception.PhysicalResourceNameAmbiguity
     '''
-    try:
-        image_list = nova_client.images.list()
-    except clients.novaclient.exceptions.ClientException as ex:
-        raise exception.Error(
-            message=(_("Error retrieving image list from nova: %s") % ex))
-    image_names = dict(
-        (o.id, o.name)
-        for o in image_list if o.name == image_identifier)
+    fetched = []
+
+    def list_images():
+        fetched.append(True)
+        try:
+            image_list = nova_client.images.list()
+        except clients.novaclient.exceptions.ClientException as ex:
+            raise exception.Error(
+                message=(_("Error retrieving image list from nova: %s") % ex))
+        return [(o.id, o.name) for o in image_list]
+
+    def find_images(refresh=False):
+        image_list = _lookup(nova_client, 'images', list_images, refresh)
+        return dict((image_id, name) for image_id, name in image_list
+                    if name == image_identifier)
+
+    image_names = find_images()
+    if len(image_names) == 0 and not fetched:
+        # The image may have been added since the list was cached
+        image_names = find_images(refresh=True)
     if len(image_names) == 0:
         logger.info(_("Image %s was not found in glance") %
                     image_identifier)
@@ -138,15 +247,22 @@ def get_flavor_id(nova_client, flavor):
     :returns: the id of :flavor:
     :raises: exception.FlavorMissing
     '''
-    flavor_id = None
-    flavor_list = nova_client.flavors.list()
-    for o in flavor_list:
-        if o.name == flavor:
-            flavor_id = o.id
-            break
-        if o.id == flavor:
-            flavor_id = o.id
-            break
+    fetched = []
+
+    def list_flavors():
+        fetched.append(True)
+        return [(o.id, o.name) for o in nova_client.flavors.list()]
+
+    def find_flavor(refresh=False):
+        flavor_list = _lookup(nova_client, 'flavors', list_flavors, refresh)
+        for flavor_id, name in flavor_list:
+            if name == flavor or flavor_id == flavor:
+                return flavor_id
+
+    flavor_id = find_flavor()
+    if flavor_id is None and not fetched:
+        # The flavor may have been added since the list was cached
+        flavor_id = find_flavor(refresh=True)
     if flavor_id is None:
         raise exception.FlavorMissing(flavor_id=flavor)
     return flavor_id
@@ -162,41 +278,52 @@ def get_keypair(nova_client, key_name):
     :raises: exception.UserKeyPairMissing
     '''
     try:
-        return nova_client.keypairs.get(key_name)
+        return _lookup(nova_client, ('keypair', key_name),
+                       lambda: nova_client.keypairs.get(key_name),
+                       per_user=True)
     except nova_exceptions.NotFound:
         raise exception.UserKeyPairMissing(key_name=key_name)
 
 
-def build_userdata(resource, userdata=None, instance_user=None,
-                   user_data_format='HEAT_CFNTOOLS'):
+def get_availability_zones(nova_client, refresh=False):
     '''
-    Build multipart data blob for CloudInit which includes user-supplied
-    Metadata, user data, and the required Heat in-instance configuration.
+    Get the names of the availability zones available to the tenant.
 
-    :param resource: the resource implementation
-    :type resource: heat.engine.Resource
-    :param userdata: user data string
-    :type userdata: str or None
-    :param instance_user: the user to create on the server
-    :type instance_user: string
-    :param user_data_format: Format of user data to return
-    :type user_data_format: string
-    :returns: multipart mime as a string
+    :param nova_client: the nova client to use
+    :param refresh: whether to look the zones up again even if cached
+    :returns: a list of availability zone names
     '''
+    def list_zones():
+        return [zone.zoneName for zone in
+                nova_client.availability_zones.list(detailed=False)]
 
-    if user_data_format == 'RAW':
-        return userdata
+    return list(_lookup(nova_client, 'zones', list_zones, refresh))
 
-    is_cfntools = user_data_format == 'HEAT_CFNTOOLS'
-    is_software_config = user_data_format == 'SOFTWARE_CONFIG'
 
-    def make_subpart(content, filename, subtype=None):
-        if subtype is None:
-            subtype = os.path.splitext(filename)[0]
-        msg = MIMEText(content, _subtype=subtype)
-        msg.add_header('Content-Disposition', 'attachment',
-                       filename=filename)
-        return msg
+_cloudinit_parts = {}
+
+
+def _make_subpart(content, filename, subtype=None):
+    '''Return a serialised MIME part for a user data attachment.'''
+    if subtype is None:
+        subtype = os.path.splitext(filename)[0]
+    msg = MIMEText(content, _subtype=subtype)
+    msg.add_header('Content-Disposition', 'attachment',
+                   filename=filename)
+    return msg.as_string()
+
+
+def _cloudinit_subparts(instance_user, user_data_format):
+    '''
+    Return the serialised MIME parts of the user data that do not depend on
+    the resource, as a tuple of the parts that come before the user data and
+    the parts that come after it.
+
+    The parts are rendered only once for each instance user and format.
+    '''
+    key = (instance_user, user_data_format)
+    if key in _cloudinit_parts:
+        return _cloudinit_parts[key]
 
     def read_cloudinit_file(fn):
         return pkgutil.get_data('heat', 'cloudinit/%s' % fn)
@@ -222,13 +349,76 @@ echo -e '%s\tALL=(ALL)\tNOPASSWD: ALL' >> /etc/sudoers
         read_cloudinit_file('boothook.sh')).safe_substitute(
             add_custom_user=boothook_custom_user)
 
-    attachments = [(cloudinit_config, 'cloud-config'),
-                   (cloudinit_boothook, 'boothook.sh', 'cloud-boothook'),
-                   (read_cloudinit_file('part_handler.py'),
-                    'part-handler.py')]
+    head = (_make_subpart(cloudinit_config, 'cloud-config'),
+            _make_subpart(cloudinit_boothook, 'boothook.sh',
+                          'cloud-boothook'),
+            _make_subpart(read_cloudinit_file('part_handler.py'),
+                          'part-handler.py'))
+
+    if user_data_format == 'HEAT_CFNTOOLS':
+        tail = (_make_subpart(read_cloudinit_file('loguserdata.py'),
+                              'loguserdata.py', 'x-shellscript'),)
+    else:
+        tail = ()
+
+    _cloudinit_parts[key] = head, tail
+    return head, tail
+
+
+def _make_boundary(text):
+    '''
+    Return a MIME boundary, in the same format as the email package's, that
+    does not occur anywhere in the given text.
+    '''
+    while True:
+        boundary = '=' * 15 + uuidutils.generate_uuid().replace('-', '') + '=='
+        if boundary not in text:
+            return boundary
+
+
+def _make_multipart(subparts):
+    '''
+    Return a multipart/mixed MIME message (as a string) containing the given
+    serialised parts, formatted as email.mime.multipart.MIMEMultipart would.
+    '''
+    boundary = _make_boundary('\n'.join(subparts))
+    separator = '\n--%s\n' % boundary
+    envelope = MIMEMultipart(boundary=boundary)
+    envelope.set_payload(''.join(['--%s\n' % boundary,
+                                  separator.join(subparts),
+                                  '\n--%s--\n' % boundary]))
+    return envelope.as_string()
+
+
+def build_userdata(resource, userdata=None, instance_user=None,
+                   user_data_format='HEAT_CFNTOOLS'):
+    '''
+    Build multipart data blob for CloudInit which includes user-supplied
+    Metadata, user data, and the required Heat in-instance configuration.
+
+    :param resource: the resource implementation
+    :type resource: heat.engine.Resource
+    :param userdata: user data string
+    :type userdata: str or None
+    :param instance_user: the user to create on the server
+    :type instance_user: string
+    :param user_data_format: Format of user data to return
+    :type user_data_format: string
+    :returns: multipart mime as a string
+    '''
+
+    if user_data_format == 'RAW':
+        return userdata
+
+    is_cfntools = user_data_format == 'HEAT_CFNTOOLS'
+    is_software_config = user_data_format == 'SOFTWARE_CONFIG'
+
+    head, tail = _cloudinit_subparts(instance_user, user_data_format)
+    userdata_attachments = []
 
     if is_cfntools:
-        attachments.append((userdata, 'cfn-userdata', 'x-cfninitdata'))
+        userdata_attachments.append((userdata, 'cfn-userdata',
+                                     'x-cfninitdata'))
     elif is_software_config:
         # attempt to parse userdata as a multipart message, and if it
         # is, add each part as an attachment
@@ -239,15 +429,18 @@ echo -e '%s\tALL=(ALL)\tNOPASSWD: ALL' >> /etc/sudoers
             pass
         if userdata_parts and userdata_parts.is_multipart():
             for part in userdata_parts.get_payload():
-                attachments.append((part.get_payload(),
-                                    part.get_filename(),
-                                    part.get_content_subtype()))
+                userdata_attachments.append((part.get_payload(),
+                                             part.get_filename(),
+                                             part.get_content_subtype()))
         else:
-            attachments.append((userdata, 'userdata', 'x-shellscript'))
+            userdata_attachments.append((userdata, 'userdata',
+                                         'x-shellscript'))
 
-    if is_cfntools:
-        attachments.append((read_cloudinit_file('loguserdata.py'),
-                           'loguserdata.py', 'x-shellscript'))
+    subparts = list(head)
+    subparts.extend(_make_subpart(*args) for args in userdata_attachments)
+    subparts.extend(tail)
+
+    attachments = []
 
     metadata = resource.metadata_get()
     if metadata:
@@ -280,10 +473,8 @@ echo -e '%s\tALL=(ALL)\tNOPASSWD: ALL' >> /etc/sudoers
         attachments.append((boto_cfg,
                             'cfn-boto-cfg', 'x-cfninitdata'))
 
-    subparts = [make_subpart(*args) for args in attachments]
-    mime_blob = MIMEMultipart(_subparts=subparts)
-
-    return mime_blob.as_string()
+    subparts.extend(_make_subpart(*args) for args in attachments)
+    return _make_multipart(subparts)
 
 
 def delete_server(server):
@@ -389,7 +580,10 @@ def server_to_ipaddress(client, server):
                 return server.networks[n][0]
 
 
-def absolute_limits(nova_client):
+def absolute_limits(nova_client, refresh=False):
     """Return the absolute limits as a dictionary."""
-    limits = nova_client.limits.get()
-    return dict([(limit.name, limit.value) for limit in list(limits.absolute)])
+    def get_limits():
+        limits = nova_client.limits.get()
+        return [(limit.name, limit.value) for limit in list(limits.absolute)]
+
+    return dict(_lookup(nova_client, 'limits', get_limits, refresh))
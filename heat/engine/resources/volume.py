@@ -13,6 +13,8 @@
 
 import json
 
+from oslo.config import cfg
+
 from heat.common import exception
 from heat.engine import clients
 from heat.engine import constraints
@@ -21,11 +23,14 @@ from heat.engine import resource
 from heat.engine.resources import nova_utils
 from heat.engine import scheduler
 from heat.engine import support
+from heat.openstack.common import excutils
 from heat.openstack.common.importutils import try_import
 from heat.openstack.common import log as logging
 
 volume_backups = try_import('cinderclient.v1.volume_backups')
 
+cfg.CONF.import_opt('max_concurrent_volume_attachments', 'heat.common.config')
+
 logger = logging.getLogger(__name__)
 
 
@@ -180,18 +185,62 @@ class Volume(resource.Resource):
         return delete_task.step()
 
 
+class VolumeStatusPoller(object):
+    """
+    Poll the status of a number of volume attachments with bulk requests.
+
+    The volume list from Cinder (and the list of attachments for each server
+    from Nova) is fetched at most once between calls to invalidate(), no
+    matter how many volumes are being polled.
+    """
+
+    def __init__(self, clients):
+        self.clients = clients
+        self.invalidate()
+
+    def invalidate(self):
+        """Discard the statuses fetched since the previous invalidation."""
+        self._volumes = None
+        self._server_attachments = {}
+
+    def volume(self, volume_id):
+        """Return the volume with the given ID."""
+        if self._volumes is None:
+            self._volumes = dict((v.id, v) for v in
+                                 self.clients.cinder().volumes.list())
+        try:
+            return self._volumes[volume_id]
+        except KeyError:
+            # e.g. when the list is truncated by the API's page size limit
+            return self.clients.cinder().volumes.get(volume_id)
+
+    def server_has_attachment(self, server_id, attachment_id):
+        """Return True if Nova still lists the attachment on the server."""
+        if server_id not in self._server_attachments:
+            server_api = self.clients.nova().volumes
+            try:
+                attachments = server_api.get_server_volumes(server_id)
+            except clients.novaclient.exceptions.NotFound:
+                attachments = []
+            self._server_attachments[server_id] = set(a.id for a in
+                                                      attachments)
+        return attachment_id in self._server_attachments[server_id]
+
+
 class VolumeAttachTask(object):
     """A task for attaching a volume to a Nova server."""
 
-    def __init__(self, stack, server_id, volume_id, device):
+    def __init__(self, stack, server_id, volume_id, device, poller=None):
         """
         Initialise with the stack (for obtaining the clients), ID of the
-        server and volume, and the device name on the server.
+        server and volume, and the device name on the server. If a
+        VolumeStatusPoller is supplied, it is used to poll for completion.
         """
         self.clients = stack.clients
         self.server_id = server_id
         self.volume_id = volume_id
         self.device = device
+        self.poller = poller
         self.attachment_id = None
 
     def __str__(self):
@@ -218,12 +267,18 @@ class VolumeAttachTask(object):
         self.attachment_id = va.id
         yield
 
-        vol = self.clients.cinder().volumes.get(self.volume_id)
+        if self.poller is None:
+            vol = self.clients.cinder().volumes.get(self.volume_id)
+        else:
+            vol = self.poller.volume(self.volume_id)
         while vol.status == 'available' or vol.status == 'attaching':
             logger.debug('%(name)s - volume status: %(status)s' % {
                          'name': str(self), 'status': vol.status})
             yield
-            vol.get()
+            if self.poller is None:
+                vol.get()
+            else:
+                vol = self.poller.volume(self.volume_id)
 
         if vol.status != 'in-use':
             raise exception.Error(vol.status)
@@ -234,14 +289,16 @@ class VolumeAttachTask(object):
 class VolumeDetachTask(object):
     """A task for detaching a volume from a Nova server."""
 
-    def __init__(self, stack, server_id, attachment_id):
+    def __init__(self, stack, server_id, attachment_id, poller=None):
         """
         Initialise with the stack (for obtaining the clients), and the IDs of
-        the server and volume.
+        the server and volume. If a VolumeStatusPoller is supplied, it is used
+        to poll for completion.
         """
         self.clients = stack.clients
         self.server_id = server_id
         self.attachment_id = attachment_id
+        self.poller = poller
 
     def __str__(self):
         """Return a human-readable string description of the task."""
@@ -285,7 +342,10 @@ class VolumeDetachTask(object):
             while vol.status in ('in-use', 'detaching'):
                 logger.debug('%s - volume still in use' % str(self))
                 yield
-                vol.get()
+                if self.poller is None:
+                    vol.get()
+                else:
+                    vol = self.poller.volume(vol.id)
 
             logger.info(_('%(name)s - status: %(status)s') % {
                         'name': str(self), 'status': vol.status})
@@ -300,6 +360,9 @@ class VolumeDetachTask(object):
         # and nova removing attachment from its own objects, so we
         # check that nova already knows that the volume is detached
         def server_has_attachment(server_id, attachment_id):
+            if self.poller is not None:
+                return self.poller.server_has_attachment(server_id,
+                                                         attachment_id)
             try:
                 server_api.get_server_volume(server_id, attachment_id)
             except clients.novaclient.exceptions.NotFound:
@@ -315,6 +378,74 @@ class VolumeDetachTask(object):
                     {'vol': vol.id, 'srv': self.server_id})
 
 
+class VolumeTaskGroup(object):
+    """
+    A task which attaches or detaches a number of volumes on a server.
+
+    Requests are issued concurrently, with at most
+    max_concurrent_volume_attachments in progress at once. When more than
+    one volume is in progress, their statuses are polled together with a
+    single VolumeStatusPoller for each step rather than once for each volume.
+    """
+
+    def __init__(self, tasks, poller=None):
+        """Initialise with a list of tasks sharing the given poller."""
+        self._tasks = list(tasks)
+        self.poller = poller
+
+    @classmethod
+    def attach(cls, stack, server_id, volumes):
+        """
+        Return a task group attaching the given (volume_id, device) pairs to
+        the server.
+        """
+        volumes = list(volumes)
+        poller = (VolumeStatusPoller(stack.clients)
+                  if len(volumes) > 1 else None)
+        return cls((VolumeAttachTask(stack, server_id, volume_id, device,
+                                     poller)
+                    for volume_id, device in volumes), poller)
+
+    @classmethod
+    def detach(cls, stack, server_id, attachment_ids):
+        """
+        Return a task group removing the given attachments from the server.
+        """
+        attachment_ids = list(attachment_ids)
+        poller = (VolumeStatusPoller(stack.clients)
+                  if len(attachment_ids) > 1 else None)
+        return cls((VolumeDetachTask(stack, server_id, attachment_id, poller)
+                    for attachment_id in attachment_ids), poller)
+
+    def __repr__(self):
+        """Return a string representation of the task group."""
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join(str(t) for t in self._tasks))
+
+    def __call__(self):
+        """Return a co-routine which runs the task group."""
+        limit = max(cfg.CONF.max_concurrent_volume_attachments, 1)
+        pending = list(self._tasks)
+        runners = []
+
+        try:
+            while pending or runners:
+                while pending and len(runners) < limit:
+                    runner = scheduler.TaskRunner(pending.pop(0))
+                    runner.start()
+                    runners.append(runner)
+
+                yield
+
+                if self.poller is not None:
+                    self.poller.invalidate()
+                runners = [r for r in runners if not r.step()]
+        except:
+            with excutils.save_and_reraise_exception():
+                for r in runners:
+                    r.cancel()
+
+
 class VolumeAttachment(resource.Resource):
     PROPERTIES = (
         INSTANCE_ID, VOLUME_ID, DEVICE,
@@ -11,11 +11,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import copy
+import datetime
 import functools
+import hashlib
+import heapq
+import inspect
 import json
 
-import six
 from oslo.config import cfg
+import six
 import webob
 
 from heat.common import context
@@ -33,6 +39,7 @@ from heat.engine import parser
 from heat.engine import properties
 from heat.engine import resource
 from heat.engine import resources
+from heat.engine import stack_affinity
 from heat.engine import stack_lock
 from heat.engine import watchrule
 from heat.openstack.common import excutils
@@ -49,6 +56,10 @@ from heat.rpc import api as rpc_api
 cfg.CONF.import_opt('engine_life_check_timeout', 'heat.common.config')
 cfg.CONF.import_opt('max_resources_per_stack', 'heat.common.config')
 cfg.CONF.import_opt('max_stacks_per_tenant', 'heat.common.config')
+cfg.CONF.import_opt('stack_affinity', 'heat.common.config')
+cfg.CONF.import_opt('stack_lock_lease_duration', 'heat.common.config')
+cfg.CONF.import_opt('validation_cache_size', 'heat.common.config')
+cfg.CONF.import_opt('watch_data_flush_interval', 'heat.common.config')
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +76,43 @@ def request_context(func):
     return wrapped
 
 
+def stack_affinity_route(func):
+    """
+    Route a stack-scoped RPC call to the engine host that the stack is
+    hashed to, when stack affinity is enabled.
+
+    The call is handled locally if the stack is hashed to this engine, if
+    the call has already been routed once, or if the owning engine does not
+    answer a short liveness check; the stack lock still guards against
+    concurrent actions in those cases. An engine that does not answer is
+    dropped from the ring until it reports again, so later calls do not wait
+    for it. Once routed, a call is never also run locally, since the owning
+    engine may already have handled it.
+    """
+    # RPC calls pass keyword arguments only; map any positional arguments
+    # from local callers so that the call can be routed.
+    arg_names = inspect.getargspec(func).args[3:]
+
+    @functools.wraps(func)
+    def wrapped(self, cnxt, stack_identity, *args, **kwargs):
+        kwargs.update(zip(arg_names, args))
+        routed = kwargs.pop('routed', False)
+        router = self.stack_router
+        if router is not None and not routed:
+            host = router.get_host(cnxt, stack_identity['stack_id'])
+            if host != self.host:
+                if router.host_alive(cnxt, host):
+                    return router.route(cnxt, host, func.__name__,
+                                        stack_identity=stack_identity,
+                                        routed=True, **kwargs)
+                logger.warning(_("Engine host %(host)s did not respond,"
+                                 " handling %(method)s locally")
+                               % {'host': host, 'method': func.__name__})
+                router.host_failed(host)
+        return func(self, cnxt, stack_identity, **kwargs)
+    return wrapped
+
+
 class ThreadGroupManager(object):
 
     def __init__(self):
@@ -150,6 +198,16 @@ class ThreadGroupManager(object):
         self.groups[stack_id].add_timer(cfg.CONF.periodic_interval,
                                         func, *args, **kwargs)
 
+    def add_service_timer(self, interval, func, *args, **kwargs):
+        """
+        Define a periodic engine-wide task, to be run every interval
+        seconds in the service threadgroup, which keeps running while the
+        stack threadgroups are stopped.
+        """
+        self.groups[cfg.CONF.periodic_interval].add_timer(interval, func,
+                                                          None, *args,
+                                                          **kwargs)
+
     def stop_timers(self, stack_id):
         if stack_id in self.groups:
             self.groups[stack_id].stop_timers()
@@ -162,86 +220,115 @@ class ThreadGroupManager(object):
 
 
 class StackWatch(object):
-    def __init__(self, thread_group_mgr):
-        self.thread_group_mgr = thread_group_mgr
+    '''
+    Evaluate the watch rules of all stacks from a single periodic task.
 
-    def start_watch_task(self, stack_id, cnxt):
-
-        def stack_has_a_watchrule(sid):
-            wrs = db_api.watch_rule_get_all_by_stack(cnxt, sid)
-
-            now = timeutils.utcnow()
-            start_watch_thread = False
-            for wr in wrs:
-                # reset the last_evaluated so we don't fire off alarms when
-                # the engine has not been running.
-                db_api.watch_rule_update(cnxt, wr.id, {'last_evaluated': now})
-
-                if wr.state != rpc_api.WATCH_STATE_CEILOMETER_CONTROLLED:
-                    start_watch_thread = True
-
-            children = db_api.stack_get_all_by_owner_id(cnxt, sid)
-            for child in children:
-                if stack_has_a_watchrule(child.id):
-                    start_watch_thread = True
-
-            return start_watch_thread
-
-        if stack_has_a_watchrule(stack_id):
-            self.thread_group_mgr.add_timer(
-                stack_id,
-                self.periodic_watcher_task,
-                sid=stack_id)
-
-    def check_stack_watches(self, sid):
-        # Retrieve the stored credentials & create context
-        # Require tenant_safe=False to the stack_get to defeat tenant
-        # scoping otherwise we fail to retrieve the stack
-        logger.debug("Periodic watcher task for stack %s" % sid)
-        admin_context = context.get_admin_context()
-        stack = db_api.stack_get(admin_context, sid, tenant_safe=False,
-                                 eager_load=True)
-        if not stack:
-            logger.error(_("Unable to retrieve stack %s for periodic task") %
-                         sid)
-            return
-        stack_context = EngineService.load_user_creds(stack.user_creds_id)
+    Rules are kept in a heap ordered by the time they are next due, so that
+    each run only loads the rules which are due, in one batch. The stack
+    owning a rule is only loaded when an alarm action fires.
+    '''
 
-        # recurse into any nested stacks.
-        children = db_api.stack_get_all_by_owner_id(admin_context, sid)
-        for child in children:
-            self.check_stack_watches(child.id)
+    def __init__(self, thread_group_mgr):
+        self.thread_group_mgr = thread_group_mgr
+        self._heap = []
+        self._scheduled = set()
+        self._last_rule_id = 0
 
-        # Get all watchrules for this stack and evaluate them
-        try:
-            wrs = db_api.watch_rule_get_all_by_stack(stack_context, sid)
-        except Exception as ex:
-            logger.warn(_('periodic_task db error watch rule removed? %(ex)s')
-                        % ex)
-            return
+    def start_watch_tasks(self, cnxt):
+        """
+        Start the periodic task evaluating the watch rules of all stacks.
+        """
+        # reset the last_evaluated so we don't fire off alarms when
+        # the engine has not been running.
+        db_api.watch_rule_update_all(cnxt,
+                                     {'last_evaluated': timeutils.utcnow()})
+        self.thread_group_mgr.add_service_timer(cfg.CONF.periodic_interval,
+                                                self.periodic_watcher_task)
+
+    def _schedule(self, rule_id, due):
+        if rule_id not in self._scheduled:
+            self._scheduled.add(rule_id)
+            heapq.heappush(self._heap, (due, rule_id))
+
+    def _schedule_new_rules(self, cnxt):
+        """Schedule any watch rules created since the last run."""
+        for wr in db_api.watch_rule_get_all_after(cnxt, self._last_rule_id):
+            self._last_rule_id = max(self._last_rule_id, wr.id)
+            if wr.state != rpc_api.WATCH_STATE_CEILOMETER_CONTROLLED:
+                self._schedule(wr.id, wr.last_evaluated)
+
+    def _pop_due_rules(self, now):
+        rule_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due, rule_id = heapq.heappop(self._heap)
+            self._scheduled.discard(rule_id)
+            rule_ids.append(rule_id)
+        return rule_ids
+
+    def check_stack_watches(self, cnxt, rule_ids):
+        """
+        Evaluate the given watch rules, and start the actions of any alarms
+        that fire in the threadgroups of the stacks owning them.
+        """
+        interval = datetime.timedelta(seconds=cfg.CONF.periodic_interval)
+        stack_contexts = {}
 
-        def run_alarm_action(actions, details):
+        def run_alarm_action(stack_context, stack_id, actions, details):
             for action in actions:
                 action(details=details)
 
-            stk = parser.Stack.load(stack_context, stack=stack)
+            stk = parser.Stack.load(stack_context, stack_id=stack_id)
             for res in stk.itervalues():
                 res.metadata_update()
 
-        for wr in wrs:
-            rule = watchrule.WatchRule.load(stack_context, watch=wr)
-            actions = rule.evaluate()
-            if actions:
-                self.thread_group_mgr.start(sid, run_alarm_action, actions,
-                                            rule.get_details())
-
-    def periodic_watcher_task(self, sid):
+        for wr in db_api.watch_rule_get_all_by_ids(cnxt, rule_ids):
+            if wr.state == rpc_api.WATCH_STATE_CEILOMETER_CONTROLLED:
+                continue
+            try:
+                creds_id = wr.stack.user_creds_id
+                if creds_id not in stack_contexts:
+                    stack_contexts[creds_id] = \
+                        EngineService.load_user_creds(creds_id)
+                stack_context = stack_contexts[creds_id]
+
+                rule = watchrule.WatchRule.load(stack_context, watch=wr)
+                actions = rule.evaluate()
+                if actions:
+                    self.thread_group_mgr.start(wr.stack_id, run_alarm_action,
+                                                stack_context, wr.stack_id,
+                                                actions, rule.get_details())
+                due = rule.last_evaluated + rule.timeperiod
+            except Exception:
+                logger.exception(_("Error evaluating watch rule %s") %
+                                 wr.name)
+                due = wr.last_evaluated
+            self._schedule(wr.id, max(due, timeutils.utcnow() + interval))
+
+    def periodic_watcher_task(self):
         """
-        Periodic task, created for each stack, triggers watch-rule
-        evaluation for all rules defined for the stack
-        sid = stack ID
+        Periodic task, triggers watch-rule evaluation for all the rules
+        that are due
+
+        Errors are logged rather than raised, so that the timer calling this
+        keeps running. Rules that were due are retried on the next run.
         """
-        self.check_stack_watches(sid)
+        rule_ids = []
+        try:
+            admin_context = context.get_admin_context()
+            self._schedule_new_rules(admin_context)
+
+            rule_ids = self._pop_due_rules(timeutils.utcnow())
+            if rule_ids:
+                logger.debug("Periodic watcher task for %d watch rules" %
+                             len(rule_ids))
+                self.check_stack_watches(admin_context, rule_ids)
+        except Exception:
+            logger.exception(_("Error in periodic watcher task"))
+            # Rules already rescheduled by check_stack_watches() are skipped
+            due = timeutils.utcnow() + datetime.timedelta(
+                seconds=cfg.CONF.periodic_interval)
+            for rule_id in rule_ids:
+                self._schedule(rule_id, due)
 
 
 class EngineListener(service.Service):
@@ -286,8 +373,12 @@ class EngineService(service.Service):
         resources.initialise()
 
         self.engine_id = stack_lock.StackLock.generate_engine_id()
+        self.stack_router = None
         self.thread_group_mgr = ThreadGroupManager()
         self.stack_watch = StackWatch(self.thread_group_mgr)
+        self.watch_data_buffer = watchrule.WatchDataBuffer()
+        # Template validation results, in least recently used order
+        self._validation_cache = collections.OrderedDict()
         self.listener = EngineListener(host, self.engine_id,
                                        self.thread_group_mgr)
         logger.debug("Starting listener for engine %s" % self.engine_id)
@@ -296,11 +387,29 @@ class EngineService(service.Service):
     def start(self):
         super(EngineService, self).start()
 
-        # Create a periodic_watcher_task per-stack
-        admin_context = context.get_admin_context()
-        stacks = db_api.stack_get_all(admin_context, tenant_safe=False)
-        for s in stacks:
-            self.stack_watch.start_watch_task(s.id, admin_context)
+        # Keep the leases on the stack locks held by this engine alive
+        self.thread_group_mgr.add_service_timer(
+            cfg.CONF.stack_lock_lease_duration / 3.0,
+            stack_lock.StackLock.renew_leases, self.engine_id)
+
+        if cfg.CONF.stack_affinity:
+            self.stack_router = stack_affinity.StackRouter(self.host,
+                                                           self.topic,
+                                                           self.engine_id)
+            self.stack_router.report()
+            self.thread_group_mgr.add_service_timer(
+                cfg.CONF.periodic_interval, self.stack_router.report)
+
+        # Write buffered metric samples out even when few are pushed
+        self.thread_group_mgr.add_service_timer(
+            cfg.CONF.watch_data_flush_interval,
+            self.watch_data_buffer.flush)
+
+        # Start the periodic_watcher_task in the background, so that RPC
+        # requests are served straight away
+        self.thread_group_mgr.start(cfg.CONF.periodic_interval,
+                                    self.stack_watch.start_watch_tasks,
+                                    context.get_admin_context())
 
     def stop(self):
         # Stop rpc connection at first for preventing new requests
@@ -310,6 +419,10 @@ class EngineService(service.Service):
         except Exception:
             pass
 
+        # Leave the stack affinity ring so other engines take over
+        if self.stack_router is not None:
+            self.stack_router.stop()
+
         # Wait for all active threads to be finished
         for stack_id in self.thread_group_mgr.groups.keys():
             # Ingore dummy service task
@@ -321,6 +434,8 @@ class EngineService(service.Service):
             self.thread_group_mgr.stop(stack_id, True)
             logger.info(_("Stack %s processing was finished") % stack_id)
 
+        self.watch_data_buffer.flush()
+
         # Terminate the engine process
         logger.info(_("All threads were gone, terminating engine"))
         super(EngineService, self).stop()
@@ -528,11 +643,10 @@ class EngineService(service.Service):
             else:
                 stack.create()
 
-            if (stack.action in (stack.CREATE, stack.ADOPT)
+            # The periodic watcher task picks up the watch rules of the
+            # stack on its next run
+            if not (stack.action in (stack.CREATE, stack.ADOPT)
                     and stack.status == stack.COMPLETE):
-                # Schedule a periodic watcher task for this stack
-                self.stack_watch.start_watch_task(stack.id, cnxt)
-            else:
                 logger.warning(_("Stack create failed, status %s") %
                                stack.status)
 
@@ -555,6 +669,7 @@ class EngineService(service.Service):
         return dict(stack.identifier())
 
     @request_context
+    @stack_affinity_route
     def update_stack(self, cnxt, stack_identity, template, params,
                      files, args):
         """
@@ -625,6 +740,22 @@ class EngineService(service.Service):
             msg = _("No Template provided.")
             return webob.exc.HTTPBadRequest(explanation=msg)
 
+        # Validation does not depend on the request context, only on the
+        # template, the environment and the registered resource types.
+        content = json.dumps([template, params], sort_keys=True)
+        key = (hashlib.sha1(content).hexdigest(),
+               resources.global_env().registry.version)
+
+        result = self._validation_cache.pop(key, None)
+        if result is None:
+            result = self._validate_template(cnxt, template, params)
+
+        self._validation_cache[key] = result
+        while len(self._validation_cache) > cfg.CONF.validation_cache_size:
+            self._validation_cache.popitem(last=False)
+        return copy.deepcopy(result)
+
+    def _validate_template(self, cnxt, template, params):
         tmpl = parser.Template(template)
 
         # validate overall template
@@ -694,6 +825,7 @@ class EngineService(service.Service):
         return None
 
     @request_context
+    @stack_affinity_route
     def delete_stack(self, cnxt, stack_identity):
         """
         The delete_stack method deletes a given stack.
@@ -757,6 +889,7 @@ class EngineService(service.Service):
         return None
 
     @request_context
+    @stack_affinity_route
     def abandon_stack(self, cnxt, stack_identity):
         """
         The abandon_stack method abandons a given stack.
@@ -911,6 +1044,7 @@ class EngineService(service.Service):
         return api.format_stack_resource(stack[resource_name])
 
     @request_context
+    @stack_affinity_route
     def resource_signal(self, cnxt, stack_identity, resource_name, details):
         s = self._get_stack(cnxt, stack_identity)
 
@@ -972,6 +1106,7 @@ class EngineService(service.Service):
                 for resource in stack.values()]
 
     @request_context
+    @stack_affinity_route
     def stack_suspend(self, cnxt, stack_identity):
         '''
         Handle request to perform suspend action on a stack
@@ -987,6 +1122,7 @@ class EngineService(service.Service):
                                               _stack_suspend, stack)
 
     @request_context
+    @stack_affinity_route
     def stack_resume(self, cnxt, stack_identity):
         '''
         Handle request to perform a resume action on a stack
@@ -1002,6 +1138,7 @@ class EngineService(service.Service):
                                               _stack_resume, stack)
 
     @request_context
+    @stack_affinity_route
     def metadata_update(self, cnxt, stack_identity,
                         resource_name, metadata):
         """
@@ -1040,23 +1177,11 @@ class EngineService(service.Service):
         This could be used by CloudWatch and WaitConditions
         and treat HA service events like any other CloudWatch.
         '''
-        def get_matching_watches():
-            if watch_name:
-                yield watchrule.WatchRule.load(cnxt, watch_name)
-            else:
-                for wr in db_api.watch_rule_get_all(cnxt):
-                    if watchrule.rule_can_use_sample(wr, stats_data):
-                        yield watchrule.WatchRule.load(cnxt, watch=wr)
-
-        rule_run = False
-        for rule in get_matching_watches():
+        if watch_name:
+            rule = watchrule.WatchRule.load(cnxt, watch_name)
             rule.create_watch_data(stats_data)
-            rule_run = True
-
-        if not rule_run:
-            if watch_name is None:
-                watch_name = 'Unknown'
-            raise exception.WatchRuleNotFound(watch_name=watch_name)
+        elif not self.watch_data_buffer.add(cnxt, stats_data):
+            raise exception.WatchRuleNotFound(watch_name='Unknown')
 
         return stats_data
 
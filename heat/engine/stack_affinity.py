@@ -0,0 +1,195 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import datetime
+
+from oslo.config import cfg
+
+from heat.common import context
+from heat.common import hash_ring
+from heat.db import api as db_api
+from heat.openstack.common.gettextutils import _
+from heat.openstack.common import log as logging
+from heat.openstack.common.rpc import common as rpc_common
+from heat.openstack.common.rpc import proxy
+from heat.openstack.common import timeutils
+
+cfg.CONF.import_opt('engine_life_check_timeout', 'heat.common.config')
+cfg.CONF.import_opt('periodic_interval', 'heat.common.config')
+cfg.CONF.import_opt('stack_affinity_replicas', 'heat.common.config')
+
+logger = logging.getLogger(__name__)
+
+
+class StackRouter(object):
+    '''
+    Map stacks onto the live engine hosts using a consistent hash ring.
+
+    Nested stacks are hashed by the ID of their root stack, so that a whole
+    tree of stacks is handled by the same engine host. Engines record their
+    liveness in the service table; an engine that has not reported for three
+    report intervals is dropped from the ring, as is an engine that failed to
+    answer a liveness check, until it next reports.
+    '''
+
+    ROOT_CACHE_SIZE = 10000
+
+    def __init__(self, host, topic, engine_id):
+        self.host = host
+        self.topic = topic
+        self.engine_id = engine_id
+        self.service_id = None
+        self.stopped = False
+        self._root_ids = collections.OrderedDict()
+        self._failed = {}
+        self._engine_ids = {}
+        self.ring = hash_ring.HashRing([host],
+                                       cfg.CONF.stack_affinity_replicas)
+
+    def report(self):
+        '''
+        Record that this engine is alive and refresh the ring.
+
+        This does nothing once the router has been stopped. Errors are logged
+        rather than raised, so that the timer calling this keeps running.
+        '''
+        if self.stopped:
+            return
+
+        try:
+            admin_context = context.get_admin_context()
+            if self.service_id is None:
+                service = db_api.service_create(admin_context, {
+                    'engine_id': self.engine_id,
+                    'host': self.host,
+                    'topic': self.topic,
+                    'report_interval': cfg.CONF.periodic_interval})
+                self.service_id = service.id
+            else:
+                db_api.service_update(admin_context, self.service_id, {})
+
+            self.refresh(admin_context)
+        except Exception:
+            logger.exception(_("Engine host %s failed to report its status")
+                             % self.host)
+
+    def refresh(self, cnxt):
+        '''Rebuild the ring if engines have joined or left.'''
+        now = timeutils.utcnow()
+
+        def alive(service):
+            last_seen = service.updated_at or service.created_at
+            expiry = datetime.timedelta(seconds=3 * service.report_interval)
+            return now - last_seen <= expiry
+
+        def reported_since_failure(service):
+            failed_at = self._failed.get(service.host)
+            if failed_at is None:
+                return True
+            if (service.updated_at or service.created_at) > failed_at:
+                del self._failed[service.host]
+                return True
+            return False
+
+        def last_seen(service):
+            return service.updated_at or service.created_at
+
+        # The latest report from each host gives the engine running there
+        services = sorted((s for s in db_api.service_get_all(cnxt)
+                           if alive(s) and reported_since_failure(s)),
+                          key=last_seen)
+        self._engine_ids = dict((s.host, s.engine_id) for s in services)
+        hosts = set(self._engine_ids)
+        hosts.add(self.host)
+        self._set_hosts(hosts)
+
+    def _set_hosts(self, hosts):
+        if hosts != self.ring.nodes:
+            logger.info(_("Engine hosts changed to %s, rebalancing stacks")
+                        % ', '.join(sorted(hosts)))
+            self.ring = hash_ring.HashRing(hosts,
+                                           cfg.CONF.stack_affinity_replicas)
+
+    def host_failed(self, host):
+        '''
+        Drop an engine that did not answer a liveness check from the ring, so
+        that later calls do not wait for it too, until it reports again.
+        '''
+        if host != self.host:
+            self._failed[host] = timeutils.utcnow()
+            self._set_hosts(self.ring.nodes - set([host]))
+
+    def host_alive(self, cnxt, host):
+        '''
+        Return True if the engine on the given host answers a liveness check
+        within engine_life_check_timeout seconds.
+        '''
+        engine_id = self._engine_ids.get(host)
+        if engine_id is None:
+            return False
+
+        rpc = proxy.RpcProxy(engine_id, '1.0')
+        try:
+            return rpc.call(cnxt, rpc.make_msg('listening'), topic=engine_id,
+                            timeout=cfg.CONF.engine_life_check_timeout)
+        except rpc_common.Timeout:
+            return False
+
+    def stop(self):
+        '''Remove this engine from the ring of every engine.'''
+        self.stopped = True
+        if self.service_id is not None:
+            db_api.service_delete(context.get_admin_context(),
+                                  self.service_id)
+            self.service_id = None
+
+    def root_stack_id(self, cnxt, stack_id):
+        '''
+        Return the ID of the top-level stack owning the given stack.
+
+        A stack's owner never changes, so the result is cached.
+        '''
+        seen = []
+        root_id = stack_id
+        while root_id not in seen:
+            cached = self._root_ids.pop(root_id, None)
+            if cached is not None:
+                self._root_ids[root_id] = cached
+                root_id = cached
+                break
+            seen.append(root_id)
+            s = db_api.stack_get(cnxt, root_id, show_deleted=True,
+                                 tenant_safe=False)
+            if s is None:
+                # Not known yet, so do not cache the result
+                return root_id
+            if s.owner_id is None:
+                break
+            root_id = s.owner_id
+
+        for sid in seen:
+            self._root_ids[sid] = root_id
+        while len(self._root_ids) > self.ROOT_CACHE_SIZE:
+            self._root_ids.popitem(last=False)
+        return root_id
+
+    def get_host(self, cnxt, stack_id):
+        '''Return the engine host that the given stack is routed to.'''
+        return self.ring.get_node(self.root_stack_id(cnxt, stack_id))
+
+    def route(self, cnxt, host, method, **kwargs):
+        '''Call an engine RPC method on the given engine host.'''
+        topic = '%s.%s' % (self.topic, host)
+        rpc = proxy.RpcProxy(topic, '1.0')
+        return rpc.call(cnxt, rpc.make_msg(method, **kwargs), topic=topic)
@@ -13,16 +13,10 @@
 
 import uuid
 
-from oslo.config import cfg
-
 from heat.common import exception
 from heat.db import api as db_api
 from heat.openstack.common.gettextutils import _
 from heat.openstack.common import log as logging
-from heat.openstack.common.rpc import common as rpc_common
-from heat.openstack.common.rpc import proxy
-
-cfg.CONF.import_opt('engine_life_check_timeout', 'heat.common.config')
 
 logger = logging.getLogger(__name__)
 
@@ -36,14 +30,32 @@ class StackLock(object):
 
     @staticmethod
     def engine_alive(context, engine_id):
-        topic = engine_id
-        rpc = proxy.RpcProxy(topic, "1.0")
-        msg = rpc.make_msg("listening")
+        """
+        Return True if the engine holds an unexpired lease on any stack lock.
+
+        Every engine renews the leases on all of its locks together, so an
+        engine with an expired lease is presumed to be dead.
+        """
+        return db_api.stack_lock_lease_alive(engine_id)
+
+    @staticmethod
+    def renew_leases(engine_id):
+        """
+        Extend the leases on all stack locks held by the engine.
+
+        Errors are logged rather than raised, so that the timer calling this
+        keeps running and the leases are renewed again on its next run.
+        """
         try:
-            return rpc.call(context, msg, topic=topic,
-                            timeout=cfg.CONF.engine_life_check_timeout)
-        except rpc_common.Timeout:
-            return False
+            count = db_api.stack_lock_renew(engine_id)
+        except Exception:
+            logger.exception(_("Engine %s failed to renew the leases on its "
+                               "stack locks") % engine_id)
+            return
+        if count:
+            logger.debug("Engine %(engine)s renewed the lease on %(count)d "
+                         "stack locks" % {'engine': engine_id,
+                                          'count': count})
 
     @staticmethod
     def generate_engine_id():
@@ -71,24 +83,20 @@ class StackLock(object):
                                         'stack': self.stack.id})
             return
 
-        if lock_engine_id == self.engine_id or \
-           self.engine_alive(self.context, lock_engine_id):
+        if lock_engine_id == self.engine_id:
             logger.debug("Lock on stack %(stack)s is owned by engine "
                          "%(engine)s" % {'stack': self.stack.id,
                                          'engine': lock_engine_id})
             raise exception.ActionInProgress(stack_name=self.stack.name,
                                              action=self.stack.action)
         else:
-            logger.info(_("Stale lock detected on stack %(stack)s.  Engine "
-                          "%(engine)s will attempt to steal the lock")
-                        % {'stack': self.stack.id, 'engine': self.engine_id})
-
+            # Stealing only succeeds if the owner's lease has expired
             result = db_api.stack_lock_steal(self.stack.id, lock_engine_id,
                                              self.engine_id)
 
             if result is None:
-                logger.info(_("Engine %(engine)s successfully stole the lock "
-                              "on stack %(stack)s")
+                logger.info(_("Stale lock detected on stack %(stack)s. "
+                              "Engine %(engine)s successfully stole the lock")
                             % {'engine': self.engine_id,
                                'stack': self.stack.id})
                 return
@@ -99,6 +107,10 @@ class StackLock(object):
                                   "Trying again") % {'stack': self.stack.id,
                                                      'engine': self.engine_id})
                     return self.acquire(retry=False)
+            elif result == lock_engine_id:
+                logger.debug("Lock on stack %(stack)s is owned by engine "
+                             "%(engine)s" % {'stack': self.stack.id,
+                                             'engine': lock_engine_id})
             else:
                 new_lock_engine_id = result
                 logger.info(_("Failed to steal lock on stack %(stack)s. "
@@ -15,11 +15,15 @@ import abc
 import collections
 import functools
 
+from oslo.config import cfg
+
 from heat.common import exception
 from heat.db import api as db_api
 from heat.engine import plugin_manager
 from heat.openstack.common import log as logging
 
+cfg.CONF.import_opt('template_cache_size', 'heat.common.config')
+
 logger = logging.getLogger(__name__)
 
 __all__ = ['Template']
@@ -27,6 +31,10 @@ __all__ = ['Template']
 
 _template_classes = None
 
+# Parsed templates, keyed by raw_template ID and content hash, in least
+# recently used order
+_template_cache = collections.OrderedDict()
+
 
 class TemplatePluginManager(object):
     '''A Descriptor class for caching PluginManagers.
@@ -98,6 +106,57 @@ def get_template_class(plugin_mgr, template_data):
         raise exception.InvalidTemplateVersion(explanation=explanation)
 
 
+class TemplateFiles(collections.MutableMapping):
+    '''
+    The files referenced by a template.
+
+    Copies share the same underlying dict, which is only copied when one of
+    them is modified. A tree of nested stacks therefore holds a single copy of
+    its files in memory.
+    '''
+
+    def __init__(self, files=None):
+        if isinstance(files, TemplateFiles):
+            self._files = files._files
+            files._shared = True
+            self._shared = True
+        else:
+            self._files = dict(files or {})
+            self._shared = False
+
+    def __getitem__(self, key):
+        return self._files[key]
+
+    def __setitem__(self, key, value):
+        self._unshare()
+        self._files[key] = value
+
+    def __delitem__(self, key):
+        self._unshare()
+        del self._files[key]
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def _unshare(self):
+        if self._shared:
+            self._files = dict(self._files)
+            self._shared = False
+
+    def __copy__(self):
+        return TemplateFiles(self)
+
+    def __deepcopy__(self, memo):
+        # The values are strings, so sharing them is safe
+        return TemplateFiles(self)
+
+    def __repr__(self):
+        return repr(self._files)
+
+
 class Template(collections.Mapping):
     '''A stack template.'''
 
@@ -120,26 +179,56 @@ class Template(collections.Mapping):
         '''
         self.id = template_id
         self.t = template
-        self.files = files or {}
+        self.files = TemplateFiles(files)
+        # Translated sections, shared with any copies of the template
+        self._sections = {}
+        # Snippets containing no functions, keyed by ID, shared with copies.
+        # This is a single-item list, holding None until the analysis is done.
+        self._static_snippets = [None]
         self.maps = self[self.MAPPINGS]
         self.version = get_version(self.t, _template_classes.keys())
 
+    def __copy__(self):
+        '''Return a copy sharing the parsed template but not the files.'''
+        tmpl = super(Template, type(self)).__new__(type(self))
+        tmpl.__dict__.update(self.__dict__)
+        tmpl.files = TemplateFiles(self.files)
+        return tmpl
+
     @classmethod
     def load(cls, context, template_id, t=None):
-        '''Retrieve a Template with the given ID from the database.'''
-        if t is None:
-            t = db_api.raw_template_get(context, template_id)
-        return cls(t.template, template_id=template_id, files=t.files)
+        '''Retrieve a Template with the given ID from the database.
+
+        Parsed templates are cached per process, so that loading the
+        template of a stack again only returns a copy of the cached one.
+        Stored raw templates are never modified, but the ID of a purged one
+        may be reused, so the cache is keyed by ID and content hash and only
+        the hash is read from the database for a cached template.
+        '''
+        key = (template_id, db_api.raw_template_get_hash(context,
+                                                         template_id))
+        tmpl = _template_cache.pop(key, None)
+        if tmpl is None:
+            if t is None:
+                t = db_api.raw_template_get(context, template_id)
+            tmpl = cls(t.template, template_id=template_id, files=t.files)
+
+        _template_cache[key] = tmpl
+        while len(_template_cache) > cfg.CONF.template_cache_size:
+            _template_cache.popitem(last=False)
+        return tmpl.__copy__()
 
     def store(self, context=None):
         '''Store the Template in the database and return its ID.'''
         if self.id is None:
             rt = {
                 'template': self.t,
-                'files': self.files
+                'files': dict(self.files)
             }
             new_rt = db_api.raw_template_create(context, rt)
             self.id = new_rt.id
+            for key in [k for k in _template_cache if k[0] == self.id]:
+                del _template_cache[key]
         return self.id
 
     def __iter__(self):
@@ -171,7 +260,29 @@ class Template(collections.Mapping):
         return self._functionmaps[self.version]
 
     def parse(self, stack, snippet):
-        return parse(self.functions(), stack, snippet)
+        return parse(self.functions(), stack, snippet,
+                     self.static_snippets())
+
+    def static_snippets(self):
+        '''
+        Return the snippets of the template that contain no functions.
+
+        The result is a dict keyed by the ID of each snippet, so that parsing
+        can return those parts of the template as they are instead of copying
+        them. The analysis is performed only once for each template.
+        '''
+        if self._static_snippets[0] is None:
+            static = {}
+            functions = self.functions()
+            for section in (self.RESOURCES, self.OUTPUTS):
+                try:
+                    snippet = self[section]
+                except (KeyError, AttributeError):
+                    # Invalid sections are reported by validation
+                    continue
+                analyse(functions, snippet, static)
+            self._static_snippets[0] = static
+        return self._static_snippets[0]
 
     def validate(self):
         '''Validate the template.
@@ -210,8 +321,44 @@ class Template(collections.Mapping):
                 raise exception.StackValidationFailed(message=message)
 
 
-def parse(functions, stack, snippet):
-    recurse = functools.partial(parse, functions, stack)
+def analyse(functions, snippet, static):
+    '''
+    Find the parts of a snippet that contain no functions.
+
+    Every mapping and list in the snippet that contains no functions is added
+    to the static dict, keyed by its ID. Returns True if the snippet contains
+    any functions.
+    '''
+    if isinstance(snippet, collections.Mapping):
+        has_functions = len(snippet) == 1 and next(iter(snippet)) in functions
+        children = snippet.itervalues()
+    elif (not isinstance(snippet, basestring) and
+          isinstance(snippet, collections.Iterable)):
+        has_functions = False
+        children = iter(snippet)
+    else:
+        return False
+
+    for child in children:
+        if analyse(functions, child, static):
+            has_functions = True
+
+    if not has_functions:
+        static[id(snippet)] = snippet
+    return has_functions
+
+
+def parse(functions, stack, snippet, static=None):
+    '''
+    Parse a snippet, replacing function definitions with Function objects.
+
+    Any part of the snippet found in the static dict returned by analyse() is
+    known to contain no functions, and is returned as it is.
+    '''
+    if static and id(snippet) in static:
+        return snippet
+
+    recurse = functools.partial(parse, functions, stack, static=static)
 
     if isinstance(snippet, collections.Mapping):
         if len(snippet) == 1:
@@ -14,6 +14,8 @@
 
 import datetime
 
+from oslo.config import cfg
+
 from heat.common import exception
 from heat.db import api as db_api
 from heat.engine import parser
@@ -23,6 +25,9 @@ from heat.openstack.common import log as logging
 from heat.openstack.common import timeutils
 from heat.rpc import api as rpc_api
 
+cfg.CONF.import_opt('periodic_interval', 'heat.common.config')
+cfg.CONF.import_opt('watch_data_batch_size', 'heat.common.config')
+
 logger = logging.getLogger(__name__)
 
 
@@ -390,3 +395,97 @@ def rule_can_use_sample(wr, stats_data):
             if match_dimesions(rule_dims, data_dims):
                 return True
     return False
+
+
+class WatchDataBuffer(object):
+    '''
+    Match metric samples that are pushed without a watch name against an
+    index of the watch rules by metric name, and write the samples for
+    the matching rules to the database in batches.
+    '''
+
+    def __init__(self):
+        self._index = {}
+        self._last_rule_id = 0
+        self._loaded_at = None
+        self._pending = []
+
+    @staticmethod
+    def _metric_name(wr):
+        if wr.state == WatchRule.CEILOMETER_CONTROLLED:
+            return wr.rule.get('meter_name')
+        return wr.rule.get('MetricName')
+
+    def _index_rules(self, wrs):
+        for wr in wrs:
+            self._last_rule_id = max(self._last_rule_id, wr.id)
+            metric = self._metric_name(wr)
+            if metric is not None:
+                self._index.setdefault(metric, []).append(wr)
+
+    def _refresh(self, context):
+        interval = datetime.timedelta(seconds=cfg.CONF.periodic_interval)
+        now = timeutils.utcnow()
+        if self._loaded_at is None or now - self._loaded_at > interval:
+            # Rebuild the whole index now and then to drop deleted rules
+            # and pick up state changes
+            self._index = {}
+            self._last_rule_id = 0
+            self._loaded_at = now
+            self._index_rules(db_api.watch_rule_get_all(context))
+        else:
+            self._index_rules(db_api.watch_rule_get_all_after(
+                context, self._last_rule_id))
+
+    def _matching_rules(self, stats_data):
+        matches = {}
+        for metric in stats_data:
+            if metric == 'Namespace':
+                continue
+            for wr in self._index.get(metric, []):
+                if rule_can_use_sample(wr, stats_data):
+                    matches[wr.id] = wr
+        return matches.values()
+
+    def add(self, context, stats_data):
+        '''
+        Queue the sample for all the watch rules that can use it, and return
+        the number of matching rules.
+        '''
+        if self._loaded_at is None:
+            self._refresh(context)
+        wrs = self._matching_rules(stats_data)
+        if not wrs:
+            # The rule may have been created since the index was loaded
+            self._refresh(context)
+            wrs = self._matching_rules(stats_data)
+
+        now = timeutils.utcnow()
+        for wr in wrs:
+            if wr.state == WatchRule.CEILOMETER_CONTROLLED:
+                rule = WatchRule(context=context, watch_name=wr.name,
+                                 rule=wr.rule, stack_id=wr.stack_id,
+                                 state=wr.state, wid=wr.id)
+                rule.create_watch_data(stats_data)
+            else:
+                self._pending.append({'data': stats_data,
+                                      'watch_rule_id': wr.id,
+                                      'created_at': now})
+
+        if len(self._pending) >= cfg.CONF.watch_data_batch_size:
+            self.flush()
+        return len(wrs)
+
+    def flush(self):
+        '''Write the queued samples to the database.'''
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            count = db_api.watch_data_create_all(None, pending)
+        except Exception:
+            logger.exception(_('Failed to store %d metric samples')
+                             % len(pending))
+            return
+        logger.debug('stored %(count)d of %(total)d metric samples' %
+                     {'count': count, 'total': len(pending)})
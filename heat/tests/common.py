@@ -24,9 +24,15 @@ from oslotest import mockpatch
 import testscenarios
 import testtools
 
+from heat.common import heat_keystoneclient
+from heat.engine import clients
+from heat.engine import constraints
 from heat.engine import environment
 from heat.engine import resources
+from heat.engine.resources.neutron import neutron
+from heat.engine.resources import nova_utils
 from heat.engine import scheduler
+from heat.engine import template
 from heat.tests import utils
 
 
@@ -93,6 +99,29 @@ class HeatTestCase(testscenarios.WithScenarios,
         utils.setup_dummy_db()
         self.addCleanup(utils.reset_dummy_db)
 
+        # Process-wide caches must not carry state from one test to another,
+        # nor answer calls expected by mocks replayed later in a test
+        self.clear_caches()
+        self.addCleanup(self.clear_caches)
+        replay_all = self.m.ReplayAll
+
+        def clear_caches_and_replay():
+            self.clear_caches()
+            replay_all()
+
+        self.m.ReplayAll = clear_caches_and_replay
+
+    @staticmethod
+    def clear_caches():
+        for cache in (template._template_cache,
+                      constraints._valid_values,
+                      clients._pool,
+                      clients._rate_limiters,
+                      nova_utils._lookup_cache,
+                      heat_keystoneclient._client_cache,
+                      neutron._bulk_creators):
+            cache.clear()
+
     def stub_wallclock(self):
         """
         Overrides scheduler wallclock to speed up tests expecting timeouts.
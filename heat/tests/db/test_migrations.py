@@ -34,6 +34,7 @@ from six.moves.urllib import parse as urlparse
 
 from heat.db.sqlalchemy import migrate_repo
 from heat.db.sqlalchemy import migration
+from heat.db.sqlalchemy import types as heat_db_types
 from heat.openstack.common.db.sqlalchemy import test_migrations
 from heat.openstack.common import log as logging
 from heat.tests import common
@@ -251,3 +252,65 @@ class TestHeatMigrations(test_migrations.BaseMigrationTestCase,
 
     def _check_040(self, engine, data):
         self.assertColumnNotExists(engine, 'software_deployment', 'signal_id')
+
+    def _check_045(self, engine, data):
+        self.assertColumnExists(engine, 'service', 'engine_id')
+        self.assertColumnExists(engine, 'service', 'host')
+        self.assertColumnExists(engine, 'service', 'report_interval')
+        self.assertColumnExists(engine, 'service', 'deleted_at')
+
+    def _check_046(self, engine, data):
+        self.assertColumnExists(engine, 'stack_lock', 'expires_at')
+
+    def _pre_upgrade_047(self, engine):
+        raw_template = get_table(engine, 'raw_template')
+        templ = [dict(id=47, template='{}',
+                      files='{"foo": "shared", "bar": "shared"}'),
+                 dict(id=48, template='{}', files='{"foo": "shared"}')]
+        engine.execute(raw_template.insert(), templ)
+        return templ
+
+    def _check_047(self, engine, data):
+        self.assertColumnExists(engine, 'raw_template', 'template_hash')
+        self.assertIndexExists(engine, 'raw_template',
+                               'ix_raw_template_template_hash')
+
+        tmpl_file = get_table(engine, 'raw_template_file')
+        files = engine.execute(tmpl_file.select()).fetchall()
+        self.assertEqual(['shared'], [f.contents for f in files])
+
+        file_ref = get_table(engine, 'raw_template_file_ref')
+        refs = engine.execute(file_ref.select()).fetchall()
+        self.assertEqual(sorted([(47, 'bar'), (47, 'foo'), (48, 'foo')]),
+                         sorted((r.raw_template_id, r.name) for r in refs))
+
+        raw_template = get_table(engine, 'raw_template')
+        for rt in engine.execute(raw_template.select().where(
+                raw_template.c.id.in_([47, 48]))):
+            self.assertEqual('null', rt.files)
+            self.assertIsNotNone(rt.template_hash)
+
+    def _pre_upgrade_048(self, engine):
+        raw_template = get_table(engine, 'raw_template')
+        large = '{"foo": "%s"}' % ('x' * 2048)
+        templ = [dict(id=49, template='{}', files='null'),
+                 dict(id=50, template=large, files='null')]
+        engine.execute(raw_template.insert(), templ)
+        return templ
+
+    def _check_048(self, engine, data):
+        raw_template = get_table(engine, 'raw_template')
+        rows = dict((rt.id, rt) for rt in engine.execute(
+            raw_template.select().where(raw_template.c.id.in_([49, 50]))))
+        self.assertEqual('{}', rows[49].template)
+        self.assertTrue(heat_db_types.is_compressed(rows[50].template))
+        self.assertEqual(data[1]['template'],
+                         heat_db_types.decompress(rows[50].template))
+
+    def _check_049(self, engine, data):
+        self.assertIndexMembers(engine, 'raw_template_file_ref',
+                                'ix_raw_template_file_ref_raw_template_id',
+                                ['raw_template_id'])
+        self.assertIndexMembers(engine, 'raw_template_file_ref',
+                                'ix_raw_template_file_ref_file_id',
+                                ['file_id'])
@@ -12,6 +12,7 @@
 #    under the License.
 
 
+import datetime
 import json
 
 from oslo.config import cfg
@@ -21,6 +22,7 @@ from heat.api.aws import ec2token
 from heat.api.aws import exception
 from heat.common.wsgi import Request
 from heat.openstack.common import importutils
+from heat.openstack.common import timeutils
 from heat.tests.common import HeatTestCase
 
 
@@ -180,7 +182,8 @@ class Ec2TokenTest(HeatTestCase):
         self.assertEqual('xyz', ec2.__call__(dummy_req))
 
     def _stub_http_connection(self, headers={}, params={}, response=None,
-                              req_url='http://123:5000/v2.0/ec2tokens'):
+                              req_url='http://123:5000/v2.0/ec2tokens',
+                              signature='xyz'):
 
         class DummyHTTPResponse(object):
             text = response
@@ -196,7 +199,7 @@ class Ec2TokenTest(HeatTestCase):
                                  "host": "heat:8000",
                                  "verb": "GET",
                                  "params": params,
-                                 "signature": "xyz",
+                                 "signature": signature,
                                  "path": "/v1",
                                  "body_hash": body_hash}})
         req_headers = {'Content-Type': 'application/json'}
@@ -228,6 +231,96 @@ class Ec2TokenTest(HeatTestCase):
         self.assertEqual('abcd1234', dummy_req.headers['X-Tenant-Id'])
         self.m.VerifyAll()
 
+    def _dummy_signed_request(self, signature='xyz'):
+        auth_str = ('Authorization: foo  Credential=foo/bar, '
+                    'SignedHeaders=content-type;host;x-amz-date, '
+                    'Signature=%s' % signature)
+        req_env = {'SERVER_NAME': 'heat',
+                   'SERVER_PORT': '8000',
+                   'PATH_INFO': '/v1',
+                   'HTTP_AUTHORIZATION': auth_str}
+        return self._dummy_GET_request(environ=req_env), auth_str
+
+    def test_call_ok_cached(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        ok_resp = json.dumps({'access': {'token': {
+            'id': 123,
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        dummy_req, auth_str = self._dummy_signed_request()
+        self._stub_http_connection(headers={'Authorization': auth_str},
+                                   response=ok_resp)
+        self.m.ReplayAll()
+        self.assertEqual('woot', ec2.__call__(dummy_req))
+
+        dummy_req, auth_str = self._dummy_signed_request()
+        self.assertEqual('woot', ec2.__call__(dummy_req))
+        self.assertEqual('tenant', dummy_req.headers['X-Tenant-Name'])
+        self.assertEqual('abcd1234', dummy_req.headers['X-Tenant-Id'])
+        self.assertEqual(123, dummy_req.headers['X-Auth-Token'])
+        self.m.VerifyAll()
+
+    def test_call_cache_keyed_by_signature(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        ok_resp = json.dumps({'access': {'token': {
+            'id': 123,
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        err_resp = json.dumps({})
+        dummy_req, auth_str = self._dummy_signed_request()
+        self._stub_http_connection(headers={'Authorization': auth_str},
+                                   response=ok_resp)
+        other_req, other_auth_str = self._dummy_signed_request('abc')
+        self._stub_http_connection(headers={'Authorization': other_auth_str},
+                                   response=err_resp, signature='abc')
+        self.m.ReplayAll()
+        self.assertEqual('woot', ec2.__call__(dummy_req))
+        self.assertRaises(exception.HeatAccessDeniedError,
+                          ec2.__call__, other_req)
+        self.m.VerifyAll()
+
+    def test_call_cache_expired(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0', 'cache_ttl': '30'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        ok_resp = json.dumps({'access': {'token': {
+            'id': 123,
+            'expires': '2014-05-01T00:00:20Z',
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        for i in range(2):
+            dummy_req, auth_str = self._dummy_signed_request()
+            self._stub_http_connection(headers={'Authorization': auth_str},
+                                       response=ok_resp)
+        self.m.ReplayAll()
+
+        # The cached result expires with the token, before the TTL elapses
+        timeutils.set_time_override(datetime.datetime(2014, 5, 1))
+        self.addCleanup(timeutils.clear_time_override)
+        for seconds in (0, 19, 1):
+            timeutils.advance_time_seconds(seconds)
+            dummy_req, auth_str = self._dummy_signed_request()
+            self.assertEqual('woot', ec2.__call__(dummy_req))
+        self.m.VerifyAll()
+
+    def test_call_cache_disabled(self):
+        dummy_conf = {'auth_uri': 'http://123:5000/v2.0', 'cache_ttl': '0'}
+        ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
+
+        ok_resp = json.dumps({'access': {'token': {
+            'id': 123,
+            'tenant': {'name': 'tenant', 'id': 'abcd1234'}}}})
+        for i in range(2):
+            dummy_req, auth_str = self._dummy_signed_request()
+            self._stub_http_connection(headers={'Authorization': auth_str},
+                                       response=ok_resp)
+        self.m.ReplayAll()
+        for i in range(2):
+            dummy_req, auth_str = self._dummy_signed_request()
+            self.assertEqual('woot', ec2.__call__(dummy_req))
+        self.m.VerifyAll()
+
     def test_call_ok_roles(self):
         dummy_conf = {'auth_uri': 'http://123:5000/v2.0'}
         ec2 = ec2token.EC2Token(app='woot', conf=dummy_conf)
@@ -624,7 +624,7 @@ class AutoScalingGroupTest(HeatTestCase):
                                       num_updates_expected_on_updt=9,
                                       num_creates_expected_on_updt=1,
                                       num_deletes_expected_on_updt=1,
-                                      num_reloads_expected_on_updt=12,
+                                      num_reloads_expected_on_updt=11,
                                       update_replace=True)
 
     def test_autoscaling_group_update_no_replace(self):
@@ -11,7 +11,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 import mock
+from novaclient import shell as novashell
+from oslo.config import cfg
+from oslotest import mockpatch
 
 from heat.engine import clients
 from heat.tests.common import HeatTestCase
@@ -55,6 +60,7 @@ class ClientsTest(HeatTestCase):
         self.assertEqual('url_from_keystone', mock_call.call_args[0][1])
         obj._get_heat_url.return_value = "url_from_config"
         obj._heat = None
+        clients._pool.clear()
         obj.heat()
         self.assertEqual('url_from_config', mock_call.call_args[0][1])
 
@@ -86,3 +92,193 @@ class ClientsTest(HeatTestCase):
         heat = obj.heat()
         heat_cached = obj.heat()
         self.assertEqual(heat, heat_cached)
+
+
+class ClientPoolTest(HeatTestCase):
+
+    def setUp(self):
+        super(ClientPoolTest, self).setUp()
+        cfg.CONF.set_override('client_pool_ttl', 300)
+        cfg.CONF.set_override('client_pool_size', 2)
+        self.pool = clients.ClientPool()
+        self.create = mock.Mock(side_effect=lambda: object())
+
+    def test_shared(self):
+        client = self.pool.get('key', self.create)
+        self.assertIs(client, self.pool.get('key', self.create))
+        self.assertEqual(1, self.create.call_count)
+
+    def test_no_key(self):
+        self.pool.get(None, self.create)
+        self.pool.get(None, self.create)
+        self.assertEqual(2, self.create.call_count)
+
+    def test_disabled(self):
+        cfg.CONF.set_override('client_pool_ttl', 0)
+        self.pool.get('key', self.create)
+        self.pool.get('key', self.create)
+        self.assertEqual(2, self.create.call_count)
+
+    def test_none_not_pooled(self):
+        create = mock.Mock(return_value=None)
+        self.assertIsNone(self.pool.get('key', create))
+        self.assertIsNone(self.pool.get('key', create))
+        self.assertEqual(2, create.call_count)
+
+    @mock.patch.object(time, 'time')
+    def test_expired(self, mock_time):
+        mock_time.return_value = 1000
+        client = self.pool.get('key', self.create)
+        mock_time.return_value = 1299
+        self.assertIs(client, self.pool.get('key', self.create))
+        mock_time.return_value = 1300
+        self.assertIsNot(client, self.pool.get('key', self.create))
+        self.assertEqual(2, self.create.call_count)
+
+    def test_least_recently_used_evicted(self):
+        client_a = self.pool.get('a', self.create)
+        client_b = self.pool.get('b', self.create)
+        self.pool.get('a', self.create)
+        self.pool.get('c', self.create)
+        self.assertIs(client_a, self.pool.get('a', self.create))
+        self.assertIsNot(client_b, self.pool.get('b', self.create))
+        self.assertEqual(4, self.create.call_count)
+
+    def test_clients_share_pool(self):
+        self.useFixture(mockpatch.PatchObject(clients, '_pool', self.pool))
+        con = mock.Mock()
+        con.auth_url = "http://auth.example.com:5000/v2.0"
+        con.tenant_id = "b363706f891f48019483f8bd6503c54b"
+        con.auth_token = "3bcc3d3a03f44e3d8377f9247b0ad155"
+        other_con = mock.Mock()
+        other_con.auth_url = con.auth_url
+        other_con.tenant_id = con.tenant_id
+        other_con.auth_token = "9c1af1bc3b484e27a57ac5c2ad8e0d1b"
+
+        with mock.patch.object(clients.OpenStackClients, '_get_heat_url',
+                               return_value='url_from_config'):
+            with mock.patch.object(heatclient, 'Client') as mock_call:
+                mock_call.side_effect = lambda *a, **kw: object()
+                heat = clients.Clients(con).heat()
+                self.assertIs(heat, clients.Clients(con).heat())
+                self.assertIsNot(heat, clients.Clients(other_con).heat())
+        self.assertEqual(2, mock_call.call_count)
+
+    @mock.patch.object(novashell.OpenStackComputeShell,
+                       '_discover_extensions')
+    def test_nova_extensions_discovered_once(self, mock_discover):
+        self.useFixture(mockpatch.PatchObject(clients, '_nova_extensions',
+                                              None))
+        mock_discover.return_value = ['ext']
+        self.assertEqual(['ext'], clients.nova_extensions())
+        self.assertEqual(['ext'], clients.nova_extensions())
+        mock_discover.assert_called_once_with('1.1')
+
+
+class RateLimiterTest(HeatTestCase):
+
+    url = 'http://nova.example.com:8774/v2/servers'
+
+    def setUp(self):
+        super(RateLimiterTest, self).setUp()
+        cfg.CONF.set_override('backend_request_rate', 10)
+        self.now = 1000
+        self.patchobject(time, 'time').side_effect = lambda: self.now
+        self.sleep = self.patchobject(clients.eventlet, 'sleep')
+        self.sleep.side_effect = self._sleep
+
+    def _sleep(self, wait):
+        self.now += wait
+
+    def test_shared_per_tenant_and_endpoint(self):
+        limiter = clients.rate_limiter(self.url, 'tenant')
+        self.assertIs(limiter,
+                      clients.rate_limiter('http://nova.example.com:8774/x',
+                                           'tenant'))
+        self.assertIsNot(limiter,
+                         clients.rate_limiter('http://cinder.example.com/x',
+                                              'tenant'))
+        self.assertIsNot(limiter,
+                         clients.rate_limiter(self.url, 'other_tenant'))
+
+    def test_disabled(self):
+        cfg.CONF.set_override('backend_request_rate', 0)
+        self.assertIsNone(clients.rate_limiter(self.url))
+        request = mock.Mock(return_value=('resp', 'body'))
+        self.assertEqual(('resp', 'body'),
+                         clients.rate_limited(request)(self.url, 'GET'))
+
+    def test_throttle_and_relax(self):
+        limiter = clients.RateLimiter(10)
+        limiter.throttle(retry_after=5)
+        self.assertEqual(5, limiter.rate)
+
+        limiter.acquire()
+        self.assertEqual(1005, self.now)
+
+        for i in range(60):
+            limiter.relax()
+        self.assertEqual(10, limiter.rate)
+
+    def test_acquire_waits_for_token(self):
+        limiter = clients.RateLimiter(2)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertFalse(self.sleep.called)
+
+        limiter.acquire()
+        self.sleep.assert_called_once_with(0.5)
+
+    def test_retry_over_limit_exception(self):
+        over_limit = clients.novaclient.exceptions.OverLimit(
+            413, retry_after='3')
+        request = mock.Mock(side_effect=[over_limit, ('resp', 'body')])
+        self.assertEqual(('resp', 'body'),
+                         clients.rate_limited(request)(self.url, 'GET'))
+        self.assertEqual(2, request.call_count)
+        self.assertEqual(1003, self.now)
+        self.assertEqual(5.1, clients.rate_limiter(self.url).rate)
+
+    def test_quota_exceeded_not_retried(self):
+        over_quota = clients.novaclient.exceptions.OverLimit(413)
+        request = mock.Mock(side_effect=over_quota)
+        self.assertRaises(clients.novaclient.exceptions.OverLimit,
+                          clients.rate_limited(request), self.url, 'GET')
+        self.assertEqual(1, request.call_count)
+        self.assertEqual(10, clients.rate_limiter(self.url).rate)
+        self.assertFalse(self.sleep.called)
+
+    def test_quota_exceeded_response_not_retried(self):
+        over_quota = mock.Mock(status=413)
+        over_quota.get.return_value = None
+        request = mock.Mock(return_value=(over_quota, 'body'))
+        self.assertEqual((over_quota, 'body'),
+                         clients.rate_limited(request)(self.url, 'GET'))
+        self.assertEqual(1, request.call_count)
+        self.assertEqual(10, clients.rate_limiter(self.url).rate)
+
+    def test_retry_rate_limited_response(self):
+        limited = mock.Mock(status=429)
+        limited.get.return_value = None
+        ok = mock.Mock(status=200)
+        request = mock.Mock(side_effect=[(limited, None), (ok, 'body')])
+        self.assertEqual((ok, 'body'),
+                         clients.rate_limited(request)(self.url, 'GET'))
+        self.assertEqual(2, request.call_count)
+        self.assertEqual(5.1, clients.rate_limiter(self.url).rate)
+
+    def test_retries_exhausted(self):
+        cfg.CONF.set_override('backend_rate_limit_retries', 1)
+        over_limit = clients.novaclient.exceptions.RateLimit(429)
+        request = mock.Mock(side_effect=over_limit)
+        self.assertRaises(clients.novaclient.exceptions.RateLimit,
+                          clients.rate_limited(request), self.url, 'GET')
+        self.assertEqual(2, request.call_count)
+        self.assertEqual(2.5, clients.rate_limiter(self.url).rate)
+
+    def test_other_errors_not_retried(self):
+        not_found = clients.novaclient.exceptions.NotFound(404)
+        request = mock.Mock(side_effect=not_found)
+        self.assertRaises(clients.novaclient.exceptions.NotFound,
+                          clients.rate_limited(request), self.url, 'GET')
+        self.assertEqual(1, request.call_count)
@@ -11,7 +11,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-
+import mock
+from oslo.config import cfg
 import testtools
 
 from heat.engine import constraints
@@ -302,6 +303,65 @@ class CustomConstraintTest(testtools.TestCase):
         constraint = constraints.CustomConstraint("zero", environment=self.env)
         self.assertEqual("Only zero!", str(constraint))
 
+    def test_valid_value_cached(self):
+        class ZeroConstraint(object):
+            calls = []
+
+            def validate(self, value, context):
+                self.calls.append(value)
+                return value == 0
+
+        self.env.register_constraint("zero", ZeroConstraint)
+        self.addCleanup(constraints._valid_values.clear)
+        ctx = mock.Mock(tenant_id='tenant')
+
+        constraint = constraints.CustomConstraint("zero", environment=self.env)
+        constraint.validate(0, ctx)
+        constraint.validate(0, ctx)
+        self.assertRaises(ValueError, constraint.validate, 1, ctx)
+        self.assertRaises(ValueError, constraint.validate, 1, ctx)
+        constraint.validate(0, mock.Mock(tenant_id='other'))
+        self.assertEqual([0, 1, 1, 0], ZeroConstraint.calls)
+
+    def test_valid_value_cache_expiry(self):
+        class ZeroConstraint(object):
+            calls = []
+
+            def validate(self, value, context):
+                self.calls.append(value)
+                return value == 0
+
+        self.env.register_constraint("zero", ZeroConstraint)
+        self.addCleanup(constraints._valid_values.clear)
+        ctx = mock.Mock(tenant_id='tenant')
+
+        constraint = constraints.CustomConstraint("zero", environment=self.env)
+        with mock.patch.object(constraints.time, 'time') as mock_time:
+            mock_time.return_value = 1000
+            constraint.validate(0, ctx)
+            mock_time.return_value = 1000 + cfg.CONF.constraint_cache_ttl
+            constraint.validate(0, ctx)
+        self.assertEqual([0, 0], ZeroConstraint.calls)
+
+    def test_valid_value_cache_disabled(self):
+        class ZeroConstraint(object):
+            calls = []
+
+            def validate(self, value, context):
+                self.calls.append(value)
+                return value == 0
+
+        self.env.register_constraint("zero", ZeroConstraint)
+        self.addCleanup(constraints._valid_values.clear)
+        ctx = mock.Mock(tenant_id='tenant')
+
+        constraint = constraints.CustomConstraint("zero", environment=self.env)
+        constraint.validate(0, ctx)
+        cfg.CONF.set_override('constraint_cache_ttl', 0)
+        self.addCleanup(cfg.CONF.clear_override, 'constraint_cache_ttl')
+        constraint.validate(0, ctx)
+        self.assertEqual([0, 0], ZeroConstraint.calls)
+
     def test_unknown_constraint(self):
         constraint = constraints.CustomConstraint("zero", environment=self.env)
         error = self.assertRaises(ValueError, constraint.validate, 1)
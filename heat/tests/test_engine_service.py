@@ -12,11 +12,13 @@
 #    under the License.
 
 
+import datetime
 import functools
 import json
 import sys
 import uuid
 
+import eventlet
 from eventlet import greenpool
 import mock
 import mox
@@ -42,6 +44,7 @@ from heat.engine import watchrule
 from heat.openstack.common.rpc import common as rpc_common
 from heat.openstack.common.rpc import proxy
 from heat.openstack.common import threadgroup
+from heat.openstack.common import timeutils
 import heat.rpc.api as engine_api
 from heat.tests.common import HeatTestCase
 from heat.tests import fakes as test_fakes
@@ -1441,28 +1444,25 @@ class StackServiceTest(HeatTestCase):
         res._register_class('ResourceWithPropsType',
                             generic_rsrc.ResourceWithProps)
 
-    @mock.patch.object(service.db_api, 'stack_get_all')
     @mock.patch.object(service.service.Service, 'start')
-    def test_start_gets_all_stacks(self, mock_super_start, mock_stack_get_all):
-        mock_stack_get_all.return_value = []
+    def test_start_watches_all_stacks_in_background(self, mock_super_start):
+        self.eng.thread_group_mgr = mock.Mock()
 
         self.eng.start()
-        mock_stack_get_all.assert_called_once_with(mock.ANY, tenant_safe=False)
+        self.eng.thread_group_mgr.start.assert_called_once_with(
+            cfg.CONF.periodic_interval,
+            self.eng.stack_watch.start_watch_tasks, mock.ANY)
 
-    @mock.patch.object(service.db_api, 'stack_get_all')
-    @mock.patch.object(service.service.Service, 'start')
-    def test_start_watches_all_stacks(self, mock_super_start, mock_get_all):
-        s1 = mock.Mock(id=1)
-        s2 = mock.Mock(id=2)
-        mock_get_all.return_value = [s1, s2]
-        mock_watch = mock.Mock()
-        self.eng.stack_watch.start_watch_task = mock_watch
+    @mock.patch.object(service.db_api, 'watch_rule_update_all')
+    def test_start_watch_tasks(self, mock_update_all):
+        tgm = mock.Mock()
+        stack_watch = service.StackWatch(tgm)
 
-        self.eng.start()
-        calls = mock_watch.call_args_list
-        self.assertEqual(2, mock_watch.call_count)
-        self.assertIn(mock.call(1, mock.ANY), calls)
-        self.assertIn(mock.call(2, mock.ANY), calls)
+        stack_watch.start_watch_tasks(self.ctx)
+        mock_update_all.assert_called_once_with(
+            self.ctx, {'last_evaluated': mock.ANY})
+        tgm.add_service_timer.assert_called_once_with(
+            cfg.CONF.periodic_interval, stack_watch.periodic_watcher_task)
 
     @stack_context('service_identify_test_stack', False)
     def test_stack_identify(self):
@@ -2307,10 +2307,10 @@ class StackServiceTest(HeatTestCase):
 
     @stack_context('periodic_watch_task_not_created')
     def test_periodic_watch_task_not_created(self):
-        self.eng.thread_group_mgr.groups[self.stack.id] = DummyThreadGroup()
-        self.eng.stack_watch.start_watch_task(self.stack.id, self.ctx)
-        self.assertEqual(
-            [], self.eng.thread_group_mgr.groups[self.stack.id].threads)
+        stack_watch = self.eng.stack_watch
+        check = self.patchobject(stack_watch, 'check_stack_watches')
+        stack_watch.periodic_watcher_task()
+        self.assertFalse(check.called)
 
     def test_periodic_watch_task_created(self):
         stack = get_stack('period_watch_task_created',
@@ -2320,11 +2320,40 @@ class StackServiceTest(HeatTestCase):
         self.m.ReplayAll()
         stack.store()
         stack.create()
-        self.eng.thread_group_mgr.groups[stack.id] = DummyThreadGroup()
-        self.eng.stack_watch.start_watch_task(stack.id, self.ctx)
-        expected = [self.eng.stack_watch.periodic_watcher_task]
-        observed = self.eng.thread_group_mgr.groups[stack.id].threads
-        self.assertEqual(expected, observed)
+        wr = db_api.watch_rule_get_all_by_stack(self.ctx, stack.id)[0]
+
+        stack_watch = self.eng.stack_watch
+        check = self.patchobject(stack_watch, 'check_stack_watches')
+        stack_watch.periodic_watcher_task()
+        # the rule is only evaluated again once it is due
+        stack_watch.periodic_watcher_task()
+        check.assert_called_once_with(mock.ANY, [wr.id])
+        self.stack.delete()
+
+    def test_periodic_watch_task_error(self):
+        stack = get_stack('period_watch_task_error',
+                          utils.dummy_context(),
+                          alarm_template)
+        self.stack = stack
+        self.m.ReplayAll()
+        stack.store()
+        stack.create()
+        wr = db_api.watch_rule_get_all_by_stack(self.ctx, stack.id)[0]
+
+        stack_watch = self.eng.stack_watch
+        get_rules = self.patchobject(db_api, 'watch_rule_get_all_by_ids')
+        get_rules.side_effect = Exception('DB error')
+        stack_watch.periodic_watcher_task()
+        self.assertEqual(1, get_rules.call_count)
+
+        # the rule that was due is evaluated on a later run
+        get_rules.side_effect = None
+        get_rules.return_value = []
+        self.patchobject(service.timeutils, 'utcnow').return_value = (
+            timeutils.utcnow() + datetime.timedelta(
+                seconds=cfg.CONF.periodic_interval))
+        stack_watch.periodic_watcher_task()
+        get_rules.assert_called_with(mock.ANY, [wr.id])
         self.stack.delete()
 
     def test_periodic_watch_task_created_nested(self):
@@ -2341,12 +2370,63 @@ class StackServiceTest(HeatTestCase):
         self.m.ReplayAll()
         stack.store()
         stack.create()
-        self.eng.thread_group_mgr.groups[stack.id] = DummyThreadGroup()
-        self.eng.stack_watch.start_watch_task(stack.id, self.ctx)
-        self.assertEqual([self.eng.stack_watch.periodic_watcher_task],
-                         self.eng.thread_group_mgr.groups[stack.id].threads)
+        nested_id = stack['the_nested'].resource_id
+        wr = db_api.watch_rule_get_all_by_stack(self.ctx, nested_id)[0]
+
+        stack_watch = self.eng.stack_watch
+        check = self.patchobject(stack_watch, 'check_stack_watches')
+        stack_watch.periodic_watcher_task()
+        check.assert_called_once_with(mock.ANY, [wr.id])
         self.stack.delete()
 
+    @stack_context('periodic_watch_task_evaluate')
+    def test_periodic_watch_task_evaluate(self):
+        wr = watchrule.WatchRule(context=self.ctx,
+                                 watch_name='evaluate_test',
+                                 rule={'Period': '300'},
+                                 watch_data=[],
+                                 stack_id=self.stack.id,
+                                 state='NORMAL')
+        wr.store()
+
+        self.m.StubOutWithMock(service.EngineService, 'load_user_creds')
+        service.EngineService.load_user_creds(
+            mox.IgnoreArg()).AndReturn(self.ctx)
+        self.m.StubOutWithMock(watchrule.WatchRule, 'evaluate')
+        watchrule.WatchRule.evaluate().AndReturn(['action'])
+        self.m.StubOutWithMock(self.eng.thread_group_mgr, 'start')
+        self.eng.thread_group_mgr.start(self.stack.id, mox.IgnoreArg(),
+                                        self.ctx, self.stack.id, ['action'],
+                                        {'alarm': 'evaluate_test',
+                                         'state': 'NORMAL'})
+        self.m.ReplayAll()
+
+        stack_watch = self.eng.stack_watch
+        stack_watch.check_stack_watches(self.ctx, [wr.id])
+        self.m.VerifyAll()
+
+        # rescheduled for the next period
+        now = timeutils.utcnow()
+        self.assertEqual([], stack_watch._pop_due_rules(now))
+        later = now + datetime.timedelta(seconds=301)
+        self.assertEqual([wr.id], stack_watch._pop_due_rules(later))
+
+    @stack_context('periodic_watch_task_deleted_rule')
+    def test_periodic_watch_task_deleted_rule(self):
+        wr = watchrule.WatchRule(context=self.ctx,
+                                 watch_name='deleted_test',
+                                 rule={'Period': '300'},
+                                 watch_data=[],
+                                 stack_id=self.stack.id,
+                                 state='NORMAL')
+        wr.store()
+        wr.destroy()
+
+        stack_watch = self.eng.stack_watch
+        stack_watch.check_stack_watches(self.ctx, [wr.id])
+        later = timeutils.utcnow() + datetime.timedelta(days=1)
+        self.assertEqual([], stack_watch._pop_due_rules(later))
+
     @stack_context('service_show_watch_test_stack', False)
     def test_show_watch(self):
         # Insert two dummy watch rules into the DB
@@ -2557,6 +2637,21 @@ class StackServiceTest(HeatTestCase):
         self.assertEqual(ex._exc_info[0], exception.WatchRuleNotFound)
         self.m.VerifyAll()
 
+    def test_create_watch_data_buffered(self):
+        self.m.StubOutWithMock(self.eng.watch_data_buffer, 'add')
+        self.eng.watch_data_buffer.add(self.ctx, {'foo': 'bar'}).AndReturn(1)
+        self.eng.watch_data_buffer.add(self.ctx, {'foo': 'baz'}).AndReturn(0)
+        self.m.ReplayAll()
+
+        self.assertEqual({'foo': 'bar'},
+                         self.eng.create_watch_data(self.ctx, None,
+                                                    {'foo': 'bar'}))
+        ex = self.assertRaises(rpc_common.ClientException,
+                               self.eng.create_watch_data,
+                               self.ctx, None, {'foo': 'baz'})
+        self.assertEqual(ex._exc_info[0], exception.WatchRuleNotFound)
+        self.m.VerifyAll()
+
     def test_stack_list_all_empty(self):
         sl = self.eng.list_stacks(self.ctx)
 
@@ -3100,3 +3195,27 @@ class ThreadGroupManagerTest(HeatTestCase):
         self.tg_mock.add_timer.assert_called_with(
             self.cfg_mock.CONF.periodic_interval,
             self.f, *self.fargs, **self.fkwargs)
+
+    def test_tgm_add_service_timer(self):
+        thm = service.ThreadGroupManager()
+        thm.add_service_timer(20, self.f, *self.fargs, **self.fkwargs)
+
+        self.assertEqual(thm.groups[self.cfg_mock.CONF.periodic_interval],
+                         self.tg_mock)
+        self.tg_mock.add_timer.assert_called_with(
+            20, self.f, None, *self.fargs, **self.fkwargs)
+
+
+class ThreadGroupManagerServiceTimerTest(HeatTestCase):
+
+    def test_tgm_service_timer_calls_func(self):
+        renew = self.patchobject(stack_lock.StackLock, 'renew_leases')
+        thm = service.ThreadGroupManager()
+        self.addCleanup(thm.groups[cfg.CONF.periodic_interval].stop)
+
+        thm.add_service_timer(0.01, stack_lock.StackLock.renew_leases,
+                              'engine_id')
+        eventlet.sleep(0.05)
+
+        self.assertTrue(renew.called)
+        renew.assert_called_with('engine_id')
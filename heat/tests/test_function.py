@@ -123,3 +123,107 @@ class ValidateTest(HeatTestCase):
         snippet = {'foo': 'bar', 'blarg': self.func}
         ex = self.assertRaises(Exception, function.validate, snippet)
         self.assertEqual('Need more arguments', str(ex))
+
+
+class CountingFunction(function.Function):
+    def __init__(self, stack, fn_name, args, resource=None):
+        super(CountingFunction, self).__init__(stack, fn_name, args)
+        self.resource = resource
+        self.calls = 0
+
+    def result(self):
+        self.calls += 1
+        if self.resource is not None:
+            self.depends_on(self.resource)
+        return function.resolve(self.args)
+
+
+class AttributeFunction(function.Function):
+    memoize = False
+
+    def __init__(self, stack, fn_name, args):
+        super(AttributeFunction, self).__init__(stack, fn_name, args)
+        self.value = 'foo'
+        self.calls = 0
+
+    def result(self):
+        self.calls += 1
+        return self.value
+
+
+class FakeStack(object):
+    resolution_pass = None
+
+
+class FakeResource(object):
+    action = 'CREATE'
+    status = 'IN_PROGRESS'
+    resource_id = None
+
+
+class ResolutionPassTest(HeatTestCase):
+    def setUp(self):
+        super(ResolutionPassTest, self).setUp()
+        self.stack = FakeStack()
+
+    def test_no_pass(self):
+        func = CountingFunction(self.stack, 'foo', 'bar')
+        function.resolve(func)
+        function.resolve(func)
+        self.assertEqual(2, func.calls)
+
+    def test_memoized(self):
+        func = CountingFunction(self.stack, 'foo', 'bar')
+        with function.resolution_pass(self.stack):
+            self.assertEqual('bar', function.resolve(func))
+            self.assertEqual('bar', function.resolve(func))
+        self.assertEqual(1, func.calls)
+        self.assertIsNone(self.stack.resolution_pass)
+
+    def test_result_copied(self):
+        func = CountingFunction(self.stack, 'foo', {'bar': ['baz']})
+        with function.resolution_pass(self.stack):
+            function.resolve(func)['bar'].append('quux')
+            self.assertEqual({'bar': ['baz']}, function.resolve(func))
+
+    def test_nested_passes(self):
+        func = CountingFunction(self.stack, 'foo', 'bar')
+        with function.resolution_pass(self.stack):
+            with function.resolution_pass(self.stack):
+                function.resolve(func)
+            function.resolve(func)
+        function.resolve(func)
+        self.assertEqual(2, func.calls)
+
+    def test_resource_state_change(self):
+        resource = FakeResource()
+        inner = CountingFunction(self.stack, 'foo', 'bar', resource)
+        outer = CountingFunction(self.stack, 'foo', ['baz', inner])
+        with function.resolution_pass(self.stack):
+            function.resolve(outer)
+            function.resolve(outer)
+            self.assertEqual((1, 1), (outer.calls, inner.calls))
+
+            resource.status = 'COMPLETE'
+            function.resolve(outer)
+            self.assertEqual((2, 2), (outer.calls, inner.calls))
+
+    def test_not_memoized(self):
+        func = CountingFunction(self.stack, 'foo', 'bar')
+        func.memoize = False
+        with function.resolution_pass(self.stack):
+            function.resolve(func)
+            function.resolve(func)
+        self.assertEqual(2, func.calls)
+
+    def test_attribute_change(self):
+        attr = AttributeFunction(self.stack, 'Fn::GetAtt', ['res', 'attr'])
+        outer = CountingFunction(self.stack, 'foo', ['baz', attr])
+        with function.resolution_pass(self.stack):
+            self.assertEqual(['baz', 'foo'], function.resolve(outer))
+            self.assertEqual(['baz', 'foo'], function.resolve(outer))
+            self.assertEqual(1, outer.calls)
+
+            attr.value = 'bar'
+            self.assertEqual(['baz', 'bar'], function.resolve(outer))
+            self.assertEqual(2, outer.calls)
@@ -0,0 +1,74 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import uuid
+
+import testtools
+
+from heat.common import hash_ring
+
+
+class HashRingTest(testtools.TestCase):
+
+    keys = [str(uuid.UUID(int=i * 7919)) for i in range(1000)]
+
+    def test_empty_ring(self):
+        ring = hash_ring.HashRing([])
+        self.assertEqual(0, len(ring))
+        self.assertIsNone(ring.get_node('a-stack'))
+
+    def test_invalid_replicas(self):
+        self.assertRaises(ValueError, hash_ring.HashRing, ['a'], replicas=0)
+
+    def test_single_node(self):
+        ring = hash_ring.HashRing(['engine-1'])
+        self.assertIn('engine-1', ring)
+        for key in self.keys[:10]:
+            self.assertEqual('engine-1', ring.get_node(key))
+
+    def test_consistent(self):
+        ring1 = hash_ring.HashRing(['engine-1', 'engine-2', 'engine-3'])
+        ring2 = hash_ring.HashRing(['engine-3', 'engine-1', 'engine-2'])
+        for key in self.keys:
+            self.assertEqual(ring1.get_node(key), ring2.get_node(key))
+
+    def test_unicode_key(self):
+        ring = hash_ring.HashRing(['engine-1', 'engine-2'])
+        self.assertEqual(ring.get_node('a-stack'), ring.get_node(u'a-stack'))
+
+    def test_distribution(self):
+        nodes = ['engine-1', 'engine-2', 'engine-3']
+        ring = hash_ring.HashRing(nodes)
+        counts = dict((node, 0) for node in nodes)
+        for key in self.keys:
+            counts[ring.get_node(key)] += 1
+        for node in nodes:
+            self.assertTrue(counts[node] > len(self.keys) / 6, counts)
+
+    def test_node_join_moves_only_to_new_node(self):
+        old = hash_ring.HashRing(['engine-1', 'engine-2', 'engine-3'])
+        new = hash_ring.HashRing(['engine-1', 'engine-2', 'engine-3',
+                                  'engine-4'])
+        moved = 0
+        for key in self.keys:
+            if old.get_node(key) != new.get_node(key):
+                self.assertEqual('engine-4', new.get_node(key))
+                moved += 1
+        self.assertTrue(0 < moved < len(self.keys) / 2)
+
+    def test_node_leave_moves_only_from_old_node(self):
+        old = hash_ring.HashRing(['engine-1', 'engine-2', 'engine-3'])
+        new = hash_ring.HashRing(['engine-1', 'engine-2'])
+        for key in self.keys:
+            if old.get_node(key) != 'engine-3':
+                self.assertEqual(old.get_node(key), new.get_node(key))
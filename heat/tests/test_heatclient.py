@@ -22,6 +22,7 @@ cfg.CONF.import_group('keystone_authtoken',
 
 import keystoneclient.exceptions as kc_exception
 from keystoneclient.v3 import client as kc_v3
+from oslotest import mockpatch
 
 from heat.common import exception
 from heat.common import heat_keystoneclient
@@ -415,6 +416,107 @@ class KeystoneClientTest(HeatTestCase):
         self.assertRaises(exception.AuthorizationFailure,
                           heat_ks_client._v3_client_init)
 
+    def _enable_client_cache(self):
+        cfg.CONF.set_override('keystone_token_cache_size', 10)
+        self.useFixture(mockpatch.PatchObject(
+            heat_keystoneclient, '_client_cache',
+            heat_keystoneclient.ClientCache()))
+
+    def _trust_context(self):
+        ctx = utils.dummy_context()
+        ctx.auth_token = None
+        ctx.trust_id = 'atrust123'
+        ctx.trustor_user_id = 'trustor_user_id'
+        return ctx
+
+    def test_init_v3_trust_cached(self):
+
+        """Test clients authenticated with a trust are shared."""
+
+        self._enable_client_cache()
+        self._stubs_v3(method='trust')
+        self.mock_ks_v3_client.auth_ref.will_expire_soon(
+            stale_duration=300).AndReturn(False)
+        self.m.ReplayAll()
+
+        heat_ks_client = heat_keystoneclient.KeystoneClient(
+            self._trust_context())
+        ctx = self._trust_context()
+        cached_ks_client = heat_keystoneclient.KeystoneClient(ctx)
+        self.assertIs(heat_ks_client.client, cached_ks_client.client)
+        self.assertEqual('atrusttoken', ctx.auth_token)
+
+    def test_init_v3_trust_cached_expiring(self):
+
+        """Test cached clients are replaced before their token expires."""
+
+        self._enable_client_cache()
+        self._stubs_v3(method='trust')
+        self._stubs_v3(method='trust')
+        self.mock_ks_v3_client.auth_ref.will_expire_soon(
+            stale_duration=300).AndReturn(True)
+        self.m.ReplayAll()
+
+        heat_keystoneclient.KeystoneClient(self._trust_context())
+        heat_keystoneclient.KeystoneClient(self._trust_context())
+
+    def test_init_v3_token_cached_per_token(self):
+
+        """Test clients authenticated with a token are keyed by token."""
+
+        self._enable_client_cache()
+        self._stubs_v3()
+        self.mock_ks_v3_client.auth_ref = self.m.CreateMockAnything()
+        self.mock_ks_v3_client.auth_ref.will_expire_soon(
+            stale_duration=300).AndReturn(False)
+        other_client = self.mock_admin_client
+        kc_v3.Client(
+            token='efgh5678', project_id='test_tenant_id',
+            auth_url='http://server.test:5000/v3',
+            endpoint='http://server.test:5000/v3',
+            cacert=None,
+            cert=None,
+            insecure=False,
+            key=None).AndReturn(other_client)
+        other_client.authenticate().AndReturn(True)
+        self.m.ReplayAll()
+
+        ctx = utils.dummy_context()
+        ctx.trust_id = None
+        self.assertIs(self.mock_ks_v3_client,
+                      heat_keystoneclient.KeystoneClient(ctx).client)
+        self.assertIs(self.mock_ks_v3_client,
+                      heat_keystoneclient.KeystoneClient(ctx).client)
+        ctx.auth_token = 'efgh5678'
+        self.assertIs(other_client,
+                      heat_keystoneclient.KeystoneClient(ctx).client)
+
+    def test_init_admin_client_cached(self):
+
+        """Test the admin client is shared between instances."""
+
+        self._enable_client_cache()
+        self._stub_admin_client()
+        self.mock_admin_client.auth_ref.will_expire_soon(
+            stale_duration=300).AndReturn(False)
+        self.m.ReplayAll()
+
+        ctx = utils.dummy_context()
+        ctx.trust_id = None
+        for i in range(2):
+            heat_ks_client = heat_keystoneclient.KeystoneClient(ctx)
+            self.assertEqual(self.mock_admin_client,
+                             heat_ks_client.admin_client)
+
+    def test_client_cache_unserialisable_args(self):
+
+        """Test clients created with unserialisable args are not cached."""
+
+        cache = heat_keystoneclient.ClientCache()
+        kwargs = {'trust_id': object()}
+        cache.put(kwargs, self.mock_admin_client)
+        self.assertIsNone(cache.get(kwargs))
+
     def test_create_trust_context_trust_id(self):
 
         """Test create_trust_context with existing trust_id."""
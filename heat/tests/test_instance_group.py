@@ -213,6 +213,59 @@ class InstanceGroupTest(HeatTestCase):
         rsrc.delete()
         self.m.VerifyAll()
 
+    def _lb_group(self):
+        t = template_format.parse(ig_template)
+        properties = t['Resources']['JobServerGroup']['Properties']
+        properties['LoadBalancerNames'] = ['lb2', 'lb1']
+        stack = utils.parse_stack(t)
+        rsrc = stack['JobServerGroup']
+        self.m.StubOutWithMock(rsrc, '_lb_reload_now')
+        return rsrc
+
+    def test_lb_reload_coalesced(self):
+        rsrc = self._lb_group()
+        rsrc._lb_reload_now(['lb1', 'lb2'])
+        self.m.ReplayAll()
+
+        with rsrc._lb_reload_coalesced():
+            for i in range(5):
+                rsrc._lb_reload()
+            with rsrc._lb_reload_coalesced():
+                rsrc._lb_reload()
+
+        self.assertIsNone(rsrc._lb_pending)
+        self.m.VerifyAll()
+
+    def test_lb_reload_coalesced_error(self):
+        rsrc = self._lb_group()
+        rsrc._lb_reload_now(['lb1', 'lb2'])
+        self.m.ReplayAll()
+
+        def scale():
+            with rsrc._lb_reload_coalesced():
+                rsrc._lb_reload()
+                raise exception.Error('scaling failed')
+
+        self.assertRaises(exception.Error, scale)
+        self.assertIsNone(rsrc._lb_pending)
+        self.m.VerifyAll()
+
+    def test_lb_reload_not_deferred(self):
+        rsrc = self._lb_group()
+        rsrc._lb_reload_now(['lb2', 'lb1'], ['inst1'])
+        rsrc._lb_reload_now(['lb2', 'lb1'], [])
+        self.m.ReplayAll()
+
+        with rsrc._lb_reload_coalesced():
+            rsrc._lb_reload()
+            # Taking instances out of service cannot wait
+            rsrc._lb_reload(exclude=['inst1'])
+            # This brings the load balancers up to date, so there is
+            # nothing left to do at the end
+            rsrc._lb_reload(defer=False)
+
+        self.m.VerifyAll()
+
     def test_create_error(self):
         """
         If a resource in an instance group fails to be created, the instance
@@ -174,8 +174,7 @@ class LoadBalancerTest(HeatTestCase):
 
         self.assertEqual('LoadBalancer', rsrc.FnGetRefId())
 
-        templ = template_format.parse(lb.lb_template_default)
-        ha_cfg = rsrc._haproxy_config(templ, rsrc.properties['Instances'])
+        ha_cfg = rsrc._haproxy_config(rsrc.properties['Instances'])
 
         self.assertRegexpMatches(ha_cfg, 'bind \*:80')
         self.assertRegexpMatches(ha_cfg, 'server server1 1\.2\.3\.4:80 '
@@ -272,3 +271,54 @@ class LoadBalancerTest(HeatTestCase):
         rsrc.get_parsed_template = mock.Mock(return_value='foo')
 
         self.assertEqual('foo', rsrc.child_template())
+
+    def _mock_lb_instance(self, rsrc, config):
+        lb_instance = mock.Mock()
+        lb_instance.metadata_get.return_value = {
+            'AWS::CloudFormation::Init': {'config': {'files': {
+                '/etc/haproxy/haproxy.cfg': {'content': config}}}}}
+        rsrc.nested = mock.Mock(return_value={'LB_instance': lb_instance})
+        return lb_instance
+
+    def test_handle_update_looks_up_new_instances_only(self):
+        rsrc = self.setup_loadbalancer()
+        rsrc.nova = mock.Mock()
+        to_ip = self.patchobject(lb.nova_utils, 'server_to_ipaddress')
+        to_ip.return_value = '1.2.3.4'
+        lb_instance = self._mock_lb_instance(
+            rsrc, rsrc._haproxy_config(['WikiServerOne']))
+
+        to_ip.return_value = '5.6.7.8'
+        rsrc.handle_update({}, {}, {'Instances': ['WikiServerOne',
+                                                  'WikiServerTwo']})
+
+        self.assertEqual(2, to_ip.call_count)
+        to_ip.assert_called_with(rsrc.nova.return_value, 'WikiServerTwo')
+        md = lb_instance.metadata_set.call_args[0][0]
+        files = md['AWS::CloudFormation::Init']['config']['files']
+        ha_cfg = files['/etc/haproxy/haproxy.cfg']['content']
+        self.assertRegexpMatches(ha_cfg, 'server server1 1\.2\.3\.4:80')
+        self.assertRegexpMatches(ha_cfg, 'server server2 5\.6\.7\.8:80')
+
+    def test_handle_update_unresolved_address_looked_up_again(self):
+        rsrc = self.setup_loadbalancer()
+        rsrc.nova = mock.Mock()
+        to_ip = self.patchobject(lb.nova_utils, 'server_to_ipaddress')
+        to_ip.return_value = None
+        self._mock_lb_instance(
+            rsrc, rsrc._haproxy_config(['WikiServerOne']))
+
+        rsrc.handle_update({}, {}, {'Instances': ['WikiServerOne']})
+        self.assertEqual(2, to_ip.call_count)
+
+    def test_handle_update_unchanged_config_not_saved(self):
+        rsrc = self.setup_loadbalancer()
+        rsrc.nova = mock.Mock()
+        to_ip = self.patchobject(lb.nova_utils, 'server_to_ipaddress')
+        to_ip.return_value = '1.2.3.4'
+        lb_instance = self._mock_lb_instance(
+            rsrc, rsrc._haproxy_config(['WikiServerOne']))
+
+        rsrc.handle_update({}, {}, {'Instances': ['WikiServerOne']})
+        self.assertEqual(1, to_ip.call_count)
+        self.assertFalse(lb_instance.metadata_set.called)
@@ -13,7 +13,9 @@
 
 import copy
 
+import mock
 import mox
+from oslo.config import cfg
 from testtools import skipIf
 
 from heat.common import exception
@@ -517,6 +519,147 @@ class NeutronTest(HeatTestCase):
         })
 
 
+@skipIf(neutronclient is None, 'neutronclient unavailable')
+class NeutronBulkCreateTest(HeatTestCase):
+
+    def setUp(self):
+        super(NeutronBulkCreateTest, self).setUp()
+        self.client = mock.Mock()
+
+    def test_bulk_creator_per_stack_and_type(self):
+        stack = mock.Mock()
+        creator = neutron.bulk_creator(stack, self.client, 'port')
+        self.addCleanup(neutron._bulk_creators.clear)
+        self.assertIs(creator,
+                      neutron.bulk_creator(stack, self.client, 'port'))
+        self.assertIsNot(creator,
+                         neutron.bulk_creator(stack, self.client, 'subnet'))
+        self.assertIsNot(creator,
+                         neutron.bulk_creator(mock.Mock(), self.client,
+                                              'port'))
+
+    def test_bulk_creator_per_batch(self):
+        self.client.create_port.return_value = {'port': {'id': 'p1'}}
+        stack = mock.Mock()
+        creator = neutron.bulk_creator(stack, self.client, 'port')
+        creator.add({'name': 'a'}).result()
+        self.assertEqual({}, neutron._bulk_creators)
+        self.addCleanup(neutron._bulk_creators.clear)
+        self.assertIsNot(creator,
+                         neutron.bulk_creator(stack, self.client, 'port'))
+
+    def test_single_request(self):
+        self.client.create_port.return_value = {'port': {'id': 'p1'}}
+        creator = neutron.BulkCreator(self.client, 'port')
+        request = creator.add({'name': 'a'})
+
+        self.assertEqual({'id': 'p1'}, request.result())
+        self.client.create_port.assert_called_once_with(
+            {'port': {'name': 'a'}})
+
+    def test_bulk_request(self):
+        self.client.create_port.return_value = {
+            'ports': [{'id': 'p1'}, {'id': 'p2'}]}
+        creator = neutron.BulkCreator(self.client, 'port')
+        req1 = creator.add({'name': 'a'})
+        req2 = creator.add({'name': 'b'})
+
+        self.assertEqual({'id': 'p2'}, req2.result())
+        self.assertEqual({'id': 'p1'}, req1.result())
+        self.client.create_port.assert_called_once_with(
+            {'ports': [{'name': 'a'}, {'name': 'b'}]})
+
+    def test_bulk_request_stores_ids(self):
+        self.client.create_port.return_value = {
+            'ports': [{'id': 'p1'}, {'id': 'p2'}]}
+        creator = neutron.BulkCreator(self.client, 'port')
+        rsrc1, rsrc2 = mock.Mock(), mock.Mock()
+        req1 = creator.add({'name': 'a'}, rsrc1)
+        creator.add({'name': 'b'}, rsrc2)
+
+        req1.result()
+        rsrc1.resource_id_set.assert_called_once_with('p1')
+        rsrc2.resource_id_set.assert_called_once_with('p2')
+
+    def test_cancelled_request_not_sent(self):
+        self.client.create_port.return_value = {'port': {'id': 'p1'}}
+        creator = neutron.BulkCreator(self.client, 'port')
+        req1 = creator.add({'name': 'a'})
+        req2 = creator.add({'name': 'b'})
+
+        req2.cancel()
+        self.assertEqual({'id': 'p1'}, req1.result())
+        self.client.create_port.assert_called_once_with(
+            {'port': {'name': 'a'}})
+
+    def test_bulk_request_fallback(self):
+        def create_port(body):
+            if 'ports' in body:
+                raise qe.NeutronClientException(status_code=400)
+            if body['port']['name'] == 'b':
+                raise qe.NeutronClientException(status_code=409)
+            return {'port': {'id': 'p1'}}
+
+        self.client.create_port.side_effect = create_port
+        creator = neutron.BulkCreator(self.client, 'port')
+        req1 = creator.add({'name': 'a'})
+        req2 = creator.add({'name': 'b'})
+
+        self.assertRaises(qe.NeutronClientException, req2.result)
+        self.assertEqual({'id': 'p1'}, req1.result())
+        self.assertEqual(3, self.client.create_port.call_count)
+
+    def test_subnets_created_in_bulk(self):
+        cfg.CONF.set_override('neutron_bulk_create', True)
+        self.client.create_subnet.return_value = {
+            'subnets': [{'id': 's1'}, {'id': 's2'}]}
+        self.patchobject(clients.OpenStackClients,
+                         'neutron').return_value = self.client
+
+        t = template_format.parse(neutron_template)
+        stack = utils.parse_stack(t)
+        rsrcs = [subnet.Subnet('sub%d' % i, t['Resources']['subnet'], stack)
+                 for i in range(2)]
+        self.patchobject(neutron.neutronV20,
+                         'find_resourceid_by_name_or_id').return_value = 'n'
+
+        requests = [r.handle_create() for r in rsrcs]
+        self.assertEqual(0, self.client.create_subnet.call_count)
+        for r, request in zip(rsrcs, requests):
+            self.assertTrue(r.check_create_complete(request))
+
+        self.assertEqual(['s1', 's2'], [r.resource_id for r in rsrcs])
+        self.assertEqual(1, self.client.create_subnet.call_count)
+
+    def test_create_cancelled_before_request_sent(self):
+        cfg.CONF.set_override('neutron_bulk_create', True)
+        self.client.create_subnet.return_value = {'subnet': {'id': 's1'}}
+        self.patchobject(clients.OpenStackClients,
+                         'neutron').return_value = self.client
+
+        t = template_format.parse(neutron_template)
+        stack = utils.parse_stack(t)
+        rsrcs = [subnet.Subnet('sub%d' % i, t['Resources']['subnet'], stack)
+                 for i in range(2)]
+        self.patchobject(neutron.neutronV20,
+                         'find_resourceid_by_name_or_id').return_value = 'n'
+
+        # Both handle_create() calls queue a request, then the first
+        # creation is cancelled before its check_create_complete()
+        runners = [scheduler.TaskRunner(r.create) for r in rsrcs]
+        for runner in runners:
+            runner.start()
+        runners[0].cancel()
+        runners[1].run_to_completion()
+
+        self.client.create_subnet.assert_called_once_with(
+            {'subnet': mock.ANY})
+        self.assertIsNone(rsrcs[0].resource_id)
+        self.assertEqual('s1', rsrcs[1].resource_id)
+        self.assertEqual((rsrcs[0].CREATE, rsrcs[0].FAILED), rsrcs[0].state)
+        self.assertEqual({}, neutron._bulk_creators)
+
+
 @skipIf(neutronclient is None, 'neutronclient unavailable')
 class NeutronNetTest(HeatTestCase):
 
@@ -279,12 +279,6 @@ class AutoScalingTest(HeatTestCase):
         clients.neutronclient.Client.show_vip(vip_ret_block['vip']['id']).\
             AndReturn(vip_ret_block)
 
-        clients.OpenStackClients.keystone().AndReturn(
-            fakes.FakeKeystoneClient())
-
-        clients.OpenStackClients.keystone().AndReturn(
-            fakes.FakeKeystoneClient())
-
         parser.Stack.validate()
         instid = str(uuid.uuid4())
         instance.Instance.handle_create().AndReturn(instid)
@@ -15,6 +15,7 @@ from neutronclient.common.exceptions import NeutronClientException
 from neutronclient.v2_0 import client as neutronclient
 from novaclient.v1_1 import security_group_rules as nova_sgr
 from novaclient.v1_1 import security_groups as nova_sg
+from oslo.config import cfg
 
 from heat.common import exception
 from heat.common import template_format
@@ -124,6 +125,8 @@ Resources:
         self.assertEqual(metadata, dict(rsrc.metadata_get()))
 
     def test_security_group(self):
+        # Cover creating the rules one at a time
+        cfg.CONF.set_override('neutron_bulk_create', False)
 
         show_created = {'security_group': {
             'tenant_id': 'f18ca530cc05425e8bac0a5ff92f7e88',
@@ -542,7 +545,99 @@ Resources:
         stack.delete()
         self.m.VerifyAll()
 
+    def _stub_bulk_create(self):
+        sg_name = utils.PhysName('test_stack', 'the_sg')
+        default_rules = [{
+            'direction': 'egress',
+            'ethertype': ethertype,
+            'id': 'aaaa-%d' % i,
+            'security_group_id': 'aaaa',
+        } for i, ethertype in enumerate(('IPv4', 'IPv6'), 1)]
+
+        clients.OpenStackClients.keystone().AndReturn(
+            FakeKeystoneClient())
+        neutronclient.Client.create_security_group({
+            'security_group': {
+                'name': sg_name,
+                'description': 'HTTP and SSH access'
+            }
+        }).AndReturn({
+            'security_group': {
+                'name': sg_name,
+                'description': 'HTTP and SSH access',
+                'security_group_rules': default_rules,
+                'id': 'aaaa'
+            }
+        })
+        neutronclient.Client.show_security_group('aaaa').AndReturn({
+            'security_group': {
+                'name': sg_name,
+                'security_group_rules': default_rules,
+                'id': 'aaaa'
+            }
+        })
+        neutronclient.Client.delete_security_group_rule('aaaa-1').AndReturn(
+            None)
+        neutronclient.Client.delete_security_group_rule('aaaa-2').AndReturn(
+            None)
+
+        def rule(direction, remote_group_id=None, remote_ip_prefix=None,
+                 port=None, protocol=None):
+            return {
+                'direction': direction,
+                'remote_group_id': remote_group_id,
+                'remote_ip_prefix': remote_ip_prefix,
+                'port_range_min': port,
+                'ethertype': 'IPv4',
+                'port_range_max': port,
+                'protocol': protocol,
+                'security_group_id': 'aaaa'
+            }
+
+        return [
+            rule('ingress', remote_ip_prefix='0.0.0.0/0', port='22',
+                 protocol='tcp'),
+            rule('ingress', remote_ip_prefix='0.0.0.0/0', port='80',
+                 protocol='tcp'),
+            rule('ingress', remote_group_id='wwww', protocol='tcp'),
+            rule('egress', remote_ip_prefix='10.0.1.0/24', port='22',
+                 protocol='tcp'),
+            rule('egress', remote_group_id='xxxx'),
+            rule('egress', remote_group_id='aaaa'),
+        ]
+
+    def test_security_group_bulk_create(self):
+        cfg.CONF.set_override('neutron_bulk_create', True)
+        rules = self._stub_bulk_create()
+        neutronclient.Client.create_security_group_rule({
+            'security_group_rules': rules
+        }).AndReturn({'security_group_rules': rules})
+
+        self.m.ReplayAll()
+        stack = self.create_stack(self.test_template)
+        self.assertResourceState(stack['the_sg'], 'aaaa')
+        self.m.VerifyAll()
+
+    def test_security_group_bulk_create_fallback(self):
+        cfg.CONF.set_override('neutron_bulk_create', True)
+        rules = self._stub_bulk_create()
+        neutronclient.Client.create_security_group_rule({
+            'security_group_rules': rules
+        }).AndRaise(NeutronClientException(status_code=409))
+        for rule in rules:
+            neutronclient.Client.create_security_group_rule({
+                'security_group_rule': rule
+            }).AndReturn({'security_group_rule': rule})
+
+        self.m.ReplayAll()
+        stack = self.create_stack(self.test_template)
+        self.assertResourceState(stack['the_sg'], 'aaaa')
+        self.m.VerifyAll()
+
     def test_security_group_exception(self):
+        # Cover creating the rules one at a time
+        cfg.CONF.set_override('neutron_bulk_create', False)
+
         #create script
         clients.OpenStackClients.keystone().AndReturn(
             FakeKeystoneClient())
@@ -12,10 +12,16 @@
 #    under the License.
 """Tests for :module:'heat.engine.resources.nova_utls'."""
 
-import mock
+import email
+from email.mime.multipart import MIMEMultipart
+import time
 import uuid
 
+import eventlet
+import mock
 from novaclient import exceptions as nova_exceptions
+from oslo.config import cfg
+from oslotest import mockpatch
 
 from heat.common import exception
 from heat.engine import clients
@@ -129,6 +135,173 @@ class NovaUtilsTests(HeatTestCase):
         self.m.VerifyAll()
 
 
+class NovaUtilsLookupCacheTests(HeatTestCase):
+    """Tests for the caching of Nova lookups in nova_utils."""
+
+    def setUp(self):
+        super(NovaUtilsLookupCacheTests, self).setUp()
+        cfg.CONF.set_override('lookup_cache_ttl', 60)
+        self.cache = nova_utils.LookupCache()
+        self.useFixture(mockpatch.PatchObject(nova_utils, '_lookup_cache',
+                                              self.cache))
+        self.nova_client = mock.Mock()
+        self.nova_client.client.management_url = 'http://nova/v2/tenant'
+        self.nova_client.client.auth_token = 'token'
+
+    def _resource(self, res_id, name):
+        res = mock.Mock()
+        res.id = res_id
+        res.name = name
+        return res
+
+    def test_get_image_id_cached(self):
+        self.nova_client.images.list.return_value = [
+            self._resource('1234', 'myimage')]
+        self.assertEqual('1234', nova_utils.get_image_id_by_name(
+            self.nova_client, 'myimage'))
+        self.assertEqual('1234', nova_utils.get_image_id_by_name(
+            self.nova_client, 'myimage'))
+        self.assertEqual(1, self.nova_client.images.list.call_count)
+
+    def test_get_image_id_refreshed_when_missing(self):
+        self.nova_client.images.list.side_effect = [
+            [self._resource('1234', 'myimage')],
+            [self._resource('1234', 'myimage'),
+             self._resource('5678', 'newimage')],
+            [self._resource('1234', 'myimage')]]
+        nova_utils.get_image_id_by_name(self.nova_client, 'myimage')
+        self.assertEqual('5678', nova_utils.get_image_id_by_name(
+            self.nova_client, 'newimage'))
+        self.assertRaises(exception.ImageNotFound,
+                          nova_utils.get_image_id_by_name,
+                          self.nova_client, 'noimage')
+        self.assertEqual(3, self.nova_client.images.list.call_count)
+
+    def test_get_flavor_id_cached_per_tenant(self):
+        self.nova_client.flavors.list.return_value = [
+            self._resource('1', 'm1.small')]
+        other_client = mock.Mock()
+        other_client.client.management_url = 'http://nova/v2/other'
+        other_client.flavors.list.return_value = [
+            self._resource('2', 'm1.small')]
+
+        self.assertEqual('1', nova_utils.get_flavor_id(self.nova_client,
+                                                       'm1.small'))
+        self.assertEqual('1', nova_utils.get_flavor_id(self.nova_client,
+                                                       '1'))
+        self.assertEqual('2', nova_utils.get_flavor_id(other_client,
+                                                       'm1.small'))
+        self.assertEqual(1, self.nova_client.flavors.list.call_count)
+        self.assertEqual(1, other_client.flavors.list.call_count)
+
+    def test_get_keypair_cached_per_user(self):
+        key = mock.Mock()
+        self.nova_client.keypairs.get.return_value = key
+        self.assertIs(key, nova_utils.get_keypair(self.nova_client, 'mykey'))
+        self.assertIs(key, nova_utils.get_keypair(self.nova_client, 'mykey'))
+        self.nova_client.client.auth_token = 'other_token'
+        self.assertIs(key, nova_utils.get_keypair(self.nova_client, 'mykey'))
+        self.assertEqual(2, self.nova_client.keypairs.get.call_count)
+
+    def test_get_keypair_missing_not_cached(self):
+        self.nova_client.keypairs.get.side_effect = nova_exceptions.NotFound(
+            404)
+        for i in range(2):
+            self.assertRaises(exception.UserKeyPairMissing,
+                              nova_utils.get_keypair,
+                              self.nova_client, 'notakey')
+        self.assertEqual(2, self.nova_client.keypairs.get.call_count)
+
+    def test_get_availability_zones(self):
+        zone = mock.Mock()
+        zone.zoneName = 'nova'
+        self.nova_client.availability_zones.list.return_value = [zone]
+        self.assertEqual(['nova'],
+                         nova_utils.get_availability_zones(self.nova_client))
+        self.assertEqual(['nova'],
+                         nova_utils.get_availability_zones(self.nova_client))
+        self.nova_client.availability_zones.list.assert_called_once_with(
+            detailed=False)
+
+    def test_get_availability_zones_refresh(self):
+        zone = mock.Mock()
+        zone.zoneName = 'nova'
+        self.nova_client.availability_zones.list.return_value = [zone]
+        nova_utils.get_availability_zones(self.nova_client)
+        nova_utils.get_availability_zones(self.nova_client, refresh=True)
+        self.assertEqual(2,
+                         self.nova_client.availability_zones.list.call_count)
+
+    def test_absolute_limits_cached(self):
+        limit = mock.Mock()
+        limit.name = 'maxServerMeta'
+        limit.value = 3
+        self.nova_client.limits.get.return_value.absolute = [limit]
+        limits = nova_utils.absolute_limits(self.nova_client)
+        self.assertEqual({'maxServerMeta': 3}, limits)
+        limits['maxServerMeta'] = 5
+        self.assertEqual({'maxServerMeta': 3},
+                         nova_utils.absolute_limits(self.nova_client))
+        self.assertEqual(1, self.nova_client.limits.get.call_count)
+
+    def test_cached_lookup_without_scope(self):
+        fetch = mock.Mock(return_value='value')
+        for i in range(2):
+            self.assertEqual('value', nova_utils.cached_lookup(
+                ('kind', None), fetch))
+        self.assertEqual(2, fetch.call_count)
+
+    @mock.patch.object(time, 'time')
+    def test_expired(self, mock_time):
+        mock_time.return_value = 1000
+        self.assertEqual('a', self.cache.get('key', lambda: 'a'))
+        mock_time.return_value = 1059
+        self.assertEqual('a', self.cache.get('key', lambda: 'b'))
+        mock_time.return_value = 1060
+        self.assertEqual('b', self.cache.get('key', lambda: 'b'))
+
+    def test_least_recently_used_evicted(self):
+        cfg.CONF.set_override('lookup_cache_size', 2)
+        self.cache.get('a', lambda: 'a')
+        self.cache.get('b', lambda: 'b')
+        self.cache.get('a', lambda: 'x')
+        self.cache.get('c', lambda: 'c')
+        self.assertEqual('a', self.cache.get('a', lambda: 'x'))
+        self.assertEqual('x', self.cache.get('b', lambda: 'x'))
+
+    def test_concurrent_lookups_share_call(self):
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            eventlet.sleep(0)
+            return 'value'
+
+        threads = [eventlet.spawn(self.cache.get, 'key', fetch)
+                   for i in range(3)]
+        self.assertEqual(['value'] * 3, [t.wait() for t in threads])
+        self.assertEqual(1, len(calls))
+
+    def test_concurrent_lookups_share_error(self):
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            eventlet.sleep(0)
+            raise exception.Error('failed')
+
+        def lookup():
+            try:
+                return self.cache.get('key', fetch)
+            except exception.Error as ex:
+                return ex
+
+        threads = [eventlet.spawn(lookup) for i in range(3)]
+        for t in threads:
+            self.assertIsInstance(t.wait(), exception.Error)
+        self.assertEqual(1, len(calls))
+
+
 class NovaUtilsRefreshServerTests(HeatTestCase):
 
     def test_successful_refresh(self):
@@ -240,6 +413,54 @@ class NovaUtilsUserdataTests(HeatTestCase):
         self.assertIn("custominstanceuser", data)
         self.m.VerifyAll()
 
+    def test_build_userdata_static_parts_rendered_once(self):
+        """The cloud-init files are read once per user and format."""
+        self.useFixture(mockpatch.PatchObject(nova_utils, '_cloudinit_parts',
+                                              {}))
+        resource = mock.Mock()
+        resource.metadata_get.return_value = None
+        get_data = self.patchobject(nova_utils.pkgutil, 'get_data')
+        get_data.return_value = '$add_custom_user'
+
+        for i in range(2):
+            nova_utils.build_userdata(resource, 'foo', 'ec2-user')
+        self.assertEqual(4, get_data.call_count)
+        nova_utils.build_userdata(resource, 'foo', 'ec2-user',
+                                  user_data_format='SOFTWARE_CONFIG')
+        self.assertEqual(7, get_data.call_count)
+        data = nova_utils.build_userdata(resource, 'foo', 'other-user')
+        self.assertEqual(11, get_data.call_count)
+        self.assertIn('other-user', data)
+
+    def test_build_userdata_matches_mime_multipart(self):
+        """The user data is formatted as if built with email.mime."""
+        resource = mock.Mock()
+        resource.metadata_get.return_value = {'foo': 'bar'}
+        boundary = '===============1234=='
+        self.patchobject(nova_utils, '_make_boundary').return_value = boundary
+
+        data = nova_utils.build_userdata(resource, 'foo\nFrom bar')
+        message = email.message_from_string(data)
+        self.assertTrue(message.is_multipart())
+        self.assertEqual(boundary, message.get_boundary())
+        self.assertEqual(['cloud-config', 'boothook.sh', 'part-handler.py',
+                          'cfn-userdata', 'loguserdata.py', 'cfn-init-data',
+                          'cfn-watch-server', 'cfn-metadata-server',
+                          'cfn-boto-cfg'],
+                         [p.get_filename() for p in message.get_payload()])
+
+        expected = MIMEMultipart(boundary=boundary,
+                                 _subparts=message.get_payload())
+        self.assertEqual(expected.as_string(), data)
+
+    def test_make_boundary_not_in_text(self):
+        generate_uuid = self.patchobject(nova_utils.uuidutils,
+                                         'generate_uuid')
+        generate_uuid.side_effect = ['1234', '5678']
+        self.assertEqual('===============5678==',
+                         nova_utils._make_boundary('--===============1234=='))
+        self.assertEqual(2, generate_uuid.call_count)
+
 
 class NovaUtilsMetadataTests(HeatTestCase):
 
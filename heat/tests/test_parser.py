@@ -506,6 +506,30 @@ Mappings:
         ]}
         self.assertEqual('"foo" is "${var3}"', self.resolve(snippet, tmpl))
 
+    def test_replace_longest_match(self):
+        tmpl = parser.Template(empty_template)
+        snippet = {"Fn::Replace": [
+            {'$var': 'foo', '$var1': 'bar', '$var12': 'baz'},
+            '$var $var1 $var12 $var123'
+        ]}
+        self.assertEqual('foo bar baz baz3', self.resolve(snippet, tmpl))
+
+    def test_replace_single_pass(self):
+        tmpl = parser.Template(empty_template)
+        snippet = {"Fn::Replace": [
+            {'$var1': '$var2', '$var2': '$var1'},
+            '$var1 $var2'
+        ]}
+        self.assertEqual('$var2 $var1', self.resolve(snippet, tmpl))
+
+    def test_replace_special_chars(self):
+        tmpl = parser.Template(empty_template)
+        snippet = {"Fn::Replace": [
+            {'.*': 'foo', '\\1': 'bar'},
+            '.* is not \\1 or .'
+        ]}
+        self.assertEqual('foo is not bar or .', self.resolve(snippet, tmpl))
+
     def test_replace_param_values(self):
         tmpl = parser.Template(parameter_template)
         env = environment.Environment({'foo': 'wibble'})
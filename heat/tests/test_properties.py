@@ -11,6 +11,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 import testtools
 
 from heat.common import exception
@@ -883,6 +884,20 @@ class PropertyTest(testtools.TestCase):
         self.assertEqual('Property error : 1 Property error : 1: valid '
                          '"fish" is not a valid boolean', str(ex))
 
+    def test_list_schema_items_share_property(self):
+        map_schema = {'valid': {'Type': 'Boolean'}}
+        list_schema = {'Type': 'Map', 'Schema': map_schema}
+        p = properties.Property({'Type': 'List', 'Schema': list_schema})
+        p.validate_data([{'valid': 'True'}] * 100)
+        self.assertIs(p._item_property(0), p._item_property(99))
+        self.assertEqual([], p._item_properties)
+
+        ex = self.assertRaises(exception.StackValidationFailed,
+                               p.validate_data,
+                               [{'valid': 'True'}] * 99 + [{'valid': 'x'}])
+        self.assertEqual('Property error : 99 Property error : 99: valid '
+                         '"x" is not a valid boolean', str(ex))
+
     def test_list_schema_int_good(self):
         list_schema = {'Type': 'Integer'}
         p = properties.Property({'Type': 'List', 'Schema': list_schema})
@@ -942,6 +957,28 @@ class PropertiesTest(testtools.TestCase):
     def test_bad_key(self):
         self.assertEqual('wibble', self.props.get('foo', 'wibble'))
 
+    def test_validated_value_cached(self):
+        schema = {'foo': {'Type': 'Map'}}
+        props = properties.Properties(schema, {'foo': {'bar': 'baz'}})
+        with mock.patch.object(properties.Property, 'validate_data',
+                               side_effect=lambda v, *a: dict(v)) as validate:
+            self.assertEqual({'bar': 'baz'}, props['foo'])
+            props['foo']['bar'] = 'quux'
+            self.assertEqual({'bar': 'baz'}, props['foo'])
+            self.assertEqual(1, validate.call_count)
+
+            props.data['foo']['bar'] = 'quux'
+            self.assertEqual({'bar': 'quux'}, props['foo'])
+            self.assertEqual(2, validate.call_count)
+
+    def test_compiled_schemata_shared(self):
+        schema = properties.compile_schemata({'foo': {'Type': 'String'}})
+        props1 = properties.Properties(schema, {'foo': 'bar'}, context='a')
+        props2 = properties.Properties(schema, {'foo': 'baz'}, context='b')
+        self.assertIs(props1.props, props2.props)
+        self.assertEqual('bar', props1['foo'])
+        self.assertEqual('baz', props2['foo'])
+
     def test_none_string(self):
         schema = {'foo': {'Type': 'String'}}
         props = properties.Properties(schema, {'foo': None})
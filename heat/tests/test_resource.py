@@ -64,6 +64,29 @@ class ResourceTest(HeatTestCase):
         self.assertIsInstance(res, generic_rsrc.GenericResource)
         self.assertEqual("INIT", res.action)
 
+    def test_compiled_schemata_shared(self):
+        snippet = {'Type': 'GenericResourceType', 'Properties': {}}
+        res1 = generic_rsrc.ResourceWithProps('res1', snippet, self.stack)
+        res2 = generic_rsrc.ResourceWithProps('res2', snippet, self.stack)
+        self.assertIs(res1.properties.props, res2.properties.props)
+        self.assertIs(res1.attributes._attributes,
+                      res2.attributes._attributes)
+
+        other = generic_rsrc.ResWithComplexPropsAndAttrs('res3', snippet,
+                                                         self.stack)
+        self.assertIsNot(res1.properties.props, other.properties.props)
+        self.assertEqual(['Foo'], list(res1.properties))
+
+    def test_compiled_schemata_instance_schema(self):
+        snippet = {'Type': 'GenericResourceType', 'Properties': {}}
+        res = generic_rsrc.ResourceWithProps('res', snippet, self.stack)
+        res.properties_schema = {'Bar': {'Type': 'String'}}
+        res.reparse()
+        self.assertEqual(['Bar'], list(res.properties))
+
+        res = generic_rsrc.ResourceWithProps('res', snippet, self.stack)
+        self.assertEqual(['Foo'], list(res.properties))
+
     def test_resource_new_stack_not_stored(self):
         snippet = {'Type': 'GenericResourceType'}
         self.stack.id = None
@@ -432,6 +455,35 @@ class ResourceTest(HeatTestCase):
         self.assertIn(estr, str(err))
         self.assertEqual((res.CREATE, res.FAILED), res.state)
 
+    def test_create_attribute_changes(self):
+        resource._register_class('ResourceWithPropsType',
+                                 generic_rsrc.ResourceWithProps)
+        tmpl = {'HeatTemplateFormatVersion': '2012-12-12',
+                'Resources': {
+                    'A': {'Type': 'GenericResourceType'},
+                    'B': {'Type': 'ResourceWithPropsType',
+                          'Properties': {'Foo': {'Fn::Join': [
+                              '-', ['x', {'Fn::GetAtt': ['A', 'foo']}]]}}}}}
+        stack = parser.Stack(utils.dummy_context(), 'test_stack',
+                             parser.Template(tmpl),
+                             stack_id=str(uuid.uuid4()))
+        a, b = stack['A'], stack['B']
+        a.state_set(a.CREATE, a.COMPLETE)
+        attr = self.patchobject(a.attributes, '_resolver')
+        attr.return_value = '1'
+
+        seen = []
+
+        def read_foo(*args):
+            seen.append(b.properties['Foo'])
+            attr.return_value = '2'
+            seen.append(b.properties['Foo'])
+            return True
+
+        self.patchobject(b, 'handle_create').side_effect = read_foo
+        scheduler.TaskRunner(b.create)()
+        self.assertEqual(['x-1', 'x-2'], seen)
+
     def test_create_fail_metadata_parse_error(self):
         tmpl = {'Type': 'GenericResourceType', 'Properties': {},
                 'Metadata': {"Fn::GetAtt": ["ResourceA", "abc"]}}
@@ -25,6 +25,7 @@ from heat.common import context
 from heat.common import exception
 from heat.common import template_format
 from heat.db.sqlalchemy import api as db_api
+from heat.db.sqlalchemy import models
 from heat.engine import clients
 from heat.engine.clients import novaclient
 from heat.engine import environment
@@ -128,8 +129,9 @@ class SqlAlchemyTest(HeatTestCase):
         fc = fakes.FakeClient()
         mocks.StubOutWithMock(instances.Instance, 'nova')
         instances.Instance.nova().MultipleTimes().AndReturn(fc)
-        self.m.StubOutWithMock(clients.OpenStackClients, 'nova')
-        clients.OpenStackClients.nova().MultipleTimes().AndReturn(self.fc)
+        # Properties validated during create are not validated again
+        nova = self.patchobject(clients.OpenStackClients, 'nova')
+        nova.return_value = self.fc
 
         mocks.StubOutWithMock(fc.client, 'get_servers_9999')
         get = fc.client.get_servers_9999
@@ -1030,6 +1032,39 @@ class DBAPIRawTemplateTest(HeatTestCase):
         template = db_api.raw_template_get(self.ctx, tp.id)
         self.assertEqual(tp.id, template.id)
         self.assertEqual(tp.template, template.template)
+        self.assertEqual({'foo': 'bar'}, template.files)
+
+    def test_raw_template_get_hash(self):
+        t = template_format.parse(wp_template)
+        tp1 = create_raw_template(self.ctx, template=t)
+        tp2 = create_raw_template(self.ctx, template=t, files={})
+        hash1 = db_api.raw_template_get_hash(self.ctx, tp1.id)
+        self.assertEqual(40, len(hash1))
+        self.assertNotEqual(hash1,
+                            db_api.raw_template_get_hash(self.ctx, tp2.id))
+        self.assertRaises(exception.NotFound, db_api.raw_template_get_hash,
+                          self.ctx, tp2.id + 1)
+
+    def test_raw_template_create_shared(self):
+        t = template_format.parse(wp_template)
+        tp1 = create_raw_template(self.ctx, template=t)
+        tp2 = create_raw_template(self.ctx, template=t)
+        self.assertEqual(tp1.id, tp2.id)
+
+        tp3 = create_raw_template(self.ctx, template=t,
+                                  files={'foo': 'bar', 'baz': 'bar'})
+        self.assertNotEqual(tp1.id, tp3.id)
+        self.assertEqual({'foo': 'bar', 'baz': 'bar'}, tp3.files)
+        self.assertEqual(1, len(self.ctx.session.query(
+            models.RawTemplateFile).all()))
+
+    def test_raw_template_legacy_files(self):
+        tp = create_raw_template(self.ctx, files={'foo': 'bar'})
+        tp.legacy_files = {'baz': 'quux'}
+        tp.save(self.ctx.session)
+
+        template = db_api.raw_template_get(self.ctx, tp.id)
+        self.assertEqual({'foo': 'bar', 'baz': 'quux'}, template.files)
 
 
 class DBAPIUserCredsTest(HeatTestCase):
@@ -1325,6 +1360,44 @@ class DBAPIStackTest(HeatTestCase):
         self._deleted_stack_existance(utils.dummy_context(), stacks,
                                       (), (0, 1, 2, 3, 4))
 
+    def test_purge_deleted_shared_template(self):
+        now = datetime.now()
+        creds = [create_user_creds(self.ctx) for i in range(2)]
+        deleted = create_stack(self.ctx, self.template, creds[0],
+                               deleted_at=now - timedelta(days=2))
+        live = create_stack(self.ctx, self.template, creds[1])
+
+        db_api.purge_deleted(age=1, granularity='days')
+        self._deleted_stack_existance(utils.dummy_context(),
+                                      [deleted, live], (1,), (0,))
+        self.assertIsNotNone(db_api.raw_template_get(self.ctx,
+                                                     self.template.id))
+
+        db_api.stack_update(self.ctx, live.id,
+                            {'deleted_at': now - timedelta(days=2)})
+        db_api.purge_deleted(age=1, granularity='days')
+        ctx = utils.dummy_context()
+        self.assertRaises(exception.NotFound, db_api.raw_template_get,
+                          ctx, self.template.id)
+        self.assertEqual([], ctx.session.query(models.RawTemplateFile).all())
+
+    def test_purge_deleted_reused_template(self):
+        now = datetime.now()
+        deleted = create_stack(self.ctx, self.template, self.user_creds,
+                               deleted_at=now - timedelta(days=2))
+
+        # Stored again by a stack being created while the old one is purged
+        reused = db_api.raw_template_create(
+            self.ctx, {'template': self.template.template,
+                       'files': self.template.files})
+        self.assertEqual(self.template.id, reused.id)
+
+        db_api.purge_deleted(age=1, granularity='days')
+        ctx = utils.dummy_context()
+        self.assertIsNone(db_api.stack_get(ctx, deleted.id,
+                                           show_deleted=True))
+        self.assertIsNotNone(db_api.raw_template_get(ctx, self.template.id))
+
     def _deleted_stack_existance(self, ctx, stacks, existing, deleted):
         for s in existing:
             self.assertIsNotNone(db_api.stack_get(ctx, stacks[s].id,
@@ -1453,11 +1526,48 @@ class DBAPIStackLockTest(HeatTestCase):
         observed = db_api.stack_lock_create(self.stack.id, UUID2)
         self.assertEqual(UUID1, observed)
 
+    def _expire_leases(self):
+        now = timeutils.utcnow()
+        timeutils.set_time_override(now + timedelta(seconds=61))
+        self.addCleanup(timeutils.clear_time_override)
+
     def test_stack_lock_steal_success(self):
         db_api.stack_lock_create(self.stack.id, UUID1)
+        self._expire_leases()
         observed = db_api.stack_lock_steal(self.stack.id, UUID1, UUID2)
         self.assertIsNone(observed)
 
+    def test_stack_lock_steal_fail_lease_alive(self):
+        db_api.stack_lock_create(self.stack.id, UUID1)
+        observed = db_api.stack_lock_steal(self.stack.id, UUID1, UUID2)
+        self.assertEqual(UUID1, observed)
+
+    def test_stack_lock_steal_renews_lease(self):
+        db_api.stack_lock_create(self.stack.id, UUID1)
+        self._expire_leases()
+        db_api.stack_lock_steal(self.stack.id, UUID1, UUID2)
+        self.assertTrue(db_api.stack_lock_lease_alive(UUID2))
+        observed = db_api.stack_lock_steal(self.stack.id, UUID2, UUID3)
+        self.assertEqual(UUID2, observed)
+
+    def test_stack_lock_renew(self):
+        stack2 = create_stack(self.ctx, self.template, self.user_creds)
+        db_api.stack_lock_create(self.stack.id, UUID1)
+        db_api.stack_lock_create(stack2.id, UUID1)
+        self._expire_leases()
+        self.assertFalse(db_api.stack_lock_lease_alive(UUID1))
+
+        self.assertEqual(2, db_api.stack_lock_renew(UUID1))
+        self.assertTrue(db_api.stack_lock_lease_alive(UUID1))
+        observed = db_api.stack_lock_steal(self.stack.id, UUID1, UUID2)
+        self.assertEqual(UUID1, observed)
+
+    def test_stack_lock_lease_alive(self):
+        self.assertFalse(db_api.stack_lock_lease_alive(UUID1))
+        db_api.stack_lock_create(self.stack.id, UUID1)
+        self.assertTrue(db_api.stack_lock_lease_alive(UUID1))
+        self.assertFalse(db_api.stack_lock_lease_alive(UUID2))
+
     def test_stack_lock_steal_fail_gone(self):
         db_api.stack_lock_create(self.stack.id, UUID1)
         db_api.stack_lock_release(self.stack.id, UUID1)
@@ -1693,6 +1803,54 @@ class DBAPIWatchRuleTest(HeatTestCase):
         wrs = db_api.watch_rule_get_all_by_stack(self.ctx, self.stack1.id)
         self.assertEqual(2, len(wrs))
 
+    def test_watch_rule_get_all_after(self):
+        values = [
+            {'name': 'rule1'},
+            {'name': 'rule2'},
+            {'name': 'rule3'},
+        ]
+        wrs = [create_watch_rule(self.ctx, self.stack, **val)
+               for val in values]
+
+        ret_wrs = db_api.watch_rule_get_all_after(self.ctx, 0)
+        self.assertEqual(['rule1', 'rule2', 'rule3'],
+                         [wr.name for wr in ret_wrs])
+        ret_wrs = db_api.watch_rule_get_all_after(self.ctx, wrs[0].id)
+        self.assertEqual(['rule2', 'rule3'], [wr.name for wr in ret_wrs])
+        ret_wrs = db_api.watch_rule_get_all_after(self.ctx, wrs[2].id)
+        self.assertEqual([], ret_wrs)
+
+    def test_watch_rule_get_all_by_ids(self):
+        stack1 = create_stack(self.ctx, self.template, self.user_creds)
+        wr1 = create_watch_rule(self.ctx, self.stack, name='rule1')
+        wr2 = create_watch_rule(self.ctx, stack1, name='rule2')
+        create_watch_rule(self.ctx, stack1, name='rule3')
+        create_watch_data(self.ctx, wr2)
+
+        ret_wrs = db_api.watch_rule_get_all_by_ids(self.ctx,
+                                                   [wr1.id, wr2.id, 999])
+        self.assertEqual(set(['rule1', 'rule2']),
+                         set(wr.name for wr in ret_wrs))
+        for wr in ret_wrs:
+            self.assertEqual(wr.stack_id, wr.stack.id)
+        self.assertEqual(1, len([wr for wr in ret_wrs if wr.watch_data]))
+
+        db_api.stack_delete(self.ctx, stack1.id)
+        ret_wrs = db_api.watch_rule_get_all_by_ids(self.ctx,
+                                                   [wr1.id, wr2.id])
+        self.assertEqual(['rule1'], [wr.name for wr in ret_wrs])
+
+    def test_watch_rule_update_all(self):
+        stack1 = create_stack(self.ctx, self.template, self.user_creds)
+        create_watch_rule(self.ctx, self.stack, name='rule1')
+        create_watch_rule(self.ctx, stack1, name='rule2')
+        now = timeutils.utcnow()
+
+        self.assertEqual(2, db_api.watch_rule_update_all(
+            self.ctx, {'last_evaluated': now}))
+        for wr in db_api.watch_rule_get_all(self.ctx):
+            self.assertEqual(now, wr.last_evaluated)
+
     def test_watch_rule_update(self):
         watch_rule = create_watch_rule(self.ctx, self.stack)
         values = {
@@ -1738,6 +1896,25 @@ class DBAPIWatchDataTest(HeatTestCase):
         self.assertEqual('{"foo": "bar"}', dumps(ret_data[0].data))
         self.assertEqual(self.watch_rule.id, ret_data[0].watch_rule_id)
 
+    def test_watch_data_create_all(self):
+        watch_rule2 = create_watch_rule(self.ctx, self.stack, name='rule2')
+        values = [
+            {'data': loads('{"foo": "d1"}'),
+             'watch_rule_id': self.watch_rule.id},
+            {'data': loads('{"foo": "d2"}'),
+             'watch_rule_id': watch_rule2.id},
+            {'data': loads('{"foo": "d3"}'),
+             'watch_rule_id': 999},
+        ]
+        self.assertEqual(2, db_api.watch_data_create_all(self.ctx, values))
+
+        watch_data = db_api.watch_data_get_all(self.ctx)
+        self.assertEqual(set([('d1', self.watch_rule.id),
+                              ('d2', watch_rule2.id)]),
+                         set((wd.data['foo'], wd.watch_rule_id)
+                             for wd in watch_data))
+        self.assertEqual(0, db_api.watch_data_create_all(self.ctx, []))
+
     def test_watch_data_get_all(self):
         values = [
             {'data': loads('{"foo": "d1"}')},
@@ -1750,3 +1927,49 @@ class DBAPIWatchDataTest(HeatTestCase):
 
         data = [wd.data for wd in watch_data]
         [self.assertIn(val['data'], data) for val in values]
+
+
+class DBAPIServiceTest(HeatTestCase):
+    def setUp(self):
+        super(DBAPIServiceTest, self).setUp()
+        self.ctx = utils.dummy_context()
+
+    def _create_service(self, host='engine-1'):
+        return db_api.service_create(self.ctx, {'engine_id': UUID1,
+                                                'host': host,
+                                                'topic': 'engine',
+                                                'report_interval': 60})
+
+    def test_service_create(self):
+        service = self._create_service()
+        self.assertIsNotNone(service.id)
+        self.assertEqual(UUID1, service.engine_id)
+        self.assertEqual('engine-1', service.host)
+        self.assertEqual(60, service.report_interval)
+
+    def test_service_update(self):
+        service = self._create_service()
+        now = timeutils.utcnow()
+        timeutils.set_time_override(now + timedelta(seconds=30))
+        self.addCleanup(timeutils.clear_time_override)
+
+        db_api.service_update(self.ctx, service.id, {})
+        updated = db_api.service_get(self.ctx, service.id)
+        self.assertEqual(now + timedelta(seconds=30), updated.updated_at)
+
+    def test_service_update_not_found(self):
+        self.assertRaises(exception.NotFound, db_api.service_update,
+                          self.ctx, UUID2, {})
+
+    def test_service_delete(self):
+        service = self._create_service()
+        db_api.service_delete(self.ctx, service.id)
+        self.assertEqual([], db_api.service_get_all(self.ctx))
+        self.assertRaises(exception.NotFound, db_api.service_get,
+                          self.ctx, service.id)
+
+    def test_service_get_all(self):
+        self._create_service('engine-1')
+        self._create_service('engine-2')
+        hosts = [s.host for s in db_api.service_get_all(self.ctx)]
+        self.assertEqual(['engine-1', 'engine-2'], sorted(hosts))
@@ -11,11 +11,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 from sqlalchemy.dialects.mysql.base import MySQLDialect
 from sqlalchemy.dialects.sqlite.base import SQLiteDialect
 from sqlalchemy import types
 import testtools
 
+from heat.db.sqlalchemy import migration
+from heat.db.sqlalchemy import types as heat_db_types
+from heat.db.sqlalchemy.types import CompressedJson
+from heat.db.sqlalchemy.types import CompressedPickle
 from heat.db.sqlalchemy.types import Json
 from heat.db.sqlalchemy.types import LongText
 
@@ -52,3 +57,98 @@ class JsonTest(testtools.TestCase):
         value = '{"foo": "bar"}'
         result = self.sqltype.process_result_value(value, dialect)
         self.assertEqual({'foo': 'bar'}, result)
+
+
+class CompressedJsonTest(testtools.TestCase):
+
+    def setUp(self):
+        super(CompressedJsonTest, self).setUp()
+        self.sqltype = CompressedJson()
+
+    def test_small_value_not_compressed(self):
+        dialect = SQLiteDialect()
+        value = {'foo': 'bar'}
+        result = self.sqltype.process_bind_param(value, dialect)
+        self.assertEqual('{"foo": "bar"}', result)
+        self.assertEqual(value,
+                         self.sqltype.process_result_value(result, dialect))
+
+    def test_large_value_compressed(self):
+        dialect = SQLiteDialect()
+        value = {'foo': u'\u2665' * heat_db_types.COMPRESSION_THRESHOLD}
+        result = self.sqltype.process_bind_param(value, dialect)
+        self.assertTrue(heat_db_types.is_compressed(result))
+        self.assertTrue(len(result) < heat_db_types.COMPRESSION_THRESHOLD)
+        self.assertEqual(value,
+                         self.sqltype.process_result_value(result, dialect))
+
+    def test_process_result_value_uncompressed(self):
+        dialect = SQLiteDialect()
+        result = self.sqltype.process_result_value('{"foo": "bar"}', dialect)
+        self.assertEqual({'foo': 'bar'}, result)
+
+    def test_large_value_uncompressed(self):
+        dialect = SQLiteDialect()
+        value = {'foo': 'x' * heat_db_types.COMPRESSION_THRESHOLD}
+        with heat_db_types.uncompressed():
+            result = self.sqltype.process_bind_param(value, dialect)
+        self.assertFalse(heat_db_types.is_compressed(result))
+        result = self.sqltype.process_bind_param(value, dialect)
+        self.assertTrue(heat_db_types.is_compressed(result))
+
+
+class CompressedPickleTest(testtools.TestCase):
+
+    def setUp(self):
+        super(CompressedPickleTest, self).setUp()
+        self.sqltype = CompressedPickle()
+
+    def test_round_trip(self):
+        dialect = SQLiteDialect()
+        for value in ({'foo': 'bar'},
+                      {'foo': 'x' * heat_db_types.COMPRESSION_THRESHOLD}):
+            result = self.sqltype.process_bind_param(value, dialect)
+            self.assertEqual(value,
+                             self.sqltype.process_result_value(result,
+                                                               dialect))
+
+    def test_large_value_compressed(self):
+        dialect = SQLiteDialect()
+        value = {'foo': 'x' * heat_db_types.COMPRESSION_THRESHOLD}
+        result = self.sqltype.process_bind_param(value, dialect)
+        self.assertEqual(heat_db_types.ZLIB, result[0])
+
+    def test_none(self):
+        dialect = SQLiteDialect()
+        self.assertIsNone(self.sqltype.process_bind_param(None, dialect))
+        self.assertIsNone(self.sqltype.process_result_value(None, dialect))
+
+
+class DBSyncTest(testtools.TestCase):
+
+    def setUp(self):
+        super(DBSyncTest, self).setUp()
+        patcher = mock.patch.object(migration, 'oslo_migration')
+        self.oslo_migration = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.compressed = []
+        self.oslo_migration.db_sync.side_effect = self._db_sync
+
+    def _db_sync(self, engine, path, version, init_version):
+        self.compressed.append((version,
+                                heat_db_types._compression_enabled))
+
+    def test_earlier_migrations_uncompressed(self):
+        self.oslo_migration.db_version.return_value = 30
+        migration.db_sync('engine')
+        self.assertEqual([(47, False), (None, True)], self.compressed)
+
+    def test_earlier_version_uncompressed(self):
+        self.oslo_migration.db_version.return_value = 30
+        migration.db_sync('engine', '40')
+        self.assertEqual([(40, False), ('40', True)], self.compressed)
+
+    def test_later_migrations_compressed(self):
+        self.oslo_migration.db_version.return_value = 47
+        migration.db_sync('engine')
+        self.assertEqual([(None, True)], self.compressed)
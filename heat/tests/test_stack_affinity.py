@@ -0,0 +1,259 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+from oslo.config import cfg
+
+from heat.common import context
+from heat.db import api as db_api
+from heat.engine import service
+from heat.engine import stack_affinity
+from heat.openstack.common.rpc import common as rpc_common
+from heat.openstack.common.rpc import proxy
+from heat.openstack.common import timeutils
+from heat.tests.common import HeatTestCase
+from heat.tests import utils
+
+
+class StackRouterTest(HeatTestCase):
+    def setUp(self):
+        super(StackRouterTest, self).setUp()
+        self.ctx = utils.dummy_context()
+        self.router = stack_affinity.StackRouter('engine-1', 'engine',
+                                                 'engine-id-1')
+
+    def _add_engine(self, host, age=0):
+        now = timeutils.utcnow()
+        return db_api.service_create(context.get_admin_context(), {
+            'engine_id': 'engine-id-%s' % host,
+            'host': host,
+            'topic': 'engine',
+            'report_interval': 60,
+            'created_at': now - datetime.timedelta(seconds=age)})
+
+    def test_report_registers_engine(self):
+        self.router.report()
+        services = db_api.service_get_all(context.get_admin_context())
+        self.assertEqual(1, len(services))
+        self.assertEqual(self.router.service_id, services[0].id)
+        self.assertEqual('engine-1', services[0].host)
+
+        self.router.report()
+        services = db_api.service_get_all(context.get_admin_context())
+        self.assertEqual(1, len(services))
+
+    def test_report_rebalances(self):
+        self.router.report()
+        self.assertEqual(frozenset(['engine-1']), self.router.ring.nodes)
+
+        self._add_engine('engine-2')
+        self.router.report()
+        self.assertEqual(frozenset(['engine-1', 'engine-2']),
+                         self.router.ring.nodes)
+
+    def test_dead_engine_dropped(self):
+        self._add_engine('engine-2')
+        self._add_engine('engine-3', age=600)
+        self.router.report()
+        self.assertEqual(frozenset(['engine-1', 'engine-2']),
+                         self.router.ring.nodes)
+
+    def test_stop_deregisters_engine(self):
+        self.router.report()
+        self.router.stop()
+        self.assertIsNone(self.router.service_id)
+        self.assertEqual([],
+                         db_api.service_get_all(context.get_admin_context()))
+
+        self.router.report()
+        self.assertIsNone(self.router.service_id)
+        self.assertEqual([],
+                         db_api.service_get_all(context.get_admin_context()))
+
+    def test_report_error(self):
+        self.patchobject(db_api, 'service_create').side_effect = (
+            Exception('DB error'))
+        self.router.report()
+        self.assertIsNone(self.router.service_id)
+
+    def test_nested_stack_routed_with_root(self):
+        self._add_engine('engine-2')
+        self._add_engine('engine-3')
+        self.router.report()
+
+        stacks = {
+            'child': mock.Mock(owner_id='parent'),
+            'parent': mock.Mock(owner_id='root'),
+            'root': mock.Mock(owner_id=None),
+        }
+        self.patchobject(db_api, 'stack_get').side_effect = (
+            lambda cnxt, sid, **kwargs: stacks[sid])
+
+        self.assertEqual('root', self.router.root_stack_id(self.ctx, 'child'))
+        self.assertEqual(self.router.ring.get_node('root'),
+                         self.router.get_host(self.ctx, 'child'))
+
+    def test_root_stack_id_cached(self):
+        stacks = {
+            'child': mock.Mock(owner_id='parent'),
+            'parent': mock.Mock(owner_id='root'),
+            'root': mock.Mock(owner_id=None),
+        }
+        stack_get = self.patchobject(db_api, 'stack_get')
+        stack_get.side_effect = lambda cnxt, sid, **kwargs: stacks[sid]
+
+        self.assertEqual('root', self.router.root_stack_id(self.ctx, 'child'))
+        self.assertEqual(3, stack_get.call_count)
+        self.assertEqual('root', self.router.root_stack_id(self.ctx, 'child'))
+        self.assertEqual('root',
+                         self.router.root_stack_id(self.ctx, 'parent'))
+        self.assertEqual(3, stack_get.call_count)
+
+    def test_unknown_stack_not_cached(self):
+        stack_get = self.patchobject(db_api, 'stack_get')
+        stack_get.return_value = None
+        self.assertEqual('new', self.router.root_stack_id(self.ctx, 'new'))
+        self.assertEqual('new', self.router.root_stack_id(self.ctx, 'new'))
+        self.assertEqual(2, stack_get.call_count)
+
+    def test_failed_engine_dropped_until_reported(self):
+        engine_2 = self._add_engine('engine-2')
+        self.router.report()
+        self.router.host_failed('engine-2')
+        self.assertEqual(frozenset(['engine-1']), self.router.ring.nodes)
+
+        self.router.report()
+        self.assertEqual(frozenset(['engine-1']), self.router.ring.nodes)
+
+        db_api.service_update(context.get_admin_context(), engine_2.id, {
+            'updated_at': timeutils.utcnow() + datetime.timedelta(seconds=1)})
+        self.router.report()
+        self.assertEqual(frozenset(['engine-1', 'engine-2']),
+                         self.router.ring.nodes)
+
+    def test_route(self):
+        mock_call = self.patchobject(proxy.RpcProxy, 'call')
+        mock_call.return_value = 'result'
+
+        result = self.router.route(self.ctx, 'engine-2', 'stack_suspend',
+                                   stack_identity={'stack_id': 'a'})
+        self.assertEqual('result', result)
+        mock_call.assert_called_once_with(
+            self.ctx,
+            {'method': 'stack_suspend', 'namespace': None,
+             'args': {'stack_identity': {'stack_id': 'a'}}},
+            topic='engine.engine-2')
+
+    def test_host_alive(self):
+        self._add_engine('engine-2')
+        self.router.report()
+        mock_call = self.patchobject(proxy.RpcProxy, 'call')
+        mock_call.return_value = True
+
+        self.assertTrue(self.router.host_alive(self.ctx, 'engine-2'))
+        mock_call.assert_called_once_with(
+            self.ctx, {'method': 'listening', 'namespace': None, 'args': {}},
+            topic='engine-id-engine-2',
+            timeout=cfg.CONF.engine_life_check_timeout)
+
+    def test_host_not_alive(self):
+        self._add_engine('engine-2')
+        self.router.report()
+        mock_call = self.patchobject(proxy.RpcProxy, 'call')
+        mock_call.side_effect = rpc_common.Timeout
+
+        self.assertFalse(self.router.host_alive(self.ctx, 'engine-2'))
+        self.assertFalse(self.router.host_alive(self.ctx, 'engine-3'))
+        self.assertEqual(1, mock_call.call_count)
+
+
+class StackAffinityRouteTest(HeatTestCase):
+
+    class FakeEngine(object):
+        host = 'engine-1'
+        stack_router = None
+
+        def __init__(self):
+            self.calls = []
+
+        @service.stack_affinity_route
+        def stack_suspend(self, cnxt, stack_identity, resource_name=None):
+            self.calls.append((stack_identity, resource_name))
+            return 'local'
+
+    def setUp(self):
+        super(StackAffinityRouteTest, self).setUp()
+        self.ctx = utils.dummy_context()
+        self.identity = {'stack_id': 'a-stack'}
+        self.engine = self.FakeEngine()
+        self.engine.stack_router = mock.Mock()
+
+    def test_no_router(self):
+        self.engine.stack_router = None
+        self.assertEqual('local',
+                         self.engine.stack_suspend(self.ctx, self.identity))
+        self.assertEqual([(self.identity, None)], self.engine.calls)
+
+    def test_local_stack(self):
+        self.engine.stack_router.get_host.return_value = 'engine-1'
+        self.assertEqual('local',
+                         self.engine.stack_suspend(self.ctx, self.identity,
+                                                   'res'))
+        self.assertEqual([(self.identity, 'res')], self.engine.calls)
+        self.assertFalse(self.engine.stack_router.route.called)
+
+    def test_remote_stack(self):
+        router = self.engine.stack_router
+        router.get_host.return_value = 'engine-2'
+        router.route.return_value = 'remote'
+
+        self.assertEqual('remote',
+                         self.engine.stack_suspend(self.ctx, self.identity,
+                                                   'res'))
+        self.assertEqual([], self.engine.calls)
+        router.get_host.assert_called_once_with(self.ctx, 'a-stack')
+        router.route.assert_called_once_with(self.ctx, 'engine-2',
+                                             'stack_suspend',
+                                             stack_identity=self.identity,
+                                             resource_name='res',
+                                             routed=True)
+
+    def test_routed_call_handled_locally(self):
+        self.assertEqual('local',
+                         self.engine.stack_suspend(self.ctx, self.identity,
+                                                   routed=True))
+        self.assertFalse(self.engine.stack_router.get_host.called)
+
+    def test_dead_remote_handled_locally(self):
+        router = self.engine.stack_router
+        router.get_host.return_value = 'engine-2'
+        router.host_alive.return_value = False
+
+        self.assertEqual('local',
+                         self.engine.stack_suspend(self.ctx, self.identity))
+        self.assertEqual([(self.identity, None)], self.engine.calls)
+        router.host_alive.assert_called_once_with(self.ctx, 'engine-2')
+        self.assertFalse(router.route.called)
+        router.host_failed.assert_called_once_with('engine-2')
+
+    def test_remote_timeout_not_handled_locally(self):
+        router = self.engine.stack_router
+        router.get_host.return_value = 'engine-2'
+        router.route.side_effect = rpc_common.Timeout
+
+        self.assertRaises(rpc_common.Timeout,
+                          self.engine.stack_suspend, self.ctx, self.identity)
+        self.assertEqual([], self.engine.calls)
+        self.assertFalse(router.host_failed.called)
@@ -14,7 +14,6 @@
 from heat.common import exception
 from heat.db import api as db_api
 from heat.engine import stack_lock
-from heat.openstack.common.rpc import common as rpc_common
 from heat.openstack.common.rpc import proxy
 from heat.tests.common import HeatTestCase
 from heat.tests import utils
@@ -52,17 +51,11 @@ class StackLockTest(HeatTestCase):
         self.assertRaises(exception.ActionInProgress, slock.acquire)
         self.m.VerifyAll()
 
-    def test_successful_acquire_existing_lock_engine_dead(self):
+    def test_successful_acquire_existing_lock_lease_expired(self):
         self.m.StubOutWithMock(db_api, "stack_lock_create")
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
-        self.m.StubOutWithMock(proxy.RpcProxy, "call")
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndRaise(rpc_common.Timeout)
-
         self.m.StubOutWithMock(db_api, "stack_lock_steal")
         db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
                                 self.engine_id).AndReturn(None)
@@ -73,16 +66,17 @@ class StackLockTest(HeatTestCase):
         slock.acquire()
         self.m.VerifyAll()
 
-    def test_failed_acquire_existing_lock_engine_alive(self):
+    def test_failed_acquire_existing_lock_lease_alive(self):
         self.m.StubOutWithMock(db_api, "stack_lock_create")
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
+        self.m.StubOutWithMock(db_api, "stack_lock_steal")
+        db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
+                                self.engine_id).\
+            AndReturn("fake-engine-id")
+
         self.m.StubOutWithMock(proxy.RpcProxy, "call")
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndReturn(True)
 
         self.m.ReplayAll()
 
@@ -90,17 +84,11 @@ class StackLockTest(HeatTestCase):
         self.assertRaises(exception.ActionInProgress, slock.acquire)
         self.m.VerifyAll()
 
-    def test_failed_acquire_existing_lock_engine_dead(self):
+    def test_failed_acquire_existing_lock_stolen_first(self):
         self.m.StubOutWithMock(db_api, "stack_lock_create")
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
-        self.m.StubOutWithMock(proxy.RpcProxy, "call")
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndRaise(rpc_common.Timeout)
-
         self.m.StubOutWithMock(db_api, "stack_lock_steal")
         db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
                                 self.engine_id).\
@@ -117,12 +105,6 @@ class StackLockTest(HeatTestCase):
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
-        self.m.StubOutWithMock(proxy.RpcProxy, "call")
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndRaise(rpc_common.Timeout)
-
         self.m.StubOutWithMock(db_api, "stack_lock_steal")
         db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
                                 self.engine_id).\
@@ -131,11 +113,6 @@ class StackLockTest(HeatTestCase):
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndRaise(rpc_common.Timeout)
-
         db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
                                 self.engine_id).\
             AndReturn(None)
@@ -151,12 +128,6 @@ class StackLockTest(HeatTestCase):
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
-        self.m.StubOutWithMock(proxy.RpcProxy, "call")
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndRaise(rpc_common.Timeout)
-
         self.m.StubOutWithMock(db_api, "stack_lock_steal")
         db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
                                 self.engine_id).\
@@ -165,11 +136,6 @@ class StackLockTest(HeatTestCase):
         db_api.stack_lock_create(self.stack.id, self.engine_id).\
             AndReturn("fake-engine-id")
 
-        topic = self.stack.id
-        rpc = proxy.RpcProxy(topic, "1.0")
-        rpc.call(self.context, rpc.make_msg("listening"), timeout=2,
-                 topic="fake-engine-id").AndRaise(rpc_common.Timeout)
-
         db_api.stack_lock_steal(self.stack.id, "fake-engine-id",
                                 self.engine_id).\
             AndReturn(True)
@@ -179,3 +145,32 @@ class StackLockTest(HeatTestCase):
         slock = stack_lock.StackLock(self.context, self.stack, self.engine_id)
         self.assertRaises(exception.ActionInProgress, slock.acquire)
         self.m.VerifyAll()
+
+    def test_engine_alive(self):
+        self.m.StubOutWithMock(db_api, "stack_lock_lease_alive")
+        db_api.stack_lock_lease_alive("fake-engine-id").AndReturn(True)
+
+        self.m.ReplayAll()
+
+        self.assertTrue(stack_lock.StackLock.engine_alive(self.context,
+                                                          "fake-engine-id"))
+        self.m.VerifyAll()
+
+    def test_renew_leases(self):
+        self.m.StubOutWithMock(db_api, "stack_lock_renew")
+        db_api.stack_lock_renew(self.engine_id).AndReturn(3)
+
+        self.m.ReplayAll()
+
+        stack_lock.StackLock.renew_leases(self.engine_id)
+        self.m.VerifyAll()
+
+    def test_renew_leases_error(self):
+        self.m.StubOutWithMock(db_api, "stack_lock_renew")
+        db_api.stack_lock_renew(self.engine_id).AndRaise(
+            Exception('DB error'))
+
+        self.m.ReplayAll()
+
+        stack_lock.StackLock.renew_leases(self.engine_id)
+        self.m.VerifyAll()
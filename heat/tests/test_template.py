@@ -12,11 +12,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+
+import mock
+from oslo.config import cfg
+
 from heat.common import exception
+from heat.db import api as db_api
 from heat.engine.cfn.template import CfnTemplate
 from heat.engine import plugin_manager
 from heat.engine import template
 from heat.tests.common import HeatTestCase
+from heat.tests import utils
 
 
 class TestTemplatePluginManager(HeatTestCase):
@@ -185,3 +192,166 @@ class TestTemplateValidate(HeatTestCase):
         err = self.assertRaises(exception.InvalidTemplateSection,
                                 tmpl.validate)
         self.assertIn('parameteers', str(err))
+
+
+class TestTemplateCache(HeatTestCase):
+
+    hot_tmpl = {
+        'heat_template_version': '2013-05-23',
+        'resources': {
+            'server': {
+                'type': 'OS::Nova::Server'
+            }
+        }
+    }
+
+    def setUp(self):
+        super(TestTemplateCache, self).setUp()
+        self.ctx = utils.dummy_context()
+        template._template_cache.clear()
+        self.addCleanup(template._template_cache.clear)
+
+    def _raw_template(self, t, files=None):
+        return db_api.raw_template_create(self.ctx, {'template': t,
+                                                     'files': files or {}})
+
+    def test_load_cached(self):
+        rt = self._raw_template(self.hot_tmpl, {'foo': 'bar'})
+        tmpl1 = template.Template.load(self.ctx, rt.id)
+        resources = tmpl1[tmpl1.RESOURCES]
+        tmpl2 = template.Template.load(self.ctx, rt.id, rt)
+
+        self.assertIsNot(tmpl1, tmpl2)
+        self.assertIs(tmpl1.t, tmpl2.t)
+        self.assertIs(resources, tmpl2[tmpl2.RESOURCES])
+        self.assertEqual(rt.id, tmpl2.id)
+        self.assertEqual({'foo': 'bar'}, tmpl2.files)
+
+        tmpl2.files['baz'] = 'quux'
+        self.assertEqual({'foo': 'bar'}, tmpl1.files)
+        tmpl3 = template.Template.load(self.ctx, rt.id, rt)
+        self.assertEqual({'foo': 'bar'}, tmpl3.files)
+
+    def test_load_cached_without_template(self):
+        rt = self._raw_template(self.hot_tmpl, {'foo': 'bar'})
+        tmpl1 = template.Template.load(self.ctx, rt.id)
+
+        with mock.patch.object(db_api, 'raw_template_get') as mock_get:
+            tmpl2 = template.Template.load(self.ctx, rt.id)
+            tmpl3 = template.Template.load(self.ctx, rt.id, mock.Mock())
+        self.assertFalse(mock_get.called)
+        self.assertIs(tmpl1.t, tmpl2.t)
+        self.assertIs(tmpl1.t, tmpl3.t)
+        self.assertEqual({'foo': 'bar'}, tmpl3.files)
+
+    def test_load_reused_id(self):
+        rt = self._raw_template(self.hot_tmpl)
+        tmpl1 = template.Template.load(self.ctx, rt.id)
+
+        # The template was purged and its ID reused for another one
+        other = dict(self.hot_tmpl, description='other')
+        reused = mock.Mock(template=other, files={})
+        with mock.patch.object(db_api, 'raw_template_get_hash') as mock_hash:
+            mock_hash.return_value = 'other-hash'
+            tmpl2 = template.Template.load(self.ctx, rt.id, reused)
+        self.assertIsNot(tmpl1.t, tmpl2.t)
+        self.assertEqual('other', tmpl2[tmpl2.DESCRIPTION])
+
+    def test_store_invalidates(self):
+        tmpl = template.Template(self.hot_tmpl)
+        template._template_cache[(1, 'a')] = 'stale'
+        template._template_cache[(2, 'b')] = 'stale'
+        with mock.patch.object(db_api, 'raw_template_create') as mock_create:
+            mock_create.return_value = mock.Mock(id=2)
+            self.assertEqual(2, tmpl.store(self.ctx))
+        self.assertEqual([(1, 'a')], template._template_cache.keys())
+
+    def test_cache_size(self):
+        cfg.CONF.set_override('template_cache_size', 2)
+        self.addCleanup(cfg.CONF.clear_override, 'template_cache_size')
+        rts = [self._raw_template(dict(self.hot_tmpl, description=str(i)))
+               for i in range(3)]
+        for rt in rts:
+            template.Template.load(self.ctx, rt.id, rt)
+        template.Template.load(self.ctx, rts[1].id, rts[1])
+
+        self.assertEqual([rts[2].id, rts[1].id],
+                         [k[0] for k in template._template_cache])
+
+
+class TestTemplateParse(HeatTestCase):
+
+    cfn_tmpl = {
+        'HeatTemplateFormatVersion': '2012-12-12',
+        'Resources': {
+            'server': {
+                'Type': 'OS::Nova::Server',
+                'Properties': {
+                    'name': {'Fn::Join': ['-', ['a', 'b']]},
+                    'metadata': {'foo': ['bar', {'baz': 'quux'}]},
+                },
+            },
+        },
+    }
+
+    def test_static_snippets(self):
+        tmpl = template.Template(self.cfn_tmpl)
+        props = self.cfn_tmpl['Resources']['server']['Properties']
+        static = tmpl.static_snippets()
+
+        self.assertIn(id(props['metadata']), static)
+        self.assertIn(id(props['name']['Fn::Join'][1]), static)
+        self.assertNotIn(id(props), static)
+        self.assertNotIn(id(props['name']), static)
+        self.assertIs(static, tmpl.__copy__().static_snippets())
+
+    def test_parse_shares_static_snippets(self):
+        tmpl = template.Template(self.cfn_tmpl)
+        snippet = self.cfn_tmpl['Resources']['server']
+        parsed = tmpl.parse(None, snippet)
+
+        self.assertIsNot(snippet, parsed)
+        self.assertIs(snippet['Properties']['metadata'],
+                      parsed['Properties']['metadata'])
+        self.assertEqual('a-b', parsed['Properties']['name'].result())
+
+    def test_parse_other_snippet(self):
+        tmpl = template.Template(self.cfn_tmpl)
+        snippet = {'foo': {'bar': 'baz'}}
+        parsed = tmpl.parse(None, snippet)
+
+        self.assertEqual(snippet, parsed)
+        self.assertIsNot(snippet['foo'], parsed['foo'])
+
+
+class TestTemplateFiles(HeatTestCase):
+
+    def test_shared_until_modified(self):
+        files = template.TemplateFiles({'foo': 'bar'})
+        copied = template.TemplateFiles(files)
+        self.assertIs(files._files, copied._files)
+
+        copied['baz'] = 'quux'
+        self.assertEqual({'foo': 'bar'}, files)
+        self.assertEqual({'foo': 'bar', 'baz': 'quux'}, copied)
+
+        files['foo'] = 'wibble'
+        del copied['foo']
+        self.assertEqual({'foo': 'wibble'}, files)
+        self.assertEqual({'baz': 'quux'}, copied)
+
+    def test_deepcopy_shares(self):
+        files = template.TemplateFiles({'foo': 'bar'})
+        copied = copy.deepcopy(files)
+        self.assertIs(files._files, copied._files)
+        self.assertEqual(files, copied)
+
+    def test_template_files_shared(self):
+        tmpl = template.Template(TestTemplateCache.hot_tmpl,
+                                 files={'foo': 'bar'})
+        nested = template.Template(TestTemplateCache.hot_tmpl,
+                                   files=tmpl.files)
+        self.assertIs(tmpl.files._files, nested.files._files)
+
+        nested.files['baz'] = 'quux'
+        self.assertNotIn('baz', tmpl.files)
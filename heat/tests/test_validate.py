@@ -13,6 +13,7 @@
 
 import collections
 
+import mock
 from testtools import skipIf
 
 from heat.common import exception
@@ -809,6 +810,29 @@ class validateTest(HeatTestCase):
         res = dict(engine.validate_template(None, t, {}))
         self.assertEqual('test.', res['Description'])
 
+    def test_validate_template_cached(self):
+        t = template_format.parse(test_template_ref % 'WikiDatabase')
+
+        self.m.StubOutWithMock(service.EngineListener, 'start')
+        service.EngineListener.start().AndReturn(None)
+        self.m.ReplayAll()
+
+        engine = service.EngineService('a', 't')
+        with mock.patch.object(engine, '_validate_template',
+                               wraps=engine._validate_template) as validate:
+            res1 = engine.validate_template(None, t, {})
+            res1['Description'] = 'changed'
+            res2 = engine.validate_template(None, t, {})
+            self.assertEqual('test.', res2['Description'])
+            self.assertEqual(1, validate.call_count)
+
+            engine.validate_template(None, t, {'parameters': {'foo': 'a'}})
+            self.assertEqual(2, validate.call_count)
+
+            resources.global_env().registry.version += 1
+            engine.validate_template(None, t, {})
+            self.assertEqual(3, validate.call_count)
+
     def test_validate_with_environment(self):
         test_template = test_template_ref % 'WikiDatabase'
         test_template = test_template.replace('AWS::EC2::Instance',
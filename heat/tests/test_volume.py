@@ -15,7 +15,9 @@ import copy
 import json
 
 from cinderclient.v1 import client as cinderclient
+import mock
 import mox
+from oslo.config import cfg
 from testtools import skipIf
 
 from heat.common import exception
@@ -1020,6 +1022,85 @@ class VolumeTest(HeatTestCase):
         self.m.VerifyAll()
 
 
+class VolumeTaskGroupTest(HeatTestCase):
+    def setUp(self):
+        super(VolumeTaskGroupTest, self).setUp()
+        self.stack = mock.Mock()
+        self.nova = self.stack.clients.nova.return_value
+        self.cinder = self.stack.clients.cinder.return_value
+        self.statuses = {}
+
+        def create_server_volume(server_id, volume_id, device):
+            self.statuses[volume_id] = 'attaching'
+            return mock.Mock(id=volume_id)
+
+        def list_volumes():
+            vols = [mock.Mock(id=v, status=s)
+                    for v, s in self.statuses.items()]
+            # Each volume completes after being listed once
+            for v, s in self.statuses.items():
+                self.statuses[v] = {'attaching': 'in-use',
+                                    'detaching': 'available'}.get(s, s)
+            return vols
+
+        self.nova.volumes.create_server_volume.side_effect = (
+            create_server_volume)
+        self.cinder.volumes.list.side_effect = list_volumes
+
+    def test_attach_bounded_and_polled_in_bulk(self):
+        cfg.CONF.set_override('max_concurrent_volume_attachments', 2)
+        volumes = [('vol-%d' % i, '/dev/vd%s' % c)
+                   for i, c in enumerate('bcde')]
+        group = vol.VolumeTaskGroup.attach(self.stack, 'srv-1', volumes)
+        runner = scheduler.TaskRunner(group)
+
+        runner.start()
+        self.assertEqual(2, self.nova.volumes.create_server_volume.call_count)
+        while not runner.step():
+            pass
+
+        self.assertEqual(4, self.nova.volumes.create_server_volume.call_count)
+        self.assertEqual(4, self.cinder.volumes.list.call_count)
+        self.assertEqual(0, self.cinder.volumes.get.call_count)
+        self.assertEqual(['in-use'] * 4, self.statuses.values())
+
+    def test_attach_error(self):
+        self.statuses['vol-0'] = 'error'
+        self.nova.volumes.create_server_volume.side_effect = None
+        group = vol.VolumeTaskGroup.attach(self.stack, 'srv-1',
+                                           [('vol-0', '/dev/vdb'),
+                                            ('vol-1', '/dev/vdc')])
+        self.assertRaises(exception.Error, scheduler.TaskRunner(group))
+
+    def test_attach_single_volume_not_listed(self):
+        group = vol.VolumeTaskGroup.attach(self.stack, 'srv-1',
+                                           [('vol-0', '/dev/vdb')])
+        self.assertIsNone(group.poller)
+        self.cinder.volumes.get.return_value = mock.Mock(status='in-use')
+        scheduler.TaskRunner(group)()
+        self.cinder.volumes.get.assert_called_once_with('vol-0')
+        self.assertFalse(self.cinder.volumes.list.called)
+
+    def test_detach_polled_in_bulk(self):
+        for v in ('vol-0', 'vol-1'):
+            self.statuses[v] = 'detaching'
+        self.nova.volumes.get_server_volume.side_effect = (
+            lambda server_id, attachment_id: mock.Mock(id=attachment_id))
+        self.cinder.volumes.get.side_effect = (
+            lambda volume_id: mock.Mock(id=volume_id, status='in-use'))
+        self.nova.volumes.get_server_volumes.side_effect = [
+            [mock.Mock(id='vol-1')], []]
+
+        group = vol.VolumeTaskGroup.detach(self.stack, 'srv-1',
+                                           ['vol-0', 'vol-1'])
+        scheduler.TaskRunner(group)()
+
+        self.assertEqual(2, self.nova.volumes.delete_server_volume.call_count)
+        self.assertEqual(2, self.cinder.volumes.list.call_count)
+        self.assertEqual(2, self.nova.volumes.get_server_volumes.call_count)
+        self.assertEqual(['available'] * 2, self.statuses.values())
+
+
 class FakeVolume(object):
     status = 'attaching'
     id = 'vol-123'
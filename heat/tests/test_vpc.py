@@ -11,6 +11,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+from oslo.config import cfg
+from oslotest import mockpatch
 from testtools import skipIf
 
 from heat.common import exception
@@ -18,6 +21,8 @@ from heat.common import template_format
 from heat.engine import clients
 from heat.engine import parser
 from heat.engine import resource
+from heat.engine.resources import internet_gateway
+from heat.engine.resources import nova_utils
 from heat.engine import scheduler
 from heat.tests.common import HeatTestCase
 from heat.tests import fakes
@@ -766,6 +771,37 @@ Resources:
         stack.delete()
         self.m.VerifyAll()
 
+    def _external_network_client(self, *network_lists):
+        cfg.CONF.set_override('lookup_cache_ttl', 60)
+        self.useFixture(mockpatch.PatchObject(nova_utils, '_lookup_cache',
+                                              nova_utils.LookupCache()))
+        client = mock.Mock()
+        client.httpclient.endpoint_url = 'http://neutron'
+        client.httpclient.auth_token = 'token'
+        client.list_networks.side_effect = [{'networks': [{'id': i}
+                                                          for i in ids]}
+                                            for ids in network_lists]
+        return client
+
+    def test_external_network_cached(self):
+        client = self._external_network_client(['ext'])
+        for i in range(2):
+            self.assertEqual('ext', internet_gateway.InternetGateway.
+                             get_external_network_id(client))
+        client.list_networks.assert_called_once_with(
+            **{'router:external': True})
+
+    def test_external_network_refreshed_when_ambiguous(self):
+        client = self._external_network_client(['ext'], ['ext', 'ext2'],
+                                               ['ext2'])
+        self.assertEqual('ext', internet_gateway.InternetGateway.
+                         get_external_network_id(client, refresh=True))
+        self.assertRaises(exception.Error, internet_gateway.InternetGateway.
+                          get_external_network_id, client, refresh=True)
+        self.assertEqual('ext2', internet_gateway.InternetGateway.
+                         get_external_network_id(client))
+        self.assertEqual(3, client.list_networks.call_count)
+
 
 class RouteTableTest(VPCTestBase):
 
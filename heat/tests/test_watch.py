@@ -15,6 +15,7 @@
 import datetime
 
 import mox
+from oslo.config import cfg
 
 from heat.common import exception
 import heat.db.api as db_api
@@ -759,6 +760,68 @@ class WatchRuleTest(HeatTestCase):
                                            u'group_x'}]}}
         self.assertFalse(watchrule.rule_can_use_sample(self.wr, data))
 
+    def _store_buffer_rule(self, name, dims):
+        rule = {u'EvaluationPeriods': u'1',
+                u'AlarmDescription': u'test alarm',
+                u'Period': u'300',
+                u'ComparisonOperator': u'GreaterThanThreshold',
+                u'Statistic': u'SampleCount',
+                u'Threshold': u'2',
+                u'Dimensions': [{u'Name': u'AutoScalingGroupName',
+                                 u'Value': dims}],
+                u'MetricName': u'CPUUtilization'}
+        wr = watchrule.WatchRule(context=self.ctx, watch_name=name,
+                                 stack_id=self.stack_id, rule=rule,
+                                 state=watchrule.WatchRule.NORMAL)
+        wr.store()
+        return wr
+
+    def _buffer_data(self, dims):
+        return {u'CPUUtilization': {u'Value': u'90', u'Unit': u'Percent',
+                                    u'Dimensions': [
+                                        {u'AutoScalingGroupName': dims}]}}
+
+    def test_watch_data_buffer_add(self):
+        wr1 = self._store_buffer_rule('buffer_test_1', u'group1')
+        self._store_buffer_rule('buffer_test_2', u'group2')
+        buf = watchrule.WatchDataBuffer()
+
+        self.assertEqual(1, buf.add(self.ctx, self._buffer_data(u'group1')))
+        self.assertEqual(0, buf.add(self.ctx, self._buffer_data(u'group3')))
+        self.assertEqual([], db_api.watch_data_get_all(self.ctx))
+
+        buf.flush()
+        wds = db_api.watch_data_get_all(self.ctx)
+        self.assertEqual([wr1.id], [wd.watch_rule_id for wd in wds])
+        self.assertEqual(self._buffer_data(u'group1'), wds[0].data)
+
+    def test_watch_data_buffer_batch_size(self):
+        cfg.CONF.set_override('watch_data_batch_size', 2)
+        self.addCleanup(cfg.CONF.clear_override, 'watch_data_batch_size')
+        self._store_buffer_rule('buffer_test', u'group1')
+        buf = watchrule.WatchDataBuffer()
+
+        buf.add(self.ctx, self._buffer_data(u'group1'))
+        self.assertEqual(0, len(db_api.watch_data_get_all(self.ctx)))
+        buf.add(self.ctx, self._buffer_data(u'group1'))
+        self.assertEqual(2, len(db_api.watch_data_get_all(self.ctx)))
+
+    def test_watch_data_buffer_new_rule(self):
+        buf = watchrule.WatchDataBuffer()
+        self.assertEqual(0, buf.add(self.ctx, self._buffer_data(u'group1')))
+
+        self._store_buffer_rule('buffer_test', u'group1')
+        self.assertEqual(1, buf.add(self.ctx, self._buffer_data(u'group1')))
+
+    def test_watch_data_buffer_deleted_rule(self):
+        wr = self._store_buffer_rule('buffer_test', u'group1')
+        buf = watchrule.WatchDataBuffer()
+        self.assertEqual(1, buf.add(self.ctx, self._buffer_data(u'group1')))
+
+        wr.destroy()
+        buf.flush()
+        self.assertEqual([], db_api.watch_data_get_all(self.ctx))
+
     def test_destroy(self):
         rule = {'EvaluationPeriods': '1',
                 'MetricName': 'test_metric',
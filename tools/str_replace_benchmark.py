@@ -0,0 +1,73 @@
+#!/usr/bin/python
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the str_replace template function.
+
+Compares the single-pass substitution used by str_replace with applying
+str.replace once for each parameter, over a large user_data script.
+
+Usage: str_replace_benchmark.py [num_params] [script_size] [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+# If ../heat/__init__.py exists, add ../ to Python search path, so that
+# it will override what happens to be installed in /usr/(local/)lib/python...
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir,
+                                   os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'heat', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+from heat.engine.hot import functions as hot_funcs
+
+
+def main(num_params=30, script_size=60 * 1024, iterations=100):
+    params = dict(('$param_%d' % i, 'value %d' % i)
+                  for i in range(num_params))
+    names = sorted(params)
+    lines = []
+    size = 0
+    while size < script_size:
+        if len(lines) % 20 == 0:
+            name = names[len(lines) // 20 % num_params]
+            line = 'export SETTING_%d="%s"\n' % (len(lines), name)
+        else:
+            line = 'do_something --with-some-option >> /var/log/setup.log\n'
+        lines.append(line)
+        size += len(line)
+    script = ''.join(lines)
+
+    func = hot_funcs.Replace(None, 'str_replace',
+                             {'template': script, 'params': params})
+
+    def single_pass():
+        return func.result()
+
+    def str_replace():
+        return reduce(lambda s, p: s.replace(p[0], p[1]),
+                      params.iteritems(), script)
+
+    print('%d params, %d byte script, %d iterations' %
+          (num_params, len(script), iterations))
+    for name, fn in (('single pass', single_pass),
+                     ('str.replace', str_replace)):
+        elapsed = timeit.timeit(fn, number=iterations)
+        print('%-12s %8.2f ms per call' % (name, elapsed * 1000 / iterations))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])